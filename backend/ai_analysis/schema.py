@@ -1,55 +1,53 @@
 import graphene
-from graphene_django import DjangoObjectType
+from performance.loaders import BatchedConnectionField
+from performance.schema import ProjectRelatedType, owned
 from .models import AIAnalysisJob, CodeAnalysis, PatternDetection
 
-class AIAnalysisJobType(DjangoObjectType):
+class AIAnalysisJobType(ProjectRelatedType):
     class Meta:
         model = AIAnalysisJob
         fields = "__all__"
+        use_connection = True
 
-class CodeAnalysisType(DjangoObjectType):
+class CodeAnalysisType(ProjectRelatedType):
     class Meta:
         model = CodeAnalysis
         fields = "__all__"
+        use_connection = True
 
-class PatternDetectionType(DjangoObjectType):
+class PatternDetectionType(ProjectRelatedType):
     class Meta:
         model = PatternDetection
         fields = "__all__"
+        use_connection = True
 
 class Query(graphene.ObjectType):
-    all_ai_jobs = graphene.List(AIAnalysisJobType, project_id=graphene.UUID())
+    all_ai_jobs = BatchedConnectionField(AIAnalysisJobType, project_id=graphene.UUID())
     ai_job = graphene.Field(AIAnalysisJobType, id=graphene.UUID())
     
-    all_code_analyses = graphene.List(CodeAnalysisType, project_id=graphene.UUID())
+    all_code_analyses = BatchedConnectionField(CodeAnalysisType, project_id=graphene.UUID())
     code_analysis = graphene.Field(CodeAnalysisType, id=graphene.UUID())
     
-    all_patterns = graphene.List(PatternDetectionType, project_id=graphene.UUID())
+    all_patterns = BatchedConnectionField(PatternDetectionType, project_id=graphene.UUID())
     pattern = graphene.Field(PatternDetectionType, id=graphene.UUID())
     
-def resolve_all_ai_jobs(self, info, project_id=None):
-    if not info.context.user.is_authenticated:
-        return AIAnalysisJob.objects.none()
-    queryset = AIAnalysisJob.objects.filter(project__owner=info.context.user)
-    if project_id:
-        queryset = queryset.filter(project_id=project_id)
-    return queryset
-
-def resolve_all_code_analyses(self, info, project_id=None):
-    if not info.context.user.is_authenticated:
-        return CodeAnalysis.objects.none()
-    queryset = CodeAnalysis.objects.filter(project__owner=info.context.user)
-    if project_id:
-        queryset = queryset.filter(project_id=project_id)
-    return queryset
-
-def resolve_all_patterns(self, info, project_id=None):
-    if not info.context.user.is_authenticated:
-        return PatternDetection.objects.none()
-    queryset = PatternDetection.objects.filter(project__owner=info.context.user)
-    if project_id:
-        queryset = queryset.filter(project_id=project_id)
-    return queryset
+    def resolve_all_ai_jobs(self, info, project_id=None, **kwargs):
+        return owned(AIAnalysisJob.objects.all(), info, project_id)
+    
+    def resolve_ai_job(self, info, id):
+        return owned(AIAnalysisJob.objects.all(), info).get(id=id)
+    
+    def resolve_all_code_analyses(self, info, project_id=None, **kwargs):
+        return owned(CodeAnalysis.objects.all(), info, project_id)
+    
+    def resolve_code_analysis(self, info, id):
+        return owned(CodeAnalysis.objects.all(), info).get(id=id)
+    
+    def resolve_all_patterns(self, info, project_id=None, **kwargs):
+        return owned(PatternDetection.objects.all(), info, project_id)
+    
+    def resolve_pattern(self, info, id):
+        return owned(PatternDetection.objects.all(), info).get(id=id)
 
 class StartCodeAnalysis(graphene.Mutation):
     class Arguments:
@@ -0,0 +1,166 @@
+"""Warm model pool for Celery workers.
+
+The ``get_*`` model getters in ``tasks`` load lazily, so without this the
+first AI task in every worker process pays for the model load. Workers
+instead preload the models pinned to the queues they consume
+(``AI_WARM_MODELS``) according to ``AI_WARM_PRELOAD``:
+
+``process``
+    In every pool child at ``worker_process_init``. A child only reports up
+    to the pool, and so only gets tasks, once its models are loaded;
+    ``CELERY_WORKER_PROC_ALIVE_TIMEOUT`` has to cover the load time.
+``parent``
+    Once in the main process at ``worker_init``, before the prefork pool
+    forks. Children, including ones recycled by ``--max-tasks-per-child``,
+    share the loaded weights copy-on-write. Nothing runs inference in the
+    parent, so torch thread pools are not forked mid-use.
+``off``
+    Lazy loading on the first task.
+
+Solo and thread pools have no child processes and always preload at
+``worker_init`` unless preloading is off. ``AI_WARM_READY_FILE``, when set,
+is written for readiness probes once the worker consumes tasks and, in
+``process`` mode, every initial pool child is warm; it is removed at
+shutdown.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+
+from celery.concurrency import get_implementation
+from celery.concurrency.prefork import TaskPool as PreforkPool
+from celery.signals import worker_init, worker_process_init, worker_ready, worker_shutdown
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Filled in the main process at worker_init and inherited by forked pool children
+state = {'queues': [], 'loaded': [], 'failed': [], 'seconds': None, 'processes': 0, 'warm_children': None}
+_stopping = threading.Event()
+
+
+def loaders():
+    from . import tasks
+    return {
+        'code_analyzer': tasks.get_code_analyzer,
+        'pattern_detector': tasks.get_pattern_detector,
+        'text_generator': tasks.get_text_generator,
+    }
+
+
+def pinned_models(queues):
+    """Models to preload for a worker consuming ``queues``; "*" covers queues without their own entry"""
+    pins = settings.AI_WARM_MODELS
+    names = []
+    for queue in queues or ['*']:
+        for name in pins.get(queue, pins.get('*', [])):
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def rss_mb():
+    # Peak resident set size; ru_maxrss is in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def preload(names):
+    """Load ``names`` into this process and log the cold-start time and RSS"""
+    available = loaders()
+    started = time.perf_counter()
+    for name in names:
+        loader = available.get(name)
+        if loader is None:
+            logger.warning(f"Unknown model '{name}' in AI_WARM_MODELS")
+            continue
+        model_started = time.perf_counter()
+        try:
+            loaded = loader() is not None
+        except Exception as e:
+            logger.error(f"Failed to preload {name}: {e}")
+            loaded = False
+        state['loaded' if loaded else 'failed'].append(name)
+        logger.info(f"Preloaded {name} in {time.perf_counter() - model_started:.1f}s" if loaded else f"Could not preload {name}")
+
+    state['seconds'] = time.perf_counter() - started
+    logger.info(
+        f"Warm pool ready in pid {os.getpid()}: {', '.join(state['loaded']) or 'no models'} "
+        f"in {state['seconds']:.1f}s, RSS {rss_mb():.0f} MB"
+    )
+
+
+@worker_init.connect
+def preload_in_parent(sender=None, **kwargs):
+    state['queues'] = sorted(sender.app.amqp.queues.consume_from)
+    mode = settings.AI_WARM_PRELOAD
+    if mode == 'off':
+        return
+    prefork = issubclass(get_implementation(sender.pool_cls), PreforkPool)
+    if mode == 'parent' or not prefork:
+        preload(pinned_models(state['queues']))
+    elif mode == 'process':
+        # Shared with the children forked later; each one counts itself in once warm
+        state['processes'] = sender.concurrency
+        state['warm_children'] = multiprocessing.Value('i', 0)
+
+
+@worker_process_init.connect
+def preload_in_child(**kwargs):
+    if settings.AI_WARM_PRELOAD != 'process':
+        return
+    # Children start from the parent's state; only their own loads count
+    state.update(loaded=[], failed=[], seconds=None)
+    preload(pinned_models(state['queues']))
+    counter = state['warm_children']
+    if counter is not None:
+        with counter.get_lock():
+            counter.value += 1
+
+
+def write_ready_file(path):
+    counter = state['warm_children']
+    if counter is not None:
+        while counter.value < state['processes']:
+            if _stopping.wait(0.2):
+                return
+    with open(path, 'w') as ready:
+        json.dump({
+            'pid': os.getpid(),
+            'queues': state['queues'],
+            'preload': settings.AI_WARM_PRELOAD,
+            'models': pinned_models(state['queues']),
+            'loaded': state['loaded'],
+            'failed': state['failed'],
+            'cold_start_seconds': state['seconds'],
+            'warm_processes': counter.value if counter is not None else None,
+            'rss_mb': round(rss_mb(), 1),
+        }, ready)
+    logger.info(f"Worker ready, wrote {path}")
+
+
+@worker_ready.connect
+def mark_ready(**kwargs):
+    path = settings.AI_WARM_READY_FILE
+    if not path:
+        return
+    if state['warm_children'] is None:
+        write_ready_file(path)
+    else:
+        threading.Thread(target=write_ready_file, args=(path,), name='warm-pool-ready', daemon=True).start()
+
+
+@worker_shutdown.connect
+def clear_ready(**kwargs):
+    _stopping.set()
+    path = settings.AI_WARM_READY_FILE
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
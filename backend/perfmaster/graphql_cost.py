@@ -0,0 +1,89 @@
+from graphql import (
+    FieldNode, FragmentDefinitionNode, FragmentSpreadNode, InlineFragmentNode,
+    get_named_type, get_nullable_type, is_list_type,
+)
+from graphql.utilities import get_operation_ast, value_from_ast_untyped
+
+PAGE_ARGUMENTS = ('first', 'last')
+
+
+def estimate_cost(schema, document, operation_name=None, variables=None,
+                  connection_size=100, related_size=20, list_size=100):
+    """Static upper bound on the objects an operation can resolve, plus its depth.
+
+    Every field with a selection set costs one per object it can produce.
+    List sizes come from ``first``/``last`` (literal or variable); otherwise
+    connections assume ``connection_size`` (the enforced page cap), list
+    fields with a ``first`` argument assume ``related_size`` and any other
+    list assumes ``list_size``. A connection's page size applies to its
+    ``edges`` list. Returns ``(cost, depth)``.
+    """
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:
+        return 0, 0
+    root_type = schema.get_root_type(operation.operation)
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+    variables = variables or {}
+
+    def page_size(field_node, field_def, named_type):
+        for argument in field_node.arguments:
+            if argument.name.value in PAGE_ARGUMENTS:
+                value = value_from_ast_untyped(argument.value, variables)
+                if isinstance(value, int) and value > 0:
+                    return value
+        if named_type.name.endswith('Connection'):
+            return connection_size
+        if 'first' in field_def.args:
+            return related_size
+        return None
+
+    def walk(parent_type, selection_set, multiplier, pending, depth, seen_fragments):
+        cost = 0
+        deepest = depth
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                fields = getattr(parent_type, 'fields', {})
+                field_def = fields.get(selection.name.value)
+                if field_def is None or selection.selection_set is None:
+                    continue
+                named_type = get_named_type(field_def.type)
+                size = page_size(selection, field_def, named_type)
+                if is_list_type(get_nullable_type(field_def.type)):
+                    # A list consumes the page size announced by itself or its connection
+                    count = multiplier * (size or pending or list_size)
+                    child_pending = None
+                else:
+                    count = multiplier
+                    child_pending = size
+                child_cost, child_depth = walk(
+                    named_type, selection.selection_set, count, child_pending, depth + 1, seen_fragments
+                )
+                cost += count + child_cost
+                deepest = max(deepest, child_depth)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = schema.get_type(selection.type_condition.name.value) or parent_type
+                child_cost, child_depth = walk(
+                    fragment_type, selection.selection_set, multiplier, pending, depth, seen_fragments
+                )
+                cost += child_cost
+                deepest = max(deepest, child_depth)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = fragments.get(name)
+                if fragment is None or name in seen_fragments:
+                    continue
+                fragment_type = schema.get_type(fragment.type_condition.name.value) or parent_type
+                child_cost, child_depth = walk(
+                    fragment_type, fragment.selection_set, multiplier, pending, depth, seen_fragments | {name}
+                )
+                cost += child_cost
+                deepest = max(deepest, child_depth)
+        return cost, deepest
+
+    return walk(root_type, operation.selection_set, 1, None, 0, frozenset())
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponseBadRequest, HttpResponseNotAllowed
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView, HttpError
+from graphql import ExecutionResult, GraphQLError, OperationType, execute, parse, validate
+from graphql.utilities import get_operation_ast
+
+from .graphql_cost import estimate_cost
+
+PERSISTED_QUERY_KEY = 'perf:graphql:pq:{sha256}'
+
+
+class DocumentCache:
+    """Thread-safe LRU of parsed and validated documents keyed by query hash"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+documents = DocumentCache(settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+class PerfMasterGraphQLView(GraphQLView):
+    """GraphQLView with persisted queries, a document cache and a cost budget.
+
+    Clients may send ``extensions.persistedQuery.sha256Hash`` instead of the
+    query text (the Apollo APQ protocol); unknown hashes answer
+    ``PersistedQueryNotFound`` and the client retries once with the text,
+    which registers it. Parsing and validation run once per distinct
+    document. Every operation is costed before execution and rejected above
+    GRAPHQL_MAX_COST or GRAPHQL_MAX_DEPTH; the estimate is returned in
+    ``extensions.cost``.
+    """
+
+    def get_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if not execution_result:
+            return None, status_code
+
+        response = {}
+        if execution_result.errors:
+            set_rollback()
+            response['errors'] = [self.format_error(e) for e in execution_result.errors]
+
+        if execution_result.errors and any(not getattr(e, 'path', None) for e in execution_result.errors):
+            status_code = 400
+        else:
+            response['data'] = execution_result.data
+
+        if execution_result.extensions:
+            response['extensions'] = execution_result.extensions
+
+        if self.batch:
+            response['id'] = id
+            response['status'] = status_code
+
+        return self.json_encode(request, response, pretty=show_graphiql), status_code
+
+    def persisted_query(self, request, data, query):
+        """Resolve ``(query, sha256)`` from the APQ extension, registering new documents"""
+        # GET requests carry the extension in the query string so they stay cacheable
+        extensions = request.GET.get('extensions') or data.get('extensions') or {}
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest('Extensions are invalid JSON.'))
+        persisted = extensions.get('persistedQuery') if isinstance(extensions, dict) else None
+        if not persisted:
+            return query, query_hash(query) if query else None
+
+        sha256 = persisted.get('sha256Hash')
+        if not isinstance(sha256, str) or len(sha256) != 64:
+            raise GraphQLError('Invalid persisted query hash', extensions={'code': 'PERSISTED_QUERY_INVALID'})
+
+        key = PERSISTED_QUERY_KEY.format(sha256=sha256.lower())
+        if not query:
+            query = cache.get(key)
+            if query is None:
+                raise GraphQLError('PersistedQueryNotFound', extensions={'code': 'PERSISTED_QUERY_NOT_FOUND'})
+            return query, sha256.lower()
+
+        if query_hash(query) != sha256.lower():
+            raise GraphQLError('provided sha does not match query', extensions={'code': 'PERSISTED_QUERY_INVALID'})
+        cache.set(key, query, timeout=settings.GRAPHQL_PERSISTED_QUERY_TTL)
+        return query, sha256.lower()
+
+    def get_document(self, query, sha256):
+        """Parsed document and validation errors for ``query``, cached by hash"""
+        entry = documents.get(sha256)
+        if entry is None:
+            try:
+                document = parse(query)
+            except GraphQLError as e:
+                # Syntax errors are cheap to report again and not worth an LRU slot
+                return None, [e]
+            entry = (document, validate(self.schema.graphql_schema, document))
+            documents.set(sha256, entry)
+        return entry
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        try:
+            query, sha256 = self.persisted_query(request, data, query)
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest('Must provide query string.'))
+
+        document, errors = self.get_document(query, sha256)
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if request.method.lower() == 'get' and operation_ast and operation_ast.operation != OperationType.QUERY:
+            if show_graphiql:
+                return None
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ['POST'],
+                    f'Can only perform a {operation_ast.operation.value} operation from a POST request.'
+                )
+            )
+
+        # Reject expensive operations before any resolver runs
+        cost, depth = estimate_cost(
+            self.schema.graphql_schema,
+            document,
+            operation_name,
+            variables,
+            connection_size=graphene_settings.RELAY_CONNECTION_MAX_LIMIT,
+            related_size=settings.GRAPHQL_RELATED_DEFAULT_SIZE,
+            list_size=settings.GRAPHQL_MAX_PAGE_SIZE
+        )
+        extensions = {
+            'cost': {
+                'requested': cost,
+                'maximum': settings.GRAPHQL_MAX_COST,
+                'depth': depth,
+                'maxDepth': settings.GRAPHQL_MAX_DEPTH,
+            }
+        }
+        if cost > settings.GRAPHQL_MAX_COST:
+            return ExecutionResult(errors=[GraphQLError(
+                f'Query cost {cost} exceeds the maximum of {settings.GRAPHQL_MAX_COST}',
+                extensions={'code': 'QUERY_TOO_EXPENSIVE'}
+            )], extensions=extensions)
+        if depth > settings.GRAPHQL_MAX_DEPTH:
+            return ExecutionResult(errors=[GraphQLError(
+                f'Query depth {depth} exceeds the maximum of {settings.GRAPHQL_MAX_DEPTH}',
+                extensions={'code': 'QUERY_TOO_DEEP'}
+            )], extensions=extensions)
+
+        try:
+            options = {
+                'root_value': self.get_root_value(request),
+                'variable_values': variables,
+                'operation_name': operation_name,
+                'context_value': self.get_context(request),
+                'middleware': self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                options['execution_context_class'] = self.execution_context_class
+
+            if (
+                operation_ast
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get('ATOMIC_MUTATIONS', False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(self.schema.graphql_schema, document, **options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+            else:
+                result = execute(self.schema.graphql_schema, document, **options)
+        except Exception as e:
+            return ExecutionResult(errors=[e], extensions=extensions)
+
+        result.extensions = extensions
+        return result
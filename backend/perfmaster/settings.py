@@ -110,17 +110,154 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# Pool children preload models before reporting up; allow for slow model loads
+CELERY_WORKER_PROC_ALIVE_TIMEOUT = env.float('CELERY_WORKER_PROC_ALIVE_TIMEOUT', default=120.0)
+CELERY_BEAT_SCHEDULE = {
+    'update-metric-rollups': {
+        'task': 'performance.tasks.update_metric_rollups',
+        'schedule': 60.0,
+    },
+    'detect-metric-regressions': {
+        'task': 'performance.tasks.detect_metric_regressions',
+        'schedule': 900.0,
+    },
+    'purge-expired-data': {
+        'task': 'performance.tasks.purge_expired_data',
+        'schedule': 3600.0,
+    },
+}
+
+# Cache Configuration
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('CACHE_URL', default=REDIS_URL),
+        'KEY_PREFIX': 'perfmaster',
+    }
+}
 
-# Channels Configuration
+# Channels Configuration; project groups are spread over the shard URLs by
+# rendezvous hashing, so adding a shard only moves the projects it takes over.
+# memory://<name> shards are in-process stand-ins for tests.
+CHANNEL_SHARD_URLS = env.list('CHANNEL_SHARD_URLS', default=[REDIS_URL])
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'BACKEND': 'realtime.layers.ShardedChannelLayer',
         'CONFIG': {
-            'hosts': [REDIS_URL],
+            'shards': CHANNEL_SHARD_URLS,
         },
     },
 }
 
+# Bulk metric ingestion (/api/metrics/bulk/)
+METRICS_BULK_CHUNK_SIZE = env.int('METRICS_BULK_CHUNK_SIZE', default=1000)
+METRICS_BULK_MAX_RECORDS = env.int('METRICS_BULK_MAX_RECORDS', default=50000)
+METRICS_BULK_MAX_BYTES = env.int('METRICS_BULK_MAX_BYTES', default=32 * 1024 * 1024)
+
+# Write-behind buffer for WebSocket metric and component saves
+REALTIME_BUFFER_MAX_ROWS = env.int('REALTIME_BUFFER_MAX_ROWS', default=500)
+REALTIME_BUFFER_FLUSH_INTERVAL = env.float('REALTIME_BUFFER_FLUSH_INTERVAL', default=1.0)
+REALTIME_BUFFER_MAX_PENDING = env.int('REALTIME_BUFFER_MAX_PENDING', default=50000)
+
+# Shared per-project publisher for periodic dashboard updates; the lock URL
+# elects one ASGI worker per project group
+REALTIME_PUBLISHER_INTERVAL = env.float('REALTIME_PUBLISHER_INTERVAL', default=5.0)
+REALTIME_PUBLISHER_LOCK_URL = env('REALTIME_PUBLISHER_LOCK_URL', default=REDIS_URL)
+REALTIME_PUBLISHER_MAX_ROWS = env.int('REALTIME_PUBLISHER_MAX_ROWS', default=500)
+
+# Micro-batched group broadcasts: one message per group every window or N events
+REALTIME_COALESCE_WINDOW = env.float('REALTIME_COALESCE_WINDOW', default=0.1)
+REALTIME_COALESCE_MAX_EVENTS = env.int('REALTIME_COALESCE_MAX_EVENTS', default=500)
+
+# Per-connection outbound queues: bounded, conflating, with slow-client disconnects.
+# MAX_DROPS is a decayed count over roughly the last DROP_WINDOW_SECONDS, not a lifetime total.
+REALTIME_OUTBOX_MAX_PENDING = env.int('REALTIME_OUTBOX_MAX_PENDING', default=256)
+REALTIME_SLOW_CLIENT_LAG_SECONDS = env.float('REALTIME_SLOW_CLIENT_LAG_SECONDS', default=30.0)
+REALTIME_SLOW_CLIENT_MAX_DROPS = env.int('REALTIME_SLOW_CLIENT_MAX_DROPS', default=1000)
+REALTIME_SLOW_CLIENT_DROP_WINDOW_SECONDS = env.float('REALTIME_SLOW_CLIENT_DROP_WINDOW_SECONDS', default=60.0)
+
+# Per-process live store serving WebSocket pushes: points per metric type and aggregate window
+LIVE_CAPACITY = env.int('LIVE_CAPACITY', default=2048)
+LIVE_WINDOW_MINUTES = env.int('LIVE_WINDOW_MINUTES', default=15)
+LIVE_WARM_POINTS = env.int('LIVE_WARM_POINTS', default=500)
+LIVE_BROADCAST_MAX_ROWS = env.int('LIVE_BROADCAST_MAX_ROWS', default=1000)
+
+# ws_loadtest service levels; a run outside any of them fails
+LOADTEST_SLO_P50_MS = env.float('LOADTEST_SLO_P50_MS', default=150.0)
+LOADTEST_SLO_P99_MS = env.float('LOADTEST_SLO_P99_MS', default=500.0)
+LOADTEST_SLO_MIN_DELIVERY = env.float('LOADTEST_SLO_MIN_DELIVERY', default=0.99)
+LOADTEST_SLO_MAX_CONNECTION_KB = env.float('LOADTEST_SLO_MAX_CONNECTION_KB', default=256.0)
+
+# Metric rollups (minute/hour/day); rows newer than the lateness window stay raw.
+# Rows stored later with older timestamps flag their project hour, which the
+# rollup task re-aggregates (ROLLUP_DIRTY_BATCH hours per run) while retention still
+# keeps their raw rows; bulk ingest rejects rows older than the raw retention.
+ROLLUP_LATENESS_SECONDS = env.int('ROLLUP_LATENESS_SECONDS', default=120)
+ROLLUP_MAX_SPAN_HOURS = env.int('ROLLUP_MAX_SPAN_HOURS', default=24)
+ROLLUP_CHUNK_SIZE = env.int('ROLLUP_CHUNK_SIZE', default=5000)
+ROLLUP_DIRTY_BATCH = env.int('ROLLUP_DIRTY_BATCH', default=500)
+TRENDS_MIN_POINTS = env.int('TRENDS_MIN_POINTS', default=24)
+TRENDS_MAX_POINTS = env.int('TRENDS_MAX_POINTS', default=5000)
+TRENDS_MAX_HOURS = env.int('TRENDS_MAX_HOURS', default=24 * 366)
+TRENDS_MAX_RAW_ROWS = env.int('TRENDS_MAX_RAW_ROWS', default=200000)
+
+# Streaming metric export (NDJSON, CSV, Parquet, Arrow)
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=2000)
+EXPORT_ROW_GROUP_SIZE = env.int('EXPORT_ROW_GROUP_SIZE', default=100000)
+
+# Default retention in days for projects without a RetentionPolicy; unset keeps
+# the tier forever. Purges delete in primary-key chunks to keep locks short.
+RETENTION_RAW_DAYS = env.int('RETENTION_RAW_DAYS', default=14)
+RETENTION_COMPONENT_DAYS = env.int('RETENTION_COMPONENT_DAYS', default=14)
+RETENTION_MINUTE_ROLLUP_DAYS = env.int('RETENTION_MINUTE_ROLLUP_DAYS', default=30)
+RETENTION_HOUR_ROLLUP_DAYS = env.int('RETENTION_HOUR_ROLLUP_DAYS', default=365)
+RETENTION_DAY_ROLLUP_DAYS = env.int('RETENTION_DAY_ROLLUP_DAYS', default=None)
+RETENTION_CHUNK_SIZE = env.int('RETENTION_CHUNK_SIZE', default=5000)
+RETENTION_CHUNK_PAUSE = env.float('RETENTION_CHUNK_PAUSE', default=0.05)
+RETENTION_MAX_SECONDS = env.float('RETENTION_MAX_SECONDS', default=600.0)
+
+# Dashboard payload cache; entries are version-stamped per project and bumped
+# on ingest and issue changes, the TTL only bounds how long a window can drift
+DASHBOARD_CACHE_TTL = env.int('DASHBOARD_CACHE_TTL', default=60)
+DASHBOARD_CACHE_STALE_TTL = env.int('DASHBOARD_CACHE_STALE_TTL', default=600)
+DASHBOARD_CACHE_LOCK_SECONDS = env.int('DASHBOARD_CACHE_LOCK_SECONDS', default=10)
+# How long a request with nothing stale to serve waits for the recompute before computing itself
+DASHBOARD_CACHE_WAIT_SECONDS = env.float('DASHBOARD_CACHE_WAIT_SECONDS', default=1.0)
+
+# Keyset pagination for metric and component lists (and paginated raw trends)
+KEYSET_MAX_PAGE_SIZE = env.int('KEYSET_MAX_PAGE_SIZE', default=5000)
+
+# React profiler ingest and flame graphs
+PROFILE_MAX_NODES = env.int('PROFILE_MAX_NODES', default=20000)
+PROFILE_MAX_PER_REQUEST = env.int('PROFILE_MAX_PER_REQUEST', default=200)
+
+# Performance budgets: sliding-window state shared through Redis (empty URL keeps it in-process)
+BUDGET_STATE_URL = env('BUDGET_STATE_URL', default=REDIS_URL)
+BUDGET_WINDOW_SLOTS = env.int('BUDGET_WINDOW_SLOTS', default=12)
+BUDGET_MAX_WINDOW_SECONDS = env.int('BUDGET_MAX_WINDOW_SECONDS', default=24 * 3600)
+BUDGET_DEFINITION_TTL = env.int('BUDGET_DEFINITION_TTL', default=300)
+
+# Release comparison: samples drawn from rollup sketches per side
+RELEASE_SAMPLE_SIZE = env.int('RELEASE_SAMPLE_SIZE', default=2000)
+RELEASE_MIN_SAMPLES = env.int('RELEASE_MIN_SAMPLES', default=30)
+RELEASE_BOOTSTRAP_ITERATIONS = env.int('RELEASE_BOOTSTRAP_ITERATIONS', default=500)
+RELEASE_SIGNIFICANCE = env.float('RELEASE_SIGNIFICANCE', default=0.01)
+RELEASE_MAX_COMPONENTS = env.int('RELEASE_MAX_COMPONENTS', default=20)
+RELEASE_COMPARE_SEED = env.int('RELEASE_COMPARE_SEED', default=0)
+
+# Regression detection over hourly rollups (EWMA z-score and CUSUM)
+ANOMALY_WINDOW_HOURS = env.int('ANOMALY_WINDOW_HOURS', default=7 * 24)
+ANOMALY_RECENT_HOURS = env.int('ANOMALY_RECENT_HOURS', default=3)
+ANOMALY_MIN_HISTORY = env.int('ANOMALY_MIN_HISTORY', default=24)
+ANOMALY_MIN_SAMPLES = env.int('ANOMALY_MIN_SAMPLES', default=10)
+ANOMALY_EWMA_ALPHA = env.float('ANOMALY_EWMA_ALPHA', default=0.1)
+ANOMALY_Z_THRESHOLD = env.float('ANOMALY_Z_THRESHOLD', default=4.0)
+ANOMALY_CUSUM_K = env.float('ANOMALY_CUSUM_K', default=0.5)
+ANOMALY_CUSUM_H = env.float('ANOMALY_CUSUM_H', default=8.0)
+ANOMALY_MIN_CHANGE = env.float('ANOMALY_MIN_CHANGE', default=0.1)
+# How long ignoring a detected issue suppresses it before a regression reopens it
+ANOMALY_IGNORE_HOURS = env.int('ANOMALY_IGNORE_HOURS', default=30 * 24)
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -135,8 +272,17 @@ REST_FRAMEWORK = {
 }
 
 # GraphQL Configuration
+GRAPHQL_MAX_PAGE_SIZE = env.int('GRAPHQL_MAX_PAGE_SIZE', default=1000)
+GRAPHQL_RELATED_DEFAULT_SIZE = env.int('GRAPHQL_RELATED_DEFAULT_SIZE', default=20)
+# Static cost budget (objects an operation may resolve) and persisted-query cache
+GRAPHQL_MAX_COST = env.int('GRAPHQL_MAX_COST', default=50000)
+GRAPHQL_MAX_DEPTH = env.int('GRAPHQL_MAX_DEPTH', default=10)
+GRAPHQL_DOCUMENT_CACHE_SIZE = env.int('GRAPHQL_DOCUMENT_CACHE_SIZE', default=500)
+GRAPHQL_PERSISTED_QUERY_TTL = env.int('GRAPHQL_PERSISTED_QUERY_TTL', default=30 * 24 * 3600)
+
 GRAPHENE = {
     'SCHEMA': 'perfmaster.schema.schema',
+    'RELAY_CONNECTION_MAX_LIMIT': GRAPHQL_MAX_PAGE_SIZE,
     'MIDDLEWARE': [
         'graphql_jwt.middleware.JSONWebTokenMiddleware',
     ],
@@ -154,6 +300,18 @@ CORS_ALLOW_CREDENTIALS = True
 HUGGINGFACE_API_KEY = env('HUGGINGFACE_API_KEY')
 HUGGINGFACE_MODEL_CACHE_DIR = BASE_DIR / 'models'
 
+# Celery warm model pool (ai_analysis/warmup.py): "process" preloads in every pool
+# child before it takes tasks, "parent" loads once before the prefork pool forks so
+# children share the weights copy-on-write, "off" keeps lazy loading. Models are
+# pinned per consumed queue as queue=model+model;queue=...; "*" covers other queues.
+AI_WARM_PRELOAD = env('AI_WARM_PRELOAD', default='process')
+AI_WARM_MODELS = env.dict(
+    'AI_WARM_MODELS',
+    cast={'value': lambda value: [name for name in value.split('+') if name]},
+    default={'*': ['code_analyzer', 'pattern_detector', 'text_generator']}
+)
+AI_WARM_READY_FILE = env('AI_WARM_READY_FILE', default='')
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -201,5 +359,10 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        'realtime': {
+            'handlers': ['file', 'console'],
+            'level': 'INFO',
+            'propagate': True,
+        },
     },
 }
\ No newline at end of file
@@ -1,15 +1,15 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.views.decorators.csrf import csrf_exempt
-from graphene_django.views import GraphQLView
 from django.conf import settings
 from django.conf.urls.static import static
+from .graphql_views import PerfMasterGraphQLView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('performance.urls')),
     path('api/ai/', include('ai_analysis.urls')),
-    path('graphql/', csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path('graphql/', csrf_exempt(PerfMasterGraphQLView.as_view(graphiql=True))),
 ]
 
 if settings.DEBUG:
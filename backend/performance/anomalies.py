@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import time
+import warnings
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_dashboard
+from .models import MetricRollup, PerformanceIssue, PerformanceMetric, RollupWatermark
+
+logger = logging.getLogger(__name__)
+
+METRIC_LABELS = dict(PerformanceMetric.METRIC_TYPES)
+
+
+def load_series(end, hours):
+    """Hourly averages for every (project, metric_type) as an S x T matrix, NaN where sparse"""
+    start = end - timedelta(hours=hours)
+    rows = MetricRollup.objects.filter(
+        granularity='hour',
+        bucket_start__gte=start,
+        bucket_start__lt=end,
+        count__gte=settings.ANOMALY_MIN_SAMPLES
+    ).order_by().values_list('project_id', 'metric_type', 'bucket_start', 'count', 'sum')
+
+    keys = {}
+    series = []
+    columns = []
+    totals = []
+    counts = []
+    for project_id, metric_type, bucket_start, count, total in rows.iterator(chunk_size=settings.ROLLUP_CHUNK_SIZE):
+        index = keys.get((project_id, metric_type))
+        if index is None:
+            index = keys[(project_id, metric_type)] = len(keys)
+        series.append(index)
+        columns.append(int((bucket_start - start).total_seconds() // 3600))
+        totals.append(total)
+        counts.append(count)
+
+    values = np.full((len(keys), hours), np.nan)
+    if keys:
+        values[np.array(series), np.array(columns)] = np.array(totals) / np.array(counts)
+    return list(keys), values
+
+
+def score_series(values, alpha, k):
+    """EWMA z-scores and one-sided CUSUM of every series, vectorized across series.
+
+    Each point is scored against the EWMA mean/variance of the points before
+    it; gaps (NaN) neither score nor update the state. Returns the z-score
+    and CUSUM statistic at the last column plus the number of points seen.
+    """
+    count, length = values.shape
+    mean = np.full(count, np.nan)
+    variance = np.zeros(count)
+    seen = np.zeros(count, dtype=np.int64)
+    cusum = np.zeros(count)
+    z = np.full(count, np.nan)
+
+    for column in range(length):
+        x = values[:, column]
+        valid = ~np.isnan(x)
+        started = valid & ~np.isnan(mean)
+
+        # Floor the deviation so flat series do not turn noise into huge scores
+        deviation = np.maximum(np.sqrt(variance), np.abs(np.nan_to_num(mean)) * 0.01 + 1e-9)
+        z = np.where(started, (x - np.nan_to_num(mean)) / deviation, np.nan)
+        cusum = np.where(started, np.maximum(0.0, cusum + np.nan_to_num(z) - k), cusum)
+
+        first = valid & np.isnan(mean)
+        mean = np.where(first, x, mean)
+        diff = np.where(started, x - mean, 0.0)
+        increment = alpha * diff
+        mean = np.where(started, mean + increment, mean)
+        variance = np.where(started, (1 - alpha) * (variance + diff * increment), variance)
+        seen += valid
+
+    return z, cusum, seen
+
+
+def detect_regressions(keys, values):
+    """Series whose latest hours regressed; returns (key, baseline, current, change, z, cusum) tuples"""
+    if not keys:
+        return []
+    recent = settings.ANOMALY_RECENT_HOURS
+    z, cusum, seen = score_series(values, settings.ANOMALY_EWMA_ALPHA, settings.ANOMALY_CUSUM_K)
+
+    # Series with no recent or no earlier points yield NaN here and are never flagged
+    with warnings.catch_warnings(), np.errstate(all='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        baseline = np.nanmedian(values[:, :-recent], axis=1)
+        current = np.nanmean(values[:, -recent:], axis=1)
+        change = current / baseline - 1
+
+    # All tracked metrics are lower-is-better, so only upward shifts are regressions
+    flagged = (
+        (seen >= settings.ANOMALY_MIN_HISTORY)
+        & ~np.isnan(values[:, -1])
+        & ((z >= settings.ANOMALY_Z_THRESHOLD) | (cusum >= settings.ANOMALY_CUSUM_H))
+        & (change >= settings.ANOMALY_MIN_CHANGE)
+        & (baseline > 0)
+    )
+    return [
+        (keys[index], float(baseline[index]), float(current[index]), float(change[index]),
+         float(z[index]), float(cusum[index]))
+        for index in np.flatnonzero(flagged)
+    ]
+
+
+def fingerprint(project_id, metric_type):
+    return hashlib.sha1(f'regression:{project_id}:{metric_type}'.encode('utf-8')).hexdigest()
+
+
+def severity(change):
+    if change >= 0.5:
+        return 'critical'
+    if change >= 0.25:
+        return 'high'
+    if change >= 0.1:
+        return 'medium'
+    return 'low'
+
+
+def sync_issues(regressions, end):
+    """Open one issue per regressed series, or update the latest one already filed for it.
+
+    A resolved issue is reopened only once a whole recent window postdates
+    its resolution, and an ignored one only after ANOMALY_IGNORE_HOURS, so
+    a series never gets a second row for the same fingerprint.
+    """
+    if not regressions:
+        return 0, 0, 0
+    by_fingerprint = {
+        fingerprint(project_id, metric_type): (project_id, metric_type, baseline, current, change, z, cusum)
+        for (project_id, metric_type), baseline, current, change, z, cusum in regressions
+    }
+    now = timezone.now()
+    evidence_start = end - timedelta(hours=settings.ANOMALY_RECENT_HOURS)
+    ignore_for = timedelta(hours=settings.ANOMALY_IGNORE_HOURS)
+
+    with transaction.atomic():
+        existing = {}
+        for issue in PerformanceIssue.objects.select_for_update().filter(
+            fingerprint__in=by_fingerprint
+        ).order_by('-updated_at'):
+            existing.setdefault(issue.fingerprint, issue)
+        created = []
+        updated = []
+        reopened = 0
+        for key, (project_id, metric_type, baseline, current, change, z, cusum) in by_fingerprint.items():
+            issue = existing.get(key)
+            if issue is not None and issue.status == 'resolved':
+                if evidence_start < (issue.resolved_at or issue.updated_at):
+                    continue
+            elif issue is not None and issue.status == 'ignored':
+                if evidence_start < issue.updated_at + ignore_for:
+                    continue
+            label = METRIC_LABELS.get(metric_type, metric_type)
+            title = f'{label} regressed by {change:.0%}'
+            description = (
+                f'{label} averaged {current:.4g} over the last {settings.ANOMALY_RECENT_HOURS}h '
+                f'against a baseline of {baseline:.4g} (z-score {z:.1f}, CUSUM {cusum:.1f}), '
+                f'as of {end.isoformat()}.'
+            )
+            if issue is None:
+                created.append(PerformanceIssue(
+                    project_id=project_id,
+                    title=title,
+                    description=description,
+                    severity=severity(change),
+                    fingerprint=key
+                ))
+                continue
+            if issue.status in ('resolved', 'ignored'):
+                issue.status = 'open'
+                issue.resolved_at = None
+                reopened += 1
+            issue.title = title
+            issue.description = description
+            issue.severity = severity(change)
+            issue.updated_at = now
+            updated.append(issue)
+
+        PerformanceIssue.objects.bulk_create(created)
+        PerformanceIssue.objects.bulk_update(
+            updated, ['title', 'description', 'severity', 'status', 'resolved_at', 'updated_at']
+        )
+
+    invalidate_dashboard(*{project_id for project_id, *_ in by_fingerprint.values()})
+    return len(created), len(updated) - reopened, reopened
+
+
+def run_detection(end=None):
+    """Score every hourly series up to the last complete hour and sync regression issues"""
+    started = time.monotonic()
+    if end is None:
+        end = RollupWatermark.objects.filter(granularity='hour').values_list('position', flat=True).first()
+        if end is None:
+            return {'series': 0, 'regressions': 0, 'opened': 0, 'updated': 0, 'reopened': 0, 'seconds': 0.0}
+
+    keys, values = load_series(end, settings.ANOMALY_WINDOW_HOURS)
+    loaded = time.monotonic()
+    regressions = detect_regressions(keys, values)
+    scored = time.monotonic()
+    opened, updated, reopened = sync_issues(regressions, end)
+
+    return {
+        'series': len(keys),
+        'regressions': len(regressions),
+        'opened': opened,
+        'updated': updated,
+        'reopened': reopened,
+        'load_seconds': round(loaded - started, 3),
+        'score_seconds': round(scored - loaded, 3),
+        'seconds': round(time.monotonic() - started, 3),
+    }
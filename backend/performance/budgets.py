@@ -0,0 +1,295 @@
+import logging
+import time
+from collections import namedtuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import PerformanceBudget
+
+logger = logging.getLogger(__name__)
+
+DEFINITIONS_KEY = 'perf:budgets:{project_id}'
+
+# A statistic stays within its threshold while at most (1 - q) of the window
+# lies above it, so percentiles and max need only a count of values over the
+# threshold; 'avg' compares the window's sum instead.
+QUANTILES = {
+    'avg': None,
+    'p50': 0.5,
+    'p75': 0.75,
+    'p90': 0.9,
+    'p95': 0.95,
+    'p99': 0.99,
+    'max': 1.0,
+}
+
+Budget = namedtuple('Budget', 'id project_id name metric_type statistic threshold window_seconds min_samples')
+
+
+def invalidate_budgets(*project_ids):
+    """Drop cached budget definitions so the next ingest reloads them"""
+    try:
+        cache.delete_many([DEFINITIONS_KEY.format(project_id=project_id) for project_id in project_ids])
+    except Exception as e:
+        logger.warning(f"Could not invalidate budget definitions for {project_ids}: {e}")
+
+
+def budgets_for(project_ids):
+    """Active budgets of each project, read from the cache with one query for any misses"""
+    keys = {DEFINITIONS_KEY.format(project_id=project_id): str(project_id) for project_id in project_ids}
+    try:
+        cached = cache.get_many(list(keys))
+    except Exception as e:
+        logger.warning(f"Budget definition cache unavailable: {e}")
+        cached = {}
+
+    budgets = {keys[key]: value for key, value in cached.items()}
+    missing = [project_id for project_id in keys.values() if project_id not in budgets]
+    if missing:
+        loaded = {project_id: [] for project_id in missing}
+        rows = PerformanceBudget.objects.filter(project_id__in=missing, is_active=True).values_list(
+            'id', 'project_id', 'name', 'metric_type', 'statistic', 'threshold', 'window_seconds', 'min_samples'
+        )
+        for row in rows:
+            budget = Budget(str(row[0]), str(row[1]), *row[2:])
+            loaded[budget.project_id].append(budget)
+        try:
+            cache.set_many(
+                {DEFINITIONS_KEY.format(project_id=project_id): value for project_id, value in loaded.items()},
+                timeout=settings.BUDGET_DEFINITION_TTL
+            )
+        except Exception as e:
+            logger.warning(f"Could not cache budget definitions: {e}")
+        budgets.update(loaded)
+    return budgets
+
+
+class LocalWindowStore:
+    """Window slots kept in process memory, for single-process deployments and development"""
+
+    def __init__(self):
+        self.slots = {}
+        self.states = {}
+
+    def add(self, increments, ttl):
+        expires = time.monotonic() + ttl
+        for key, (count, above, total) in increments.items():
+            slot = self.slots.get(key)
+            if slot is None or slot[3] < time.monotonic():
+                slot = self.slots[key] = [0, 0, 0.0, expires]
+            slot[0] += count
+            slot[1] += above
+            slot[2] += total
+            slot[3] = expires
+        if len(self.slots) > 100000:
+            now = time.monotonic()
+            self.slots = {key: slot for key, slot in self.slots.items() if slot[3] >= now}
+
+    def totals(self, windows):
+        now = time.monotonic()
+        results = []
+        for budget_id, indexes in windows:
+            count = above = 0
+            total = 0.0
+            for index in indexes:
+                slot = self.slots.get((budget_id, index))
+                if slot is not None and slot[3] >= now:
+                    count += slot[0]
+                    above += slot[1]
+                    total += slot[2]
+            results.append((count, above, total))
+        return results
+
+    def swap_states(self, states, ttl):
+        previous = [self.states.get(budget_id) for budget_id, _ in states]
+        self.states.update(states)
+        return previous
+
+
+class RedisWindowStore:
+    """Window slots as Redis hashes shared by every web and ASGI process; one round trip per call"""
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.from_url(url)
+
+    @staticmethod
+    def _slot_key(budget_id, index):
+        return f'perfmaster:budget:{budget_id}:{index}'
+
+    def add(self, increments, ttl):
+        pipeline = self.client.pipeline(transaction=False)
+        for (budget_id, index), (count, above, total) in increments.items():
+            key = self._slot_key(budget_id, index)
+            pipeline.hincrby(key, 'n', count)
+            pipeline.hincrby(key, 'above', above)
+            pipeline.hincrbyfloat(key, 'sum', total)
+            pipeline.expire(key, ttl)
+        pipeline.execute()
+
+    def totals(self, windows):
+        pipeline = self.client.pipeline(transaction=False)
+        for budget_id, indexes in windows:
+            for index in indexes:
+                pipeline.hmget(self._slot_key(budget_id, index), 'n', 'above', 'sum')
+        slots = iter(pipeline.execute())
+
+        results = []
+        for _, indexes in windows:
+            count = above = 0
+            total = 0.0
+            for _ in indexes:
+                n, over, value = next(slots)
+                count += int(n or 0)
+                above += int(over or 0)
+                total += float(value or 0)
+            results.append((count, above, total))
+        return results
+
+    def swap_states(self, states, ttl):
+        pipeline = self.client.pipeline(transaction=False)
+        for budget_id, state in states:
+            pipeline.set(f'perfmaster:budget:{budget_id}:state', state, ex=ttl, get=True)
+        return [value.decode() if value else None for value in pipeline.execute()]
+
+
+class BudgetEvaluator:
+    """Sliding-window budget checks fed by every metric ingest path.
+
+    Each budget's window is split into ``BUDGET_WINDOW_SLOTS`` time slots
+    holding a count, a count of values over the threshold and a sum, so an
+    ingested point costs one slot increment and a check costs one read of a
+    fixed number of slots, however many points the window holds. Only state
+    changes (breached/recovered) are pushed to the project's channel group.
+    """
+
+    def __init__(self):
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            if settings.BUDGET_STATE_URL:
+                self._store = RedisWindowStore(settings.BUDGET_STATE_URL)
+            else:
+                self._store = LocalWindowStore()
+        return self._store
+
+    def evaluate(self, metrics, now=None):
+        """Fold metrics into their budgets' windows; returns the state changes that were pushed"""
+        try:
+            return self._evaluate(metrics, now)
+        except Exception:
+            # Budgets are advisory; ingestion must not fail because the window store is down
+            logger.exception("Budget evaluation failed")
+            return []
+
+    def _evaluate(self, metrics, now=None):
+        if not metrics:
+            return []
+        budgets = budgets_for({metric.project_id for metric in metrics})
+        by_type = {}
+        for project_budgets in budgets.values():
+            for budget in project_budgets:
+                by_type.setdefault((budget.project_id, budget.metric_type), []).append(budget)
+        if not by_type:
+            return []
+
+        now = (now or timezone.now()).timestamp()
+        slots = settings.BUDGET_WINDOW_SLOTS
+        increments = {}
+        touched = {}
+        for metric in metrics:
+            for budget in by_type.get((str(metric.project_id), metric.metric_type), ()):
+                width = budget.window_seconds / slots
+                current = int(now // width)
+                # Clock skew can put points slightly in the future; count them in the current slot
+                index = min(int(metric.timestamp.timestamp() // width), current)
+                if index <= current - slots:
+                    continue
+                slot = increments.get((budget.id, index))
+                if slot is None:
+                    slot = increments[(budget.id, index)] = [0, 0, 0.0]
+                slot[0] += 1
+                slot[1] += metric.value > budget.threshold
+                slot[2] += metric.value
+                touched[budget.id] = (budget, current)
+        if not touched:
+            return []
+
+        store = self.store
+        ttl = int(settings.BUDGET_MAX_WINDOW_SECONDS * 2)
+        store.add(increments, ttl)
+
+        checked = list(touched.values())
+        totals = store.totals([
+            (budget.id, range(current - slots + 1, current + 1)) for budget, current in checked
+        ])
+        results = [
+            (budget, count, above, total, self.breached(budget, count, above, total))
+            for (budget, _), (count, above, total) in zip(checked, totals)
+        ]
+        previous = store.swap_states(
+            [(budget.id, 'breached' if breached else 'ok') for budget, _, _, _, breached in results],
+            ttl
+        )
+
+        changes = []
+        for (budget, count, above, total, breached), state in zip(results, previous):
+            # A budget with no recorded state only announces itself when it breaches
+            if breached and state != 'breached':
+                changes.append(self.message(budget, 'breached', count, above, total, now))
+            elif not breached and state == 'breached':
+                changes.append(self.message(budget, 'recovered', count, above, total, now))
+
+        if changes:
+            self.notify(changes)
+        return changes
+
+    @staticmethod
+    def breached(budget, count, above, total):
+        if count < budget.min_samples:
+            return False
+        quantile = QUANTILES[budget.statistic]
+        if quantile is None:
+            return total / count > budget.threshold
+        return above / count > 1 - quantile
+
+    @staticmethod
+    def message(budget, status, count, above, total, now):
+        return {
+            'budget_id': budget.id,
+            'project_id': budget.project_id,
+            'name': budget.name,
+            'metric_type': budget.metric_type,
+            'statistic': budget.statistic,
+            'threshold': budget.threshold,
+            'window_seconds': budget.window_seconds,
+            'status': status,
+            'samples': count,
+            'over_threshold': above / count if count else 0.0,
+            'avg': total / count if count else None,
+            'timestamp': now,
+        }
+
+    def notify(self, changes):
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        send = async_to_sync(channel_layer.group_send)
+        for change in changes:
+            send(f"performance_{change['project_id']}", {
+                'type': 'budget_breach' if change['status'] == 'breached' else 'budget_recovered',
+                'data': change
+            })
+
+
+budget_evaluator = BudgetEvaluator()
+
+
+def evaluate_budgets(metrics, now=None):
+    return budget_evaluator.evaluate(metrics, now)
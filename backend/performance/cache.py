@@ -0,0 +1,97 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'perf:dashboard:version:{project_id}'
+ENTRY_KEY = 'perf:dashboard:{project_id}:{version}:{params}'
+STALE_KEY = 'perf:dashboard:stale:{project_id}:{params}'
+
+
+def _new_version():
+    # Nanosecond seed so a version key lost to eviction never reuses an old number
+    return time.time_ns()
+
+
+def dashboard_version(project_id):
+    return cache.get_or_set(VERSION_KEY.format(project_id=project_id), _new_version, timeout=None)
+
+
+def invalidate_dashboard(*project_ids):
+    """Bump the dashboard version of every project so cached payloads stop matching"""
+    for project_id in {str(project_id) for project_id in project_ids if project_id}:
+        key = VERSION_KEY.format(project_id=project_id)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, _new_version(), timeout=None)
+        except Exception as e:
+            # Writes must not fail because the cache is down; entries still expire by TTL
+            logger.warning(f"Could not invalidate dashboard cache for {project_id}: {e}")
+
+
+def get_dashboard(project_id, params):
+    """Current cached entry for ``params`` or None; costs two cache round trips and no queries"""
+    try:
+        key = ENTRY_KEY.format(project_id=project_id, version=dashboard_version(project_id), params=params)
+        return cache.get(key)
+    except Exception as e:
+        logger.warning(f"Could not read dashboard cache for {project_id}: {e}")
+        return None
+
+
+def get_or_compute_dashboard(project_id, params, compute):
+    """Return ``(entry, state)`` where state is 'hit', 'miss', 'stale' or 'bypass'.
+
+    Only the request that wins the recompute lock calls ``compute`` and
+    caches the result; others are served the previous payload for the same
+    parameters, or wait up to DASHBOARD_CACHE_WAIT_SECONDS for the winner
+    when there is none and then compute without caching ('bypass'). When the
+    cache is unreachable every request computes directly ('bypass').
+    """
+    try:
+        key = ENTRY_KEY.format(project_id=project_id, version=dashboard_version(project_id), params=params)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry, 'hit'
+
+        stale_key = STALE_KEY.format(project_id=project_id, params=params)
+        lock_key = f'{key}:lock'
+        acquired = cache.add(lock_key, 1, timeout=settings.DASHBOARD_CACHE_LOCK_SECONDS)
+        if not acquired:
+            entry = cache.get(stale_key)
+            if entry is not None:
+                return entry, 'stale'
+            deadline = time.monotonic() + settings.DASHBOARD_CACHE_WAIT_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = cache.get(key)
+                if entry is not None:
+                    return entry, 'hit'
+    except Exception as e:
+        logger.warning(f"Dashboard cache unavailable for {project_id}, computing directly: {e}")
+        return compute(), 'bypass'
+
+    if not acquired:
+        # The lock holder is slow or died; compute for this request and leave the
+        # cache and the lock to the holder rather than hold a worker any longer
+        return compute(), 'bypass'
+
+    try:
+        entry = compute()
+        try:
+            cache.set(key, entry, timeout=settings.DASHBOARD_CACHE_TTL)
+            cache.set(stale_key, entry, timeout=settings.DASHBOARD_CACHE_STALE_TTL)
+        except Exception as e:
+            logger.warning(f"Could not cache dashboard for {project_id}: {e}")
+    finally:
+        try:
+            cache.delete(lock_key)
+        except Exception as e:
+            # The lock expires after DASHBOARD_CACHE_LOCK_SECONDS
+            logger.warning(f"Could not release dashboard lock for {project_id}: {e}")
+    return entry, 'miss'
@@ -0,0 +1,207 @@
+import heapq
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import ComponentAnalysis, ComponentRollup
+from .rollups import Aggregate, floor_time
+
+LEADERBOARD_MAX_LIMIT = 100
+
+ROLLUP_FIELDS = [
+    'count', 'render_sum', 'render_min', 'render_max', 'render_sketch',
+    're_render_total', 'memory_sum', 'memory_max',
+]
+
+
+class ComponentAggregate:
+    """Render-time distribution plus re-render and memory totals for one component"""
+    __slots__ = ('render', 're_renders', 'memory_sum', 'memory_max')
+
+    def __init__(self):
+        self.render = Aggregate()
+        self.re_renders = 0
+        self.memory_sum = 0.0
+        self.memory_max = None
+
+    def add(self, analysis):
+        self.render.add(analysis.render_time)
+        self.re_renders += analysis.re_render_count
+        self.memory_sum += analysis.memory_usage
+        if self.memory_max is None or analysis.memory_usage > self.memory_max:
+            self.memory_max = analysis.memory_usage
+
+    def merge(self, count, render_sum, render_min, render_max, render_sketch, re_renders, memory_sum, memory_max):
+        if not count:
+            return
+        self.render.merge(count, render_sum, render_min, render_max, render_sketch or None)
+        self.re_renders += re_renders
+        self.memory_sum += memory_sum
+        if self.memory_max is None or memory_max > self.memory_max:
+            self.memory_max = memory_max
+
+    def combine(self, other):
+        self.render.combine(other.render)
+        self.re_renders += other.re_renders
+        self.memory_sum += other.memory_sum
+        if other.memory_max is not None and (self.memory_max is None or other.memory_max > self.memory_max):
+            self.memory_max = other.memory_max
+        return self
+
+    @property
+    def p95(self):
+        return self.render.sketch.quantile(0.95)
+
+    @property
+    def avg_memory(self):
+        return self.memory_sum / self.render.count if self.render.count else None
+
+    def apply(self, rollup):
+        """Write this aggregate, merged with what the row already holds, onto ``rollup``"""
+        merged = ComponentAggregate()
+        merged.merge(*(getattr(rollup, field) for field in ROLLUP_FIELDS))
+        merged.combine(self)
+        rollup.count = merged.render.count
+        rollup.render_sum = merged.render.sum
+        rollup.render_min = merged.render.min
+        rollup.render_max = merged.render.max
+        rollup.render_sketch = merged.render.sketch.to_dict()
+        rollup.re_render_total = merged.re_renders
+        rollup.memory_sum = merged.memory_sum
+        rollup.memory_max = merged.memory_max
+
+
+RANKINGS = {
+    'p95': lambda aggregate: aggregate.p95 or 0,
+    're_renders': lambda aggregate: aggregate.re_renders,
+    'memory': lambda aggregate: aggregate.avg_memory or 0,
+    'max': lambda aggregate: aggregate.render.max or 0,
+}
+
+
+def _project_key(project_id):
+    # Socket ingest carries the project id from the URL as a string; rollup rows hold UUIDs
+    return project_id if isinstance(project_id, uuid.UUID) else uuid.UUID(str(project_id))
+
+
+def _bucket_key(analysis):
+    return (
+        _project_key(analysis.project_id),
+        analysis.component_name,
+        analysis.file_path,
+        floor_time(analysis.timestamp, 'hour')
+    )
+
+
+def _merge_into_rollups(batch):
+    keys = batch.keys()
+    # Lock the buckets this batch touches so concurrent ingests merge instead of overwrite
+    existing = ComponentRollup.objects.select_for_update().filter(
+        project_id__in={key[0] for key in keys},
+        component_name__in={key[1] for key in keys},
+        bucket_start__in={key[3] for key in keys}
+    )
+    rows = {(row.project_id, row.component_name, row.file_path, row.bucket_start): row for row in existing}
+
+    updated = []
+    created = []
+    for (project_id, component_name, file_path, bucket_start), aggregate in batch.items():
+        row = rows.get((project_id, component_name, file_path, bucket_start))
+        if row is None:
+            row = ComponentRollup(
+                project_id=project_id,
+                component_name=component_name,
+                file_path=file_path,
+                bucket_start=bucket_start
+            )
+            created.append(row)
+        else:
+            updated.append(row)
+        aggregate.apply(row)
+
+    ComponentRollup.objects.bulk_update(updated, ROLLUP_FIELDS, batch_size=settings.METRICS_BULK_CHUNK_SIZE)
+    ComponentRollup.objects.bulk_create(created, batch_size=settings.METRICS_BULK_CHUNK_SIZE)
+
+
+def update_component_rollups(analyses):
+    """Fold new ComponentAnalysis samples into their hourly per-component rollups"""
+    batch = {}
+    for analysis in analyses:
+        key = _bucket_key(analysis)
+        aggregate = batch.get(key)
+        if aggregate is None:
+            aggregate = batch[key] = ComponentAggregate()
+        aggregate.add(analysis)
+    if not batch:
+        return 0
+
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                _merge_into_rollups(batch)
+            return len(batch)
+        except IntegrityError:
+            # Another ingest created one of the buckets first; the retry locks and merges into it
+            if attempt:
+                raise
+
+
+def rebuild_component_rollups(start, end, filters=None):
+    """Recompute hourly component rollups for [start, end) from raw samples"""
+    start = floor_time(start, 'hour')
+    end = floor_time(end, 'hour')
+    queryset = ComponentAnalysis.objects.filter(timestamp__gte=start, timestamp__lt=end, **(filters or {}))
+    rollups = ComponentRollup.objects.filter(bucket_start__gte=start, bucket_start__lt=end, **(filters or {}))
+
+    with transaction.atomic():
+        rollups.delete()
+        return update_component_rollups(queryset.order_by().iterator(chunk_size=settings.ROLLUP_CHUNK_SIZE))
+
+
+def refresh_component_rollups(analyses):
+    """Rebuild the buckets of edited or deleted samples from the raw rows they now hold"""
+    for project_id, component_name, file_path, bucket_start in {_bucket_key(analysis) for analysis in analyses}:
+        rebuild_component_rollups(
+            bucket_start,
+            bucket_start + timedelta(hours=1),
+            {'project_id': project_id, 'component_name': component_name, 'file_path': file_path}
+        )
+
+
+def leaderboard(filters, start, end, rank_by='p95', limit=10):
+    """Top ``limit`` components over hour-aligned [start, end) ranked by ``rank_by``.
+
+    Reads one rollup row per component and hour, so the cost depends on the
+    number of components in the window rather than on the number of samples.
+    """
+    components = {}
+    rows = ComponentRollup.objects.filter(
+        bucket_start__gte=floor_time(start, 'hour'),
+        bucket_start__lt=end,
+        **filters
+    ).order_by().values_list('component_name', 'file_path', *ROLLUP_FIELDS)
+
+    for component_name, file_path, *values in rows.iterator(chunk_size=settings.ROLLUP_CHUNK_SIZE):
+        aggregate = components.get((component_name, file_path))
+        if aggregate is None:
+            aggregate = components[(component_name, file_path)] = ComponentAggregate()
+        aggregate.merge(*values)
+
+    score = RANKINGS[rank_by]
+    top = heapq.nlargest(limit, components.items(), key=lambda item: score(item[1]))
+    return [
+        {
+            'component_name': component_name,
+            'file_path': file_path,
+            'samples': aggregate.render.count,
+            'avg_render_time': aggregate.render.avg,
+            'p95_render_time': aggregate.p95,
+            'max_render_time': aggregate.render.max,
+            're_renders': aggregate.re_renders,
+            'avg_memory_usage': aggregate.avg_memory,
+            'max_memory_usage': aggregate.memory_max,
+        }
+        for (component_name, file_path), aggregate in top
+    ]
@@ -0,0 +1,54 @@
+import math
+
+
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling.
+
+    ``points`` is a list of ``(x, y)`` pairs sorted by ``x``; returns the
+    indices of at most ``threshold`` points that preserve the visual shape
+    of the series, always keeping the first and last point.
+    """
+    count = len(points)
+    if threshold >= count or count <= 2:
+        return list(range(count))
+    if threshold <= 2:
+        return [0, count - 1][:max(threshold, 1)]
+
+    selected = [0]
+    bucket_size = (count - 2) / (threshold - 2)
+    previous = 0
+
+    for bucket in range(threshold - 2):
+        start = int(math.floor(bucket * bucket_size)) + 1
+        end = int(math.floor((bucket + 1) * bucket_size)) + 1
+
+        # Average of the next bucket is the third vertex of the triangle
+        next_start = end
+        next_end = min(int(math.floor((bucket + 2) * bucket_size)) + 1, count)
+        span = next_end - next_start
+        avg_x = sum(points[index][0] for index in range(next_start, next_end)) / span
+        avg_y = sum(points[index][1] for index in range(next_start, next_end)) / span
+
+        prev_x, prev_y = points[previous]
+        best_area = -1
+        best = start
+        for index in range(start, end):
+            x, y = points[index]
+            area = abs((prev_x - avg_x) * (y - prev_y) - (prev_x - x) * (avg_y - prev_y))
+            if area > best_area:
+                best_area = area
+                best = index
+
+        selected.append(best)
+        previous = best
+
+    selected.append(count - 1)
+    return selected
+
+
+def merge_adjacent(items, max_points, combine):
+    """Merge consecutive items into groups so at most ``max_points`` remain"""
+    if len(items) <= max_points:
+        return items
+    size = math.ceil(len(items) / max_points)
+    return [combine(items[start:start + size]) for start in range(0, len(items), size)]
@@ -0,0 +1,186 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.conf import settings
+
+from .models import PerformanceMetric
+
+EXPORT_FIELDS = ['id', 'project_id', 'metric_type', 'value', 'timestamp', 'url', 'user_agent']
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+
+class ExportError(Exception):
+    """Raised when an export cannot be produced in the requested format"""
+
+
+def export_rows(queryset, chunk_size=None):
+    """Stream metric rows in (timestamp, id) order through a server-side cursor"""
+    return queryset.order_by('timestamp', 'id').values_list(*EXPORT_FIELDS).iterator(
+        chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE
+    )
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_ndjson(rows, batch_size=None):
+    for batch in _batches(rows, batch_size or settings.EXPORT_CHUNK_SIZE):
+        yield ''.join(
+            json.dumps({
+                'id': str(metric_id),
+                'project_id': str(project_id),
+                'metric_type': metric_type,
+                'value': value,
+                'timestamp': timestamp.isoformat(),
+                'url': url,
+                'user_agent': user_agent,
+            }) + '\n'
+            for metric_id, project_id, metric_type, value, timestamp, url, user_agent in batch
+        ).encode('utf-8')
+
+
+def iter_csv(rows, batch_size=None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+
+    for batch in _batches(rows, batch_size or settings.EXPORT_CHUNK_SIZE):
+        writer.writerows(
+            (str(metric_id), str(project_id), metric_type, value, timestamp.isoformat(), url, user_agent)
+            for metric_id, project_id, metric_type, value, timestamp, url, user_agent in batch
+        )
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _StreamSink:
+    """Write-only file object that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def writable(self):
+        return True
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_table(pa, schema, batch):
+    columns = list(zip(*batch))
+    return pa.Table.from_arrays(
+        [
+            pa.array([str(value) for value in columns[0]], pa.string()),
+            pa.array([str(value) for value in columns[1]], pa.string()),
+            pa.array(columns[2], pa.string()).dictionary_encode(),
+            pa.array(columns[3], pa.float64()),
+            pa.array(columns[4], pa.timestamp('us', tz='UTC')),
+            pa.array(columns[5], pa.string()),
+            pa.array(columns[6], pa.string()),
+        ],
+        schema=schema
+    )
+
+
+def iter_columnar(rows, file_format, row_group_size=None):
+    """Encode rows as Parquet or an Arrow IPC stream, one row group/record batch at a time"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError(f'{file_format} export requires pyarrow to be installed')
+
+    schema = pa.schema([
+        ('id', pa.string()),
+        ('project_id', pa.string()),
+        ('metric_type', pa.dictionary(pa.int8(), pa.string())),
+        ('value', pa.float64()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('url', pa.string()),
+        ('user_agent', pa.string()),
+    ])
+
+    def generate():
+        sink = _StreamSink()
+        if file_format == 'parquet':
+            writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+
+        for batch in _batches(rows, row_group_size or settings.EXPORT_ROW_GROUP_SIZE):
+            writer.write_table(_arrow_table(pa, schema, batch))
+            yield sink.drain()
+
+        writer.close()
+        yield sink.drain()
+
+    return generate()
+
+
+def stream_export(rows, file_format, row_group_size=None):
+    """Encoded byte chunks for ``file_format``; memory is bounded by one batch"""
+    if file_format == 'ndjson':
+        return iter_ndjson(rows)
+    if file_format == 'csv':
+        return iter_csv(rows)
+    if file_format in ('parquet', 'arrow'):
+        return iter_columnar(rows, file_format, row_group_size)
+    raise ExportError(f"Unknown export format '{file_format}'; use one of {', '.join(CONTENT_TYPES)}")
+
+
+def filter_metrics(queryset, project_id=None, metric_type=None, since=None, until=None):
+    if project_id:
+        queryset = queryset.filter(project_id=project_id)
+    if metric_type:
+        queryset = queryset.filter(metric_type=metric_type)
+    if since:
+        queryset = queryset.filter(timestamp__gte=since)
+    if until:
+        queryset = queryset.filter(timestamp__lt=until)
+    return queryset
+
+
+def export_metrics(file_format, project_id=None, metric_type=None, since=None, until=None,
+                   queryset=None, chunk_size=None, row_group_size=None):
+    """Filter metrics and return an iterator of encoded export chunks"""
+    queryset = filter_metrics(
+        queryset if queryset is not None else PerformanceMetric.objects.all(),
+        project_id, metric_type, since, until
+    )
+    return stream_export(export_rows(queryset, chunk_size), file_format, row_group_size)
@@ -0,0 +1,213 @@
+import gzip
+import io
+import json
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from realtime.live import broadcast_metrics
+
+from .budgets import evaluate_budgets
+from .cache import invalidate_dashboard
+from .components import update_component_rollups
+from .retention import retention_cutoff
+from .rollups import mark_late_metrics
+from .models import PerformanceMetric, ComponentAnalysis
+
+METRIC_TYPES = {choice for choice, _ in PerformanceMetric.METRIC_TYPES}
+URL_MAX_LENGTH = PerformanceMetric._meta.get_field('url').max_length
+COMPONENT_NAME_MAX_LENGTH = ComponentAnalysis._meta.get_field('component_name').max_length
+FILE_PATH_MAX_LENGTH = ComponentAnalysis._meta.get_field('file_path').max_length
+
+
+class IngestError(ValueError):
+    """Raised when a bulk payload cannot be decoded as a whole"""
+
+
+def decode_payload(body, content_type='', content_encoding=''):
+    """Decode a JSON array, NDJSON or gzip-compressed NDJSON body.
+
+    Returns a list of ``(index, record, error)`` tuples so that a single
+    malformed NDJSON line is reported as a reject instead of failing the batch.
+    """
+    max_bytes = settings.METRICS_BULK_MAX_BYTES
+
+    if 'gzip' in content_encoding or body[:2] == b'\x1f\x8b':
+        try:
+            with gzip.GzipFile(fileobj=io.BytesIO(body)) as stream:
+                body = stream.read(max_bytes + 1)
+        except (OSError, EOFError) as e:
+            raise IngestError(f'Invalid gzip payload: {e}')
+
+    if len(body) > max_bytes:
+        raise IngestError(f'Payload exceeds {max_bytes} bytes')
+
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError:
+        raise IngestError('Payload must be UTF-8 encoded')
+
+    stripped = text.lstrip()
+    if 'ndjson' not in content_type and stripped.startswith('['):
+        try:
+            records = json.loads(stripped)
+        except json.JSONDecodeError as e:
+            raise IngestError(f'Invalid JSON array: {e}')
+        return [(index, record, None) for index, record in enumerate(records)]
+
+    # NDJSON: one record per line, blank lines are ignored
+    decoded = []
+    for index, line in enumerate(line for line in text.splitlines() if line.strip()):
+        try:
+            decoded.append((index, json.loads(line), None))
+        except json.JSONDecodeError as e:
+            decoded.append((index, None, f'Invalid JSON: {e.msg}'))
+    return decoded
+
+
+def parse_timestamp(value):
+    """Parse an ISO-8601 string or Unix epoch seconds into an aware datetime"""
+    if value is None:
+        return timezone.now()
+    if isinstance(value, bool):
+        raise ValueError('timestamp must be an ISO-8601 string or epoch seconds')
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError('timestamp is not a valid ISO-8601 datetime')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
+    raise ValueError('timestamp must be an ISO-8601 string or epoch seconds')
+
+
+def _number(record, field, default=None):
+    value = record.get(field, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f'{field} must be a finite number')
+    return value
+
+
+def validate_record(record, project_id, oldest=None):
+    """Validate a single decoded record and build an unsaved PerformanceMetric.
+
+    ``oldest`` rejects timestamps from before the project's raw retention,
+    which would be purged again and cannot be folded into its rollups.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('record must be a JSON object')
+
+    record_project = record.get('project', record.get('project_id'))
+    if record_project is not None and str(record_project) != str(project_id):
+        raise ValueError('record belongs to a different project')
+
+    metric_type = record.get('metric_type')
+    if metric_type not in METRIC_TYPES:
+        raise ValueError(f'metric_type must be one of {sorted(METRIC_TYPES)}')
+
+    value = _number(record, 'value')
+
+    url = record.get('url') or ''
+    user_agent = record.get('user_agent') or ''
+    if not isinstance(url, str) or len(url) > URL_MAX_LENGTH:
+        raise ValueError(f'url must be a string of at most {URL_MAX_LENGTH} characters')
+    if not isinstance(user_agent, str):
+        raise ValueError('user_agent must be a string')
+
+    try:
+        timestamp = parse_timestamp(record.get('timestamp'))
+    except (ValueError, OverflowError, OSError) as e:
+        raise ValueError(str(e))
+    if oldest is not None and timestamp < oldest:
+        raise ValueError(f'timestamp is older than the raw retention window (before {oldest.isoformat()})')
+
+    return PerformanceMetric(
+        project_id=project_id,
+        metric_type=metric_type,
+        value=float(value),
+        timestamp=timestamp,
+        url=url,
+        user_agent=user_agent
+    )
+
+
+def validate_component_record(record, project_id):
+    """Validate a component sample and build an unsaved ComponentAnalysis"""
+    if not isinstance(record, dict):
+        raise ValueError('record must be a JSON object')
+
+    component_name = record.get('component_name')
+    file_path = record.get('file_path') or ''
+    if not isinstance(component_name, str) or not component_name or len(component_name) > COMPONENT_NAME_MAX_LENGTH:
+        raise ValueError(f'component_name must be a non-empty string of at most {COMPONENT_NAME_MAX_LENGTH} characters')
+    if not isinstance(file_path, str) or len(file_path) > FILE_PATH_MAX_LENGTH:
+        raise ValueError(f'file_path must be a string of at most {FILE_PATH_MAX_LENGTH} characters')
+
+    counts = {}
+    for field in ('re_render_count', 'props_count', 'children_count'):
+        count = record.get(field, 0)
+        if isinstance(count, bool) or not isinstance(count, int) or count < 0:
+            raise ValueError(f'{field} must be a non-negative integer')
+        counts[field] = count
+
+    return ComponentAnalysis(
+        project_id=project_id,
+        component_name=component_name,
+        file_path=file_path,
+        render_time=float(_number(record, 'render_time', 0)),
+        memory_usage=float(_number(record, 'memory_usage', 0)),
+        **counts
+    )
+
+
+def validate_records(decoded, project):
+    """Validate decoded records in one pass, splitting them into rows and rejects"""
+    metrics = []
+    rejected = []
+    oldest = retention_cutoff([project.id], 'raw_days')[project.id]
+
+    for index, record, error in decoded:
+        if error is None:
+            try:
+                metrics.append(validate_record(record, project.id, oldest))
+                continue
+            except ValueError as e:
+                error = str(e)
+        rejected.append({'index': index, 'error': error})
+
+    return metrics, rejected
+
+
+def save_metrics(metrics, chunk_size=None):
+    """Insert metrics with chunked bulk_create inside a single transaction"""
+    chunk_size = chunk_size or settings.METRICS_BULK_CHUNK_SIZE
+
+    with transaction.atomic():
+        for start in range(0, len(metrics), chunk_size):
+            PerformanceMetric.objects.bulk_create(metrics[start:start + chunk_size])
+        # Rows behind the rollup watermarks get their hours re-aggregated by the beat task
+        mark_late_metrics(metrics)
+
+    invalidate_dashboard(*{row.project_id for row in metrics})
+    evaluate_budgets(metrics)
+    broadcast_metrics(metrics)
+    return len(metrics)
+
+
+def save_component_analyses(analyses, chunk_size=None):
+    """Insert component samples and fold them into the hourly component rollups in one transaction"""
+    chunk_size = chunk_size or settings.METRICS_BULK_CHUNK_SIZE
+
+    with transaction.atomic():
+        for start in range(0, len(analyses), chunk_size):
+            ComponentAnalysis.objects.bulk_create(analyses[start:start + chunk_size])
+        update_component_rollups(analyses)
+
+    invalidate_dashboard(*{row.project_id for row in analyses})
+    return len(analyses)
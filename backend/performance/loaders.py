@@ -0,0 +1,74 @@
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from graphene_django.fields import DjangoConnectionField
+
+from .models import Project
+
+
+class RequestLoaders:
+    """Request-scoped batch loaders for the GraphQL schema.
+
+    Every project id seen while resolving (connection pages, related lists)
+    is remembered, and the first lookup that misses loads all of them in a
+    single query, so resolving ``project`` on a page of 1,000 metrics or
+    ``metrics`` on a page of projects costs one query instead of one per row.
+    """
+
+    def __init__(self):
+        self.project_ids = set()
+        self.projects = {}
+        self.related = {}
+
+    def see(self, nodes):
+        for node in nodes:
+            if isinstance(node, Project):
+                self.projects[node.id] = node
+                self.project_ids.add(node.id)
+            elif getattr(node, 'project_id', None) is not None:
+                self.project_ids.add(node.project_id)
+
+    def project(self, project_id):
+        if project_id not in self.projects:
+            missing = {project_id} | (self.project_ids - self.projects.keys())
+            found = Project.objects.in_bulk(missing)
+            for key in missing:
+                self.projects[key] = found.get(key)
+        return self.projects[project_id]
+
+    def related_rows(self, model, project_id, limit):
+        """The first ``limit`` rows of ``model`` per project, in the model's default ordering"""
+        cache = self.related.setdefault((model, limit), {})
+        if project_id not in cache:
+            missing = ({project_id} | self.project_ids) - cache.keys()
+            ordering = model._meta.ordering
+            # One query for every project: number rows per project and keep the first `limit`
+            rows = model.objects.filter(project_id__in=missing).annotate(
+                row_number=Window(RowNumber(), partition_by=F('project_id'), order_by=ordering)
+            ).filter(row_number__lte=limit).order_by(*ordering)
+            for key in missing:
+                cache[key] = []
+            for row in rows:
+                cache[row.project_id].append(row)
+        return cache[project_id]
+
+
+def get_loaders(info):
+    request = info.context
+    loaders = getattr(request, 'graphql_loaders', None)
+    if loaders is None:
+        loaders = request.graphql_loaders = RequestLoaders()
+    return loaders
+
+
+class BatchedConnectionField(DjangoConnectionField):
+    """Connection field that registers each page with the request loaders"""
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager, queryset_resolver, max_limit,
+                            enforce_first_or_last, root, info, **args):
+        result = super().connection_resolver(
+            resolver, connection, default_manager, queryset_resolver, max_limit,
+            enforce_first_or_last, root, info, **args
+        )
+        get_loaders(info).see(edge.node for edge in result.edges)
+        return result
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from performance.components import rebuild_component_rollups
+from performance.ingest import parse_timestamp
+from performance.rollups import backfill_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute minute/hour/day metric rollups for a time range'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='ISO-8601 start of the range (default: 7 days ago)')
+        parser.add_argument('--until', help='ISO-8601 end of the range (default: now)')
+        parser.add_argument('--project', help='Only rebuild rollups for this project id')
+        parser.add_argument(
+            '--granularity',
+            action='append',
+            choices=['minute', 'hour', 'day'],
+            help='Tier to rebuild; repeat for several (default: all, finest first)'
+        )
+        parser.add_argument(
+            '--components',
+            action='store_true',
+            help='Also rebuild the hourly per-component rollups behind the leaderboard'
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            until = parse_timestamp(options['until']) if options['until'] else timezone.now()
+            since = parse_timestamp(options['since']) if options['since'] else until - timedelta(days=7)
+        except ValueError as e:
+            raise CommandError(str(e))
+        
+        if since >= until:
+            raise CommandError('--since must be before --until')
+        
+        filters = {'project_id': options['project']} if options['project'] else None
+        granularities = [
+            granularity for granularity in ('minute', 'hour', 'day')
+            if not options['granularity'] or granularity in options['granularity']
+        ]
+        
+        results = backfill_rollups(since, until, filters=filters, granularities=granularities)
+        for granularity, written in results.items():
+            self.stdout.write(f'{granularity}: {written} buckets written')
+        if options['components']:
+            written = rebuild_component_rollups(since, until, filters=filters)
+            self.stdout.write(f'components: {written} buckets written')
+        self.stdout.write(self.style.SUCCESS('Rollup backfill complete'))
@@ -0,0 +1,53 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from performance.export import CONTENT_TYPES, ExportError, export_metrics
+from performance.ingest import parse_timestamp
+
+
+class Command(BaseCommand):
+    help = 'Stream raw performance metrics to NDJSON, CSV, Parquet or Arrow with constant memory'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='file_format', choices=list(CONTENT_TYPES), default='ndjson')
+        parser.add_argument('--output', default='-', help='Output file path, or - for stdout')
+        parser.add_argument('--project', help='Only export metrics for this project id')
+        parser.add_argument('--metric-type', help='Only export this metric type')
+        parser.add_argument('--since', help='ISO-8601 start of the range (inclusive)')
+        parser.add_argument('--until', help='ISO-8601 end of the range (exclusive)')
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched per server-side cursor round trip')
+        parser.add_argument('--row-group-size', type=int, help='Rows per Parquet row group / Arrow record batch')
+    
+    def handle(self, *args, **options):
+        try:
+            since = parse_timestamp(options['since']) if options['since'] else None
+            until = parse_timestamp(options['until']) if options['until'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+        
+        try:
+            chunks = export_metrics(
+                options['file_format'],
+                project_id=options['project'],
+                metric_type=options['metric_type'],
+                since=since,
+                until=until,
+                chunk_size=options['chunk_size'],
+                row_group_size=options['row_group_size']
+            )
+        except ExportError as e:
+            raise CommandError(str(e))
+        
+        output = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} bytes to {options["output"]}'))
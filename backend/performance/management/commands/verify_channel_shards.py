@@ -0,0 +1,70 @@
+import asyncio
+import uuid
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from realtime.layers import MEMORY_SCHEME, ShardedChannelLayer, check_fanout, rendezvous
+
+
+def shard_label(url):
+    # Never print Redis credentials
+    parts = urlsplit(url)
+    if parts.password:
+        parts = parts._replace(netloc=parts.netloc.rsplit('@', 1)[1])
+    return parts.geturl()
+
+
+class Command(BaseCommand):
+    help = 'Check project-group fan-out and placement across channel layer shards'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            action='append',
+            help='Shard URL, repeat for several (e.g. local Redis stand-ins); default: in-memory shards'
+        )
+        parser.add_argument('--shards', type=int, default=4, help='Number of in-memory shards when no --url is given')
+        parser.add_argument('--projects', type=int, default=200, help='Simulated projects')
+        parser.add_argument('--sockets', type=int, default=3, help='Sockets per project group')
+        parser.add_argument('--timeout', type=float, default=5.0, help='Seconds to wait for each delivery round')
+    
+    def handle(self, *args, **options):
+        urls = options['url'] or [f'{MEMORY_SCHEME}shard-{index}' for index in range(options['shards'])]
+        if len(set(urls)) < 2:
+            raise CommandError('Need at least two distinct shards')
+        if options['projects'] < 1 or options['sockets'] < 1:
+            raise CommandError('--projects and --sockets must be positive')
+        
+        layer = ShardedChannelLayer(urls)
+        counts = asyncio.run(self.fanout(layer, options))
+        
+        # Placement of real-looking project keys, and what moves when one more shard joins
+        keys = [str(uuid.uuid4()) for _ in range(10000)]
+        placement = Counter(rendezvous(key, layer.shards) for key in keys)
+        for shard in layer.shards:
+            self.stdout.write(f'{shard_label(shard)}: {placement[shard] / len(keys):.1%} of projects')
+        
+        grown = tuple(sorted(layer.shards + (f'{MEMORY_SCHEME}added',)))
+        moved = [key for key in keys if rendezvous(key, grown) != rendezvous(key, layer.shards)]
+        stray = sum(1 for key in moved if rendezvous(key, grown) != f'{MEMORY_SCHEME}added')
+        self.stdout.write(
+            f'Adding a shard moves {len(moved) / len(keys):.1%} of projects '
+            f'(ideal {1 / len(grown):.1%}), {stray} between existing shards'
+        )
+        self.stdout.write(
+            f"{counts['channels']} channels: {counts['missing']} missing, "
+            f"{counts['misrouted']} misrouted, {counts['unexpected']} unexpected deliveries"
+        )
+        
+        if counts['missing'] or counts['misrouted'] or counts['unexpected'] or stray:
+            raise CommandError('Channel shard verification failed')
+        self.stdout.write(self.style.SUCCESS('Channel shard fan-out verified'))
+    
+    async def fanout(self, layer, options):
+        try:
+            return await check_fanout(layer, options['projects'], options['sockets'], options['timeout'])
+        finally:
+            await layer.flush()
+            await layer.close()
@@ -0,0 +1,144 @@
+import asyncio
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from performance.models import Project
+from realtime.buffer import write_buffer
+from realtime.loadtest import LoadTest, LoadTestError, create_projects, remove_injected, slo_violations
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive simulated dashboard sockets against ws/performance/<id>/ and ws/components/<id>/ '
+        'and check latency, throughput and memory against the LOADTEST_SLO_* settings. '
+        'Injected points are ingested like real traffic, into throwaway projects unless --project is given, '
+        'and are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100, help='Concurrent sockets')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds of injection')
+        parser.add_argument('--rate', type=float, default=10.0, help='Metric points per second per project')
+        parser.add_argument('--component-rate', type=float, default=1.0, help='Component samples per second per project')
+        parser.add_argument('--component-share', type=float, default=0.2, help='Fraction of sockets on ws/components/')
+        parser.add_argument('--project', action='append', help='Project id to load; repeat for several')
+        parser.add_argument('--projects', type=int, default=1, help='Throwaway projects to create when no --project is given')
+        parser.add_argument('--binary', action='store_true', help='Negotiate the binary subprotocol')
+        parser.add_argument(
+            '--url',
+            help='Base ws:// URL of a running server (needs the websockets package); default: in-process communicator'
+        )
+        parser.add_argument('--server-pid', type=int, help='Server process to sample RSS from when using --url')
+        parser.add_argument(
+            '--memory-layer',
+            action='store_true',
+            help='Run in-process against an in-memory channel layer instead of the configured one'
+        )
+        parser.add_argument('--drain', type=float, default=2.0, help='Seconds to wait for deliveries after injection')
+        parser.add_argument('--slo-p50-ms', type=float, help='Override LOADTEST_SLO_P50_MS')
+        parser.add_argument('--slo-p99-ms', type=float, help='Override LOADTEST_SLO_P99_MS')
+        parser.add_argument('--slo-min-delivery', type=float, help='Override LOADTEST_SLO_MIN_DELIVERY')
+        parser.add_argument('--slo-max-connection-kb', type=float, help='Override LOADTEST_SLO_MAX_CONNECTION_KB')
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1 or options['duration'] <= 0:
+            raise CommandError('--clients and --duration must be positive')
+        if options['rate'] < 0 or options['component_rate'] < 0 or not 0 <= options['component_share'] <= 1:
+            raise CommandError('Rates must be non-negative and --component-share between 0 and 1')
+        if options['memory_layer'] and options['url']:
+            raise CommandError('--memory-layer only applies to in-process runs')
+
+        owner = None
+        if options['project']:
+            try:
+                project_ids = [uuid.UUID(project_id) for project_id in options['project']]
+            except ValueError as e:
+                raise CommandError(f'Invalid --project: {e}')
+            missing = set(project_ids) - set(Project.objects.filter(id__in=project_ids).values_list('id', flat=True))
+            if missing:
+                raise CommandError(f"Unknown projects: {', '.join(sorted(map(str, missing)))}")
+        else:
+            if options['projects'] < 1:
+                raise CommandError('--projects must be positive')
+            owner, project_ids = create_projects(options['projects'])
+
+        started = timezone.now()
+        try:
+            load_test = LoadTest(
+                project_ids,
+                clients=options['clients'],
+                duration=options['duration'],
+                rate=options['rate'],
+                component_rate=options['component_rate'],
+                component_share=options['component_share'],
+                binary=options['binary'],
+                url=options['url'],
+                server_pid=options['server_pid'],
+                drain=options['drain']
+            )
+            if options['memory_layer']:
+                with override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}):
+                    report = asyncio.run(load_test.run())
+            else:
+                report = asyncio.run(load_test.run())
+        except LoadTestError as e:
+            raise CommandError(str(e))
+        finally:
+            self.clean_up(owner, project_ids, started, options['url'])
+
+        self.write_report(report)
+        for error in load_test.connect_errors[:10]:
+            self.stderr.write(f'connect failed: {error}')
+
+        violations = slo_violations(
+            report,
+            p50_ms=options['slo_p50_ms'],
+            p99_ms=options['slo_p99_ms'],
+            min_delivery=options['slo_min_delivery'],
+            max_connection_kb=options['slo_max_connection_kb']
+        )
+        if violations:
+            raise CommandError('SLO violated: ' + '; '.join(violations))
+        self.stdout.write(self.style.SUCCESS('Load test within SLOs'))
+
+    def clean_up(self, owner, project_ids, started, url):
+        if url:
+            # A remote server's write-behind buffer may still hold injected rows
+            time.sleep(2 * settings.REALTIME_BUFFER_FLUSH_INTERVAL)
+        else:
+            # Rows an interrupted in-process run left in the buffer would land after the cleanup
+            write_buffer.drain_sync()
+        if owner is not None:
+            owner.delete()
+            self.stdout.write(f'Deleted {len(project_ids)} throwaway projects')
+            return
+        metrics, components = remove_injected(project_ids, started)
+        self.stdout.write(f'Deleted {metrics} injected metrics and {components} component samples')
+
+    def write_report(self, report):
+        def ms(value):
+            return 'n/a' if value is None else f'{value:.1f} ms'
+
+        self.stdout.write(
+            f"{report['connected']}/{report['clients']} sockets connected in {report['connect_seconds']:.2f}s, "
+            f"{report['connect_errors']} connect errors, {report['socket_errors']} socket errors"
+        )
+        self.stdout.write(
+            f"injected {report['metrics_sent']} metrics and {report['components_sent']} component samples "
+            f"over {report['seconds']:.1f}s"
+        )
+        self.stdout.write(
+            f"delivered {report['deliveries']} ({report['delivery_ratio']:.1%} of expected), "
+            f"{report['frames']} frames, {report['frames_per_second']:.0f} frames/s"
+        )
+        self.stdout.write(
+            f"latency p50 {ms(report['p50_ms'])}, p90 {ms(report['p90_ms'])}, "
+            f"p99 {ms(report['p99_ms'])}, max {ms(report['max_ms'])}"
+        )
+        memory = report['kb_per_connection']
+        self.stdout.write(f"memory {'n/a' if memory is None else f'{memory:.1f} KB'} per connection")
@@ -42,11 +42,85 @@ class PerformanceMetric(models.Model):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['project', 'metric_type', 'timestamp']),
+            models.Index(fields=['timestamp']),
         ]
     
     def __str__(self):
         return f"{self.project.name} - {self.get_metric_type_display()}: {self.value}"
 
+class MetricRollup(models.Model):
+    """Pre-aggregated PerformanceMetric values per project, metric type and time bucket"""
+    GRANULARITIES = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='metric_rollups')
+    metric_type = models.CharField(max_length=20, choices=PerformanceMetric.METRIC_TYPES)
+    granularity = models.CharField(max_length=10, choices=GRANULARITIES)
+    bucket_start = models.DateTimeField()
+    count = models.BigIntegerField(default=0)
+    sum = models.FloatField(default=0)
+    min = models.FloatField(null=True)
+    max = models.FloatField(null=True)
+    sketch = models.JSONField(default=dict)
+    
+    class Meta:
+        ordering = ['-bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['project', 'granularity', 'bucket_start', 'metric_type'],
+                name='unique_metric_rollup_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.project_id} - {self.metric_type} {self.granularity} @ {self.bucket_start}"
+
+class RollupWatermark(models.Model):
+    """Exclusive end of the buckets already aggregated for a rollup granularity"""
+    granularity = models.CharField(max_length=10, choices=MetricRollup.GRANULARITIES, unique=True)
+    position = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.granularity} rollups up to {self.position}"
+
+class RollupDirtyBucket(models.Model):
+    """Hour of a project that received rows behind the rollup watermarks and must be re-aggregated"""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    bucket_start = models.DateTimeField()
+    marked_at = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'bucket_start'], name='unique_rollup_dirty_bucket'),
+        ]
+    
+    def __str__(self):
+        return f"{self.project_id} rollups dirty @ {self.bucket_start}"
+
+class RetentionPolicy(models.Model):
+    """Per-project retention in days for each data tier; null keeps the tier forever"""
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, related_name='retention_policy')
+    raw_days = models.PositiveIntegerField(null=True, blank=True)
+    component_days = models.PositiveIntegerField(null=True, blank=True)
+    minute_rollup_days = models.PositiveIntegerField(null=True, blank=True)
+    hour_rollup_days = models.PositiveIntegerField(null=True, blank=True)
+    day_rollup_days = models.PositiveIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'retention policies'
+    
+    def __str__(self):
+        return f"Retention for {self.project_id}"
+
 class ComponentAnalysis(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='component_analyses')
@@ -63,11 +137,132 @@ class ComponentAnalysis(models.Model):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['project', 'component_name']),
+            models.Index(fields=['project', 'timestamp']),
+            models.Index(fields=['timestamp']),
         ]
     
     def __str__(self):
         return f"{self.component_name} - {self.render_time}ms"
 
+class ComponentRollup(models.Model):
+    """Hourly per-component aggregate of ComponentAnalysis samples, maintained at ingest"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='component_rollups')
+    component_name = models.CharField(max_length=200)
+    file_path = models.CharField(max_length=500, blank=True)
+    bucket_start = models.DateTimeField()
+    count = models.BigIntegerField(default=0)
+    render_sum = models.FloatField(default=0)
+    render_min = models.FloatField(null=True)
+    render_max = models.FloatField(null=True)
+    render_sketch = models.JSONField(default=dict)
+    re_render_total = models.BigIntegerField(default=0)
+    memory_sum = models.FloatField(default=0)
+    memory_max = models.FloatField(null=True)
+    
+    class Meta:
+        ordering = ['-bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['project', 'bucket_start', 'component_name', 'file_path'],
+                name='unique_component_rollup_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['bucket_start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.component_name} @ {self.bucket_start}"
+
+class RenderProfile(models.Model):
+    """One React profiler commit stored as a columnar call tree (see performance.profiles.FlameGraph)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='render_profiles')
+    timestamp = models.DateTimeField(default=timezone.now)
+    duration = models.FloatField()
+    node_count = models.IntegerField()
+    graph = models.JSONField()
+    
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['project', 'timestamp']),
+            models.Index(fields=['timestamp']),
+        ]
+    
+    def __str__(self):
+        return f"Profile {self.project_id} @ {self.timestamp} ({self.duration}ms)"
+
+class FlameGraphBucket(models.Model):
+    """Render profiles of one project and hour merged into a single flame graph"""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='flame_graph_buckets')
+    bucket_start = models.DateTimeField()
+    profile_count = models.IntegerField(default=0)
+    graph = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'bucket_start'], name='unique_flame_graph_bucket'),
+        ]
+    
+    def __str__(self):
+        return f"Flame graph {self.project_id} @ {self.bucket_start}"
+
+class Release(models.Model):
+    """Deploy marker; a release covers the time until the project's next release"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='releases')
+    version = models.CharField(max_length=100)
+    commit_sha = models.CharField(max_length=64, blank=True)
+    description = models.TextField(blank=True)
+    deployed_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-deployed_at']
+        indexes = [
+            models.Index(fields=['project', 'deployed_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'version'], name='unique_release_version'),
+        ]
+    
+    def __str__(self):
+        return f"{self.project.name} {self.version}"
+
+class PerformanceBudget(models.Model):
+    """Threshold on a sliding-window statistic of one metric type, checked as metrics arrive"""
+    STATISTICS = [
+        ('avg', 'Average'),
+        ('p50', '50th percentile'),
+        ('p75', '75th percentile'),
+        ('p90', '90th percentile'),
+        ('p95', '95th percentile'),
+        ('p99', '99th percentile'),
+        ('max', 'Maximum'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='budgets')
+    name = models.CharField(max_length=200, blank=True)
+    metric_type = models.CharField(max_length=20, choices=PerformanceMetric.METRIC_TYPES)
+    statistic = models.CharField(max_length=10, choices=STATISTICS, default='p75')
+    threshold = models.FloatField()
+    window_seconds = models.PositiveIntegerField(default=300)
+    min_samples = models.PositiveIntegerField(default=20)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['metric_type', 'statistic']
+    
+    def __str__(self):
+        return f"{self.project.name} - {self.statistic}({self.metric_type}) <= {self.threshold}"
+
 class PerformanceIssue(models.Model):
     SEVERITY_CHOICES = [
         ('low', 'Low'),
@@ -93,6 +288,8 @@ class PerformanceIssue(models.Model):
     file_path = models.CharField(max_length=500, blank=True)
     line_number = models.IntegerField(null=True, blank=True)
     suggested_fix = models.TextField(blank=True)
+    # Stable key for automatically detected issues so repeated detections update one row
+    fingerprint = models.CharField(max_length=64, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,126 @@
+import base64
+import binascii
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on (timestamp, id) without COUNT or OFFSET.
+
+    Every page is one range scan that starts right after the last row of the
+    previous page, so deep pages cost the same as the first one. Ties on
+    ``timestamp`` are broken by ``id`` so no row is skipped or repeated.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('-timestamp', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        if page_size <= 0:
+            return api_settings.PAGE_SIZE
+        return min(page_size, settings.KEYSET_MAX_PAGE_SIZE)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            direction, timestamp, row_id = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8').split('|')
+            timestamp = parse_datetime(timestamp)
+            row_id = uuid.UUID(row_id)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if direction not in ('n', 'p') or timestamp is None:
+            raise NotFound(self.invalid_cursor_message)
+        return direction, timestamp, row_id
+
+    def encode_cursor(self, direction, row):
+        timestamp, row_id = (self._value(row, field.lstrip('-')) for field in self.ordering)
+        raw = f'{direction}|{timestamp.isoformat()}|{row_id}'
+        encoded = base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _value(self, row, field):
+        return row[field] if isinstance(row, dict) else getattr(row, field)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(request)
+
+        time_field, id_field = (field.lstrip('-') for field in self.ordering)
+        descending = self.ordering[0].startswith('-')
+        reverse = cursor is not None and cursor[0] == 'p'
+
+        if cursor is not None:
+            _, timestamp, row_id = cursor
+            lookup = 'lt' if descending != reverse else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{time_field}__{lookup}': timestamp})
+                | Q(**{time_field: timestamp, f'{id_field}__{lookup}': row_id})
+            )
+
+        if reverse:
+            ordering = [field.lstrip('-') if field.startswith('-') else f'-{field}' for field in self.ordering]
+        else:
+            ordering = list(self.ordering)
+
+        # One extra row tells whether there is another page in this direction
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else cursor is not None
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor('n', self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor('p', self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ChronologicalKeysetPagination(KeysetPagination):
+    """Oldest first, for walking a time window such as raw trends"""
+    ordering = ('timestamp', 'id')
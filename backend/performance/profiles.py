@@ -0,0 +1,271 @@
+import math
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Trunc
+
+from .ingest import COMPONENT_NAME_MAX_LENGTH, FILE_PATH_MAX_LENGTH, parse_timestamp
+from .models import FlameGraphBucket, RenderProfile
+from .rollups import WIDTHS, floor_time
+
+
+class FlameNode:
+    __slots__ = ('total', 'self_time', 'count', 'children')
+
+    def __init__(self, total=0.0, self_time=0.0, count=0):
+        self.total = total
+        self.self_time = self_time
+        self.count = count
+        self.children = {}
+
+    def merge(self, other):
+        stack = [(self, other)]
+        while stack:
+            mine, theirs = stack.pop()
+            mine.total += theirs.total
+            mine.self_time += theirs.self_time
+            mine.count += theirs.count
+            for frame, child in theirs.children.items():
+                existing = mine.children.get(frame)
+                if existing is None:
+                    mine.children[frame] = child
+                else:
+                    stack.append((existing, child))
+
+
+class FlameGraph:
+    """Render call tree keyed by (component name, file path) frames along each path.
+
+    Merging adds total time, self time and render count per path, so the
+    graph of a commit, an hour or a whole window has the same shape. The
+    serialized form is columnar: an interned frame table plus one
+    ``[parent, frame, total, self, count]`` row per node in pre-order.
+    """
+
+    def __init__(self):
+        self.root = FlameNode()
+
+    def merge(self, other):
+        self.root.merge(other.root)
+        return self
+
+    def to_dict(self):
+        frames = {}
+        nodes = []
+        stack = [(-1, frame, child) for frame, child in reversed(list(self.root.children.items()))]
+        while stack:
+            parent, frame, node = stack.pop()
+            index = len(nodes)
+            nodes.append([
+                parent,
+                frames.setdefault(frame, len(frames)),
+                round(node.total, 4),
+                round(node.self_time, 4),
+                node.count,
+            ])
+            stack.extend((index, child_frame, child) for child_frame, child in reversed(list(node.children.items())))
+        return {'frames': [list(frame) for frame in frames], 'nodes': nodes}
+
+    @classmethod
+    def from_dict(cls, data):
+        graph = cls()
+        frames = [tuple(frame) for frame in data['frames']]
+        built = []
+        for parent, frame, total, self_time, count in data['nodes']:
+            node = FlameNode(total, self_time, count)
+            parent_node = graph.root if parent < 0 else built[parent]
+            existing = parent_node.children.get(frames[frame])
+            if existing is None:
+                parent_node.children[frames[frame]] = node
+            else:
+                existing.merge(node)
+                node = existing
+            built.append(node)
+            if parent < 0:
+                graph.root.total += total
+                graph.root.count += count
+        return graph
+
+    def to_tree(self, min_fraction=0.0):
+        """Nested ``{name, file_path, total, self, count, children}`` with small subtrees pruned"""
+        threshold = self.root.total * min_fraction
+
+        def build(frame, node):
+            return {
+                'name': frame[0],
+                'file_path': frame[1],
+                'total': round(node.total, 3),
+                'self': round(node.self_time, 3),
+                'count': node.count,
+                'children': [],
+            }
+
+        tree = build(('root', ''), self.root)
+        stack = [(tree, self.root)]
+        while stack:
+            parent, node = stack.pop()
+            for child_frame, child in sorted(node.children.items(), key=lambda item: -item[1].total):
+                if child.total >= threshold:
+                    subtree = build(child_frame, child)
+                    parent['children'].append(subtree)
+                    stack.append((subtree, child))
+        tree['self'] = 0.0
+        return tree
+
+
+def _duration(node, field, required=True):
+    value = node.get(field)
+    if value is None and not required:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+        raise ValueError(f'{field} must be a non-negative number')
+    return float(value)
+
+
+def parse_profile(record, project_id):
+    """Validate one profiler commit and build an unsaved RenderProfile.
+
+    ``nodes`` is a flat list of ``{id, parent_id, name, file_path, duration,
+    self_duration}`` as exported by the React profiler; ``parent_id`` is
+    null for roots and ``self_duration`` defaults to ``duration`` minus the
+    children's durations.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('profile must be a JSON object')
+    nodes = record.get('nodes')
+    if not isinstance(nodes, list) or not nodes:
+        raise ValueError('nodes must be a non-empty list')
+    if len(nodes) > settings.PROFILE_MAX_NODES:
+        raise ValueError(f'a profile may contain at most {settings.PROFILE_MAX_NODES} nodes')
+
+    by_id = {}
+    children = {}
+    roots = []
+    for node in nodes:
+        if not isinstance(node, dict):
+            raise ValueError('every node must be a JSON object')
+        node_id = node.get('id')
+        if not isinstance(node_id, (int, str)) or isinstance(node_id, bool) or node_id in by_id:
+            raise ValueError('every node needs a unique integer or string id')
+        name = node.get('name')
+        file_path = node.get('file_path') or ''
+        if not isinstance(name, str) or not name or len(name) > COMPONENT_NAME_MAX_LENGTH:
+            raise ValueError(f'name must be a non-empty string of at most {COMPONENT_NAME_MAX_LENGTH} characters')
+        if not isinstance(file_path, str) or len(file_path) > FILE_PATH_MAX_LENGTH:
+            raise ValueError(f'file_path must be a string of at most {FILE_PATH_MAX_LENGTH} characters')
+        by_id[node_id] = (
+            (name, file_path),
+            _duration(node, 'duration'),
+            _duration(node, 'self_duration', required=False),
+        )
+        parent_id = node.get('parent_id')
+        if parent_id is None:
+            roots.append(node_id)
+        else:
+            children.setdefault(parent_id, []).append(node_id)
+
+    if any(parent_id not in by_id for parent_id in children):
+        raise ValueError('parent_id must reference a node of the same profile')
+
+    graph = FlameGraph()
+    stack = [(graph.root, node_id) for node_id in roots]
+    visited = 0
+    while stack:
+        parent, node_id = stack.pop()
+        visited += 1
+        frame, duration, self_duration = by_id[node_id]
+        child_ids = children.get(node_id, [])
+        if self_duration is None:
+            self_duration = max(duration - sum(by_id[child_id][1] for child_id in child_ids), 0.0)
+        node = FlameNode(duration, self_duration, 1)
+        existing = parent.children.get(frame)
+        if existing is None:
+            parent.children[frame] = node
+        else:
+            # Siblings rendering the same component (list items) share one frame
+            existing.merge(node)
+            node = existing
+        if parent is graph.root:
+            graph.root.total += duration
+            graph.root.count += 1
+        stack.extend((node, child_id) for child_id in child_ids)
+
+    if visited != len(by_id):
+        raise ValueError('parent_id references must form a tree without cycles')
+
+    try:
+        timestamp = parse_timestamp(record.get('timestamp'))
+    except (ValueError, OverflowError, OSError) as e:
+        raise ValueError(str(e))
+
+    return RenderProfile(
+        project_id=project_id,
+        timestamp=timestamp,
+        duration=graph.root.total,
+        node_count=len(by_id),
+        graph=graph.to_dict()
+    )
+
+
+def _bucket_counts(project_id, start, end):
+    rows = RenderProfile.objects.filter(
+        project_id=project_id,
+        timestamp__gte=start,
+        timestamp__lt=end
+    ).order_by().annotate(
+        bucket_start=Trunc('timestamp', 'hour', tzinfo=dt_timezone.utc)
+    ).values('bucket_start').annotate(profiles=Count('id'))
+    return {row['bucket_start']: row['profiles'] for row in rows}
+
+
+def build_bucket(project_id, bucket_start):
+    """Merge every profile of one hour into a single graph"""
+    graph = FlameGraph()
+    profiles = RenderProfile.objects.filter(
+        project_id=project_id,
+        timestamp__gte=bucket_start,
+        timestamp__lt=bucket_start + WIDTHS['hour']
+    ).order_by().values_list('graph', flat=True)
+    count = 0
+    for data in profiles.iterator(chunk_size=settings.ROLLUP_CHUNK_SIZE):
+        graph.merge(FlameGraph.from_dict(data))
+        count += 1
+    return FlameGraphBucket(project_id=project_id, bucket_start=bucket_start, profile_count=count, graph=graph.to_dict())
+
+
+def flame_graph(project_id, start, end):
+    """Flame graph for hour-aligned [start, end) merged from materialized hourly buckets.
+
+    A bucket is built once and rebuilt only when more profiles have landed
+    in its hour since; buckets whose raw profiles were purged are kept.
+    """
+    start = floor_time(start, 'hour')
+    counts = _bucket_counts(project_id, start, end)
+    buckets = {
+        bucket.bucket_start: bucket
+        for bucket in FlameGraphBucket.objects.filter(project_id=project_id, bucket_start__gte=start, bucket_start__lt=end)
+    }
+
+    stale = [
+        bucket_start for bucket_start, profiles in counts.items()
+        if bucket_start not in buckets or buckets[bucket_start].profile_count < profiles
+    ]
+    if stale:
+        rebuilt = [build_bucket(project_id, bucket_start) for bucket_start in stale]
+        with transaction.atomic():
+            FlameGraphBucket.objects.bulk_create(
+                rebuilt,
+                update_conflicts=True,
+                unique_fields=['project', 'bucket_start'],
+                update_fields=['profile_count', 'graph', 'updated_at']
+            )
+        buckets.update((bucket.bucket_start, bucket) for bucket in rebuilt)
+
+    graph = FlameGraph()
+    profiles = 0
+    for bucket_start in sorted(buckets):
+        graph.merge(FlameGraph.from_dict(buckets[bucket_start].graph))
+        profiles += buckets[bucket_start].profile_count
+    return graph, profiles
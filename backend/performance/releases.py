@@ -0,0 +1,200 @@
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .components import ComponentAggregate, ROLLUP_FIELDS
+from .models import ComponentAnalysis, ComponentRollup, Release
+from .rollups import plan_window, summarize
+
+QUANTILES = [0.5, 0.75]
+
+
+def release_window(release, hours=None):
+    """[deployed_at, next deploy or now), optionally capped to ``hours`` after the deploy"""
+    next_deploy = Release.objects.filter(
+        project_id=release.project_id,
+        deployed_at__gt=release.deployed_at
+    ).order_by('deployed_at').values_list('deployed_at', flat=True).first()
+    end = next_deploy or timezone.now()
+    if hours:
+        end = min(end, release.deployed_at + timedelta(hours=hours))
+    return release.deployed_at, end
+
+
+def sample_sketch(sketch, size, rng):
+    """Draw up to ``size`` values i.i.d. from a sketch's distribution.
+
+    This is a bounded reservoir over however many rows the sketch
+    summarizes; values carry the sketch's relative error.
+    """
+    if sketch is None or not sketch.count:
+        return np.empty(0)
+    values, counts = zip(*sketch.histogram())
+    counts = np.array(counts, dtype=np.float64)
+    return rng.choice(np.array(values), size=min(size, sketch.count), p=counts / counts.sum())
+
+
+def mann_whitney(base, target):
+    """Two-sided Mann-Whitney U test with tie correction (normal approximation).
+
+    ``probability_of_superiority`` is P(target > base) + P(tie) / 2, so values
+    above 0.5 mean the target release is slower/larger.
+    """
+    n1, n2 = len(base), len(target)
+    combined = np.concatenate([base, target])
+    _, inverse, counts = np.unique(combined, return_inverse=True, return_counts=True)
+    # Average rank of every distinct value
+    ranks = (np.cumsum(counts) - (counts - 1) / 2)[inverse]
+
+    u_target = ranks[n1:].sum() - n2 * (n2 + 1) / 2
+    mean = n1 * n2 / 2
+    n = n1 + n2
+    ties = (counts ** 3 - counts).sum()
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    z = 0.0
+    if variance > 0 and u_target != mean:
+        # Continuity correction towards the mean
+        z = (u_target - mean - math.copysign(0.5, u_target - mean)) / math.sqrt(variance)
+    p_value = math.erfc(abs(z) / math.sqrt(2))
+
+    return {
+        'u': float(u_target),
+        'z': float(z),
+        'p_value': float(p_value),
+        'probability_of_superiority': float(u_target / (n1 * n2)),
+    }
+
+
+def bootstrap_difference(base, target, rng, iterations, quantiles=QUANTILES, confidence=0.95):
+    """Bootstrap CIs for target - base at each quantile, all resamples drawn in one array op"""
+    base_stats = np.quantile(base[rng.integers(0, len(base), (iterations, len(base)))], quantiles, axis=1)
+    target_stats = np.quantile(target[rng.integers(0, len(target), (iterations, len(target)))], quantiles, axis=1)
+    differences = target_stats - base_stats
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(differences, [tail, 100 - tail], axis=1)
+    estimates = np.quantile(target, quantiles) - np.quantile(base, quantiles)
+
+    return {
+        f'p{round(q * 100)}': {
+            'estimate': float(estimate),
+            'low': float(lo),
+            'high': float(hi),
+        }
+        for q, estimate, lo, hi in zip(quantiles, estimates, low, high)
+    }
+
+
+def compare_sketches(base_sketch, target_sketch, rng):
+    """Distribution shift between two windows of the same series"""
+    size = settings.RELEASE_SAMPLE_SIZE
+    base = sample_sketch(base_sketch, size, rng)
+    target = sample_sketch(target_sketch, size, rng)
+    result = {
+        'base': {'count': base_sketch.count if base_sketch else 0},
+        'target': {'count': target_sketch.count if target_sketch else 0},
+    }
+    for side, sketch in (('base', base_sketch), ('target', target_sketch)):
+        if sketch is not None and sketch.count:
+            p50, p75, p95 = sketch.quantiles([0.5, 0.75, 0.95])
+            result[side].update({'p50': p50, 'p75': p75, 'p95': p95})
+
+    if len(base) < settings.RELEASE_MIN_SAMPLES or len(target) < settings.RELEASE_MIN_SAMPLES:
+        result['status'] = 'insufficient_data'
+        return result
+
+    test = mann_whitney(base, target)
+    intervals = bootstrap_difference(base, target, rng, settings.RELEASE_BOOTSTRAP_ITERATIONS)
+    median = intervals['p50']
+    significant = test['p_value'] < settings.RELEASE_SIGNIFICANCE and (median['low'] > 0 or median['high'] < 0)
+
+    result.update({
+        'mann_whitney': test,
+        'bootstrap': intervals,
+        'significant': significant,
+        # Every tracked metric and render time is lower-is-better
+        'status': ('regressed' if test['probability_of_superiority'] > 0.5 else 'improved') if significant else 'unchanged',
+    })
+    return result
+
+
+def component_sketches(project_id, start, end):
+    """Render-time sketch per component over [start, end).
+
+    Whole hours come from the hourly rollups; the partial hours at either
+    edge, e.g. before a deploy inside its hour, are read from raw samples.
+    """
+    components = {}
+
+    def aggregate_for(component_name, file_path):
+        aggregate = components.get((component_name, file_path))
+        if aggregate is None:
+            aggregate = components[(component_name, file_path)] = ComponentAggregate()
+        return aggregate
+
+    # Component rollups are written at ingest, so every whole hour up to ``end`` is complete
+    for source, segment_start, segment_end in plan_window(start, end, ['hour'], {'hour': end}):
+        if source == 'hour':
+            rows = ComponentRollup.objects.filter(
+                project_id=project_id,
+                bucket_start__gte=segment_start,
+                bucket_start__lt=segment_end
+            ).order_by().values_list('component_name', 'file_path', *ROLLUP_FIELDS)
+            for component_name, file_path, *values in rows.iterator(chunk_size=settings.ROLLUP_CHUNK_SIZE):
+                aggregate_for(component_name, file_path).merge(*values)
+        else:
+            samples = ComponentAnalysis.objects.filter(
+                project_id=project_id,
+                timestamp__gte=segment_start,
+                timestamp__lt=segment_end
+            ).order_by().only('component_name', 'file_path', 'render_time', 're_render_count', 'memory_usage')
+            for sample in samples.iterator(chunk_size=settings.ROLLUP_CHUNK_SIZE):
+                aggregate_for(sample.component_name, sample.file_path).add(sample)
+    return {key: aggregate.render.sketch for key, aggregate in components.items()}
+
+
+def compare_windows(project_id, base, target, metric_type=None):
+    """Compare metric and component distributions between two (start, end) windows.
+
+    Both sides come from merged rollup sketches, so the cost is bounded by
+    the number of buckets and ``RELEASE_SAMPLE_SIZE``, not by the row count.
+    """
+    rng = np.random.default_rng(settings.RELEASE_COMPARE_SEED)
+    filters = {'project_id': project_id}
+
+    base_metrics = summarize(filters, *base, metric_type=metric_type, with_sketch=True)
+    target_metrics = summarize(filters, *target, metric_type=metric_type, with_sketch=True)
+    metrics = []
+    for name in sorted({key[0] for key in base_metrics} | {key[0] for key in target_metrics}):
+        base_aggregate = base_metrics.get((name, None))
+        target_aggregate = target_metrics.get((name, None))
+        metrics.append({
+            'metric_type': name,
+            **compare_sketches(
+                base_aggregate.sketch if base_aggregate else None,
+                target_aggregate.sketch if target_aggregate else None,
+                rng
+            ),
+        })
+
+    base_components = component_sketches(project_id, *base)
+    target_components = component_sketches(project_id, *target)
+    # Only components seen on both sides can shift; compare the busiest ones
+    shared = sorted(
+        set(base_components) & set(target_components),
+        key=lambda key: base_components[key].count + target_components[key].count,
+        reverse=True
+    )[:settings.RELEASE_MAX_COMPONENTS]
+    components = [
+        {
+            'component_name': component_name,
+            'file_path': file_path,
+            **compare_sketches(base_components[(component_name, file_path)],
+                               target_components[(component_name, file_path)], rng),
+        }
+        for component_name, file_path in shared
+    ]
+
+    return {'metrics': metrics, 'components': components}
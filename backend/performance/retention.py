@@ -0,0 +1,130 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import (
+    PerformanceMetric, ComponentAnalysis, ComponentRollup, FlameGraphBucket, MetricRollup, RenderProfile,
+    RetentionPolicy, RollupWatermark
+)
+
+logger = logging.getLogger(__name__)
+
+# name: (policy field, default setting, model, time field, filters, tier that must aggregate rows first)
+TARGETS = {
+    'metrics': ('raw_days', 'RETENTION_RAW_DAYS', PerformanceMetric, 'timestamp', {}, 'minute'),
+    'component_analyses': ('component_days', 'RETENTION_COMPONENT_DAYS', ComponentAnalysis, 'timestamp', {}, None),
+    'render_profiles': ('component_days', 'RETENTION_COMPONENT_DAYS', RenderProfile, 'timestamp', {}, None),
+    'minute_rollups': (
+        'minute_rollup_days', 'RETENTION_MINUTE_ROLLUP_DAYS', MetricRollup, 'bucket_start',
+        {'granularity': 'minute'}, 'hour'
+    ),
+    'hour_rollups': (
+        'hour_rollup_days', 'RETENTION_HOUR_ROLLUP_DAYS', MetricRollup, 'bucket_start',
+        {'granularity': 'hour'}, 'day'
+    ),
+    'component_rollups': (
+        'hour_rollup_days', 'RETENTION_HOUR_ROLLUP_DAYS', ComponentRollup, 'bucket_start', {}, None
+    ),
+    'flame_graph_buckets': (
+        'hour_rollup_days', 'RETENTION_HOUR_ROLLUP_DAYS', FlameGraphBucket, 'bucket_start', {}, None
+    ),
+    'day_rollups': (
+        'day_rollup_days', 'RETENTION_DAY_ROLLUP_DAYS', MetricRollup, 'bucket_start',
+        {'granularity': 'day'}, None
+    ),
+}
+
+
+def retention_days(project_ids, field):
+    """Days kept for one policy ``field`` per project id; None keeps that tier forever"""
+    setting = next(target[1] for target in TARGETS.values() if target[0] == field)
+    days = dict.fromkeys(project_ids, getattr(settings, setting))
+    days.update(RetentionPolicy.objects.filter(project_id__in=days).values_list('project_id', field))
+    return days
+
+
+def retention_cutoff(project_ids, field, now=None):
+    """Oldest timestamp still covered by ``field`` per project id, or None when kept forever"""
+    now = now or timezone.now()
+    return {
+        project_id: None if days is None else now - timedelta(days=days)
+        for project_id, days in retention_days(project_ids, field).items()
+    }
+
+
+def purge_chunked(queryset, time_field, cutoff, deadline, chunk_size=None):
+    """Delete rows older than ``cutoff``, oldest first, one bounded primary-key chunk per statement.
+
+    Every chunk commits on its own so locks are held only for the duration of
+    a single small DELETE. Returns the number of rows removed before
+    ``deadline`` (a ``time.monotonic()`` value) was reached.
+    """
+    chunk_size = chunk_size or settings.RETENTION_CHUNK_SIZE
+    expired = queryset.filter(**{f'{time_field}__lt': cutoff}).order_by(time_field)
+    removed = 0
+
+    while time.monotonic() < deadline:
+        ids = list(expired.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            break
+        removed += queryset.model.objects.filter(pk__in=ids).delete()[0]
+        if len(ids) < chunk_size:
+            break
+        # Give concurrent writers and replication a moment between chunks
+        time.sleep(settings.RETENTION_CHUNK_PAUSE)
+
+    return removed
+
+
+def purge_plans(name, policies, now, watermarks):
+    """(queryset, cutoff) pairs for one target: the shared default plus one per custom policy"""
+    field, setting, model, time_field, filters, guard = TARGETS[name]
+    plans = [
+        (model.objects.filter(project__retention_policy__isnull=True, **filters), getattr(settings, setting))
+    ]
+    plans += [
+        (model.objects.filter(project_id=policy.project_id, **filters), getattr(policy, field))
+        for policy in policies
+    ]
+
+    for queryset, days in plans:
+        if days is None:
+            continue
+        cutoff = now - timedelta(days=days)
+        if guard:
+            # Never drop rows the next rollup tier has not aggregated yet
+            position = watermarks.get(guard)
+            if position is None:
+                continue
+            cutoff = min(cutoff, position)
+        yield queryset, cutoff
+
+
+def purge_expired(now=None):
+    """Apply retention to every tier; returns rows removed and seconds spent per target"""
+    now = now or timezone.now()
+    deadline = time.monotonic() + settings.RETENTION_MAX_SECONDS
+    watermarks = dict(RollupWatermark.objects.values_list('granularity', 'position'))
+    policies = list(RetentionPolicy.objects.all())
+    results = {}
+
+    for name, (_, _, _, time_field, _, _) in TARGETS.items():
+        started = time.monotonic()
+        removed = 0
+        for queryset, cutoff in purge_plans(name, policies, now, watermarks):
+            removed += purge_chunked(queryset, time_field, cutoff, deadline)
+        results[name] = {
+            'rows': removed,
+            'seconds': round(time.monotonic() - started, 3),
+        }
+
+    if time.monotonic() >= deadline:
+        logger.warning(
+            f"Retention purge hit RETENTION_MAX_SECONDS ({settings.RETENTION_MAX_SECONDS}s); "
+            "the remainder is picked up by the next run"
+        )
+
+    return results
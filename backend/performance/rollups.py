@@ -0,0 +1,463 @@
+import logging
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .cache import invalidate_dashboard
+from .models import PerformanceMetric, MetricRollup, RollupDirtyBucket, RollupWatermark
+from .retention import retention_cutoff
+from .sketches import DDSketch
+
+logger = logging.getLogger(__name__)
+
+# Coarsest first; every tier is built from the one below it
+TIERS = [
+    ('day', timedelta(days=1)),
+    ('hour', timedelta(hours=1)),
+    ('minute', timedelta(minutes=1)),
+]
+WIDTHS = dict(TIERS)
+SOURCES = {'minute': None, 'hour': 'minute', 'day': 'hour'}
+
+# How much of a tier is processed per slice, which bounds memory during aggregation
+SLICES = {
+    'minute': timedelta(hours=1),
+    'hour': timedelta(days=1),
+    'day': timedelta(days=31),
+}
+
+
+def floor_time(value, granularity):
+    value = value.astimezone(dt_timezone.utc)
+    if granularity == 'minute':
+        return value.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil_time(value, granularity):
+    floored = floor_time(value, granularity)
+    return floored if floored == value else floored + WIDTHS[granularity]
+
+
+class Aggregate:
+    """Running count, sum, min, max and optional sketch for one bucket"""
+    __slots__ = ('count', 'sum', 'min', 'max', 'sketch')
+
+    def __init__(self, with_sketch=True):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.sketch = DDSketch() if with_sketch else None
+
+    @property
+    def avg(self):
+        return self.sum / self.count if self.count else None
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+        if self.sketch is not None:
+            self.sketch.add(value)
+
+    def merge(self, count, total, minimum, maximum, sketch=None):
+        if not count:
+            return
+        self.count += count
+        self.sum += total
+        self.min = minimum if self.min is None or minimum < self.min else self.min
+        self.max = maximum if self.max is None or maximum > self.max else self.max
+        if self.sketch is not None and sketch:
+            self.sketch.merge(DDSketch.from_dict(sketch))
+
+    def combine(self, other):
+        """Merge another in-memory Aggregate into this one"""
+        self.merge(other.count, other.sum, other.min, other.max)
+        if self.sketch is not None and other.sketch is not None:
+            self.sketch.merge(other.sketch)
+        return self
+
+
+def _raw_rows(start, end, filters):
+    return PerformanceMetric.objects.filter(
+        timestamp__gte=start,
+        timestamp__lt=end,
+        **filters
+    ).order_by().values_list(
+        'project_id', 'metric_type', 'timestamp', 'value'
+    ).iterator(chunk_size=settings.ROLLUP_CHUNK_SIZE)
+
+
+def _rollup_rows(granularity, start, end, filters):
+    return MetricRollup.objects.filter(
+        granularity=granularity,
+        bucket_start__gte=start,
+        bucket_start__lt=end,
+        **filters
+    ).order_by().values_list(
+        'project_id', 'metric_type', 'bucket_start', 'count', 'sum', 'min', 'max', 'sketch'
+    ).iterator(chunk_size=settings.ROLLUP_CHUNK_SIZE)
+
+
+def _raw_buckets(start, end, filters, bucket=None):
+    queryset = PerformanceMetric.objects.filter(
+        timestamp__gte=start,
+        timestamp__lt=end,
+        **filters
+    ).order_by()
+    if bucket:
+        queryset = queryset.annotate(
+            bucket_start=Trunc('timestamp', bucket, tzinfo=dt_timezone.utc)
+        ).values('metric_type', 'bucket_start')
+    else:
+        queryset = queryset.values('metric_type')
+    return queryset.annotate(
+        count=Count('id'),
+        total=Sum('value'),
+        minimum=Min('value'),
+        maximum=Max('value')
+    )
+
+
+def aggregate_slice(granularity, start, end, filters=None):
+    """Aggregate one slice of a tier from its source into {(project, type, bucket): Aggregate}"""
+    filters = filters or {}
+    buckets = {}
+    source = SOURCES[granularity]
+
+    if source is None:
+        for project_id, metric_type, timestamp, value in _raw_rows(start, end, filters):
+            key = (project_id, metric_type, floor_time(timestamp, granularity))
+            aggregate = buckets.get(key)
+            if aggregate is None:
+                aggregate = buckets[key] = Aggregate()
+            aggregate.add(value)
+    else:
+        for project_id, metric_type, bucket_start, *values in _rollup_rows(source, start, end, filters):
+            key = (project_id, metric_type, floor_time(bucket_start, granularity))
+            aggregate = buckets.get(key)
+            if aggregate is None:
+                aggregate = buckets[key] = Aggregate()
+            aggregate.merge(*values)
+
+    return buckets
+
+
+def write_buckets(granularity, buckets):
+    """Upsert aggregated buckets so re-running a window is idempotent"""
+    rollups = [
+        MetricRollup(
+            project_id=project_id,
+            metric_type=metric_type,
+            granularity=granularity,
+            bucket_start=bucket_start,
+            count=aggregate.count,
+            sum=aggregate.sum,
+            min=aggregate.min,
+            max=aggregate.max,
+            sketch=aggregate.sketch.to_dict()
+        )
+        for (project_id, metric_type, bucket_start), aggregate in buckets.items()
+    ]
+    MetricRollup.objects.bulk_create(
+        rollups,
+        batch_size=settings.METRICS_BULK_CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=['project', 'granularity', 'bucket_start', 'metric_type'],
+        update_fields=['count', 'sum', 'min', 'max', 'sketch']
+    )
+    return len(rollups)
+
+
+def build_tier(granularity, start, end, filters=None):
+    """(Re)compute every bucket of a tier in [start, end), one bounded slice at a time"""
+    written = 0
+    slice_start = start
+    while slice_start < end:
+        slice_end = min(slice_start + SLICES[granularity], end)
+        written += write_buckets(granularity, aggregate_slice(granularity, slice_start, slice_end, filters))
+        slice_start = slice_end
+    return written
+
+
+def rebuild_range(granularity, start, end, filters):
+    """Replace a tier's buckets in [start, end); unlike build_tier this also drops buckets whose rows are gone"""
+    with transaction.atomic():
+        MetricRollup.objects.filter(
+            granularity=granularity,
+            bucket_start__gte=start,
+            bucket_start__lt=end,
+            **filters
+        ).delete()
+        return build_tier(granularity, start, end, filters)
+
+
+def _initial_position(granularity, upto):
+    # First run: start from the oldest data available in the source tier
+    source = SOURCES[granularity]
+    if source is None:
+        oldest = PerformanceMetric.objects.aggregate(oldest=Min('timestamp'))['oldest']
+    else:
+        oldest = MetricRollup.objects.filter(granularity=source).aggregate(oldest=Min('bucket_start'))['oldest']
+    return floor_time(oldest, granularity) if oldest and oldest < upto else upto
+
+
+def safe_position(now=None):
+    """End of the newest minute that is old enough to be considered complete"""
+    now = now or timezone.now()
+    return floor_time(now - timedelta(seconds=settings.ROLLUP_LATENESS_SECONDS), 'minute')
+
+
+def mark_late_metrics(metrics, now=None):
+    """Flag the project hours of rows old enough that a watermark may already have passed them.
+
+    Call inside the transaction that inserts the rows; ``update_rollups``
+    re-aggregates flagged hours on its next run.
+    """
+    now = now or timezone.now()
+    threshold = now - timedelta(seconds=settings.ROLLUP_LATENESS_SECONDS)
+    buckets = {
+        (metric.project_id, floor_time(metric.timestamp, 'hour'))
+        for metric in metrics
+        if metric.timestamp is not None and metric.timestamp < threshold
+    }
+    if not buckets:
+        return 0
+    RollupDirtyBucket.objects.bulk_create(
+        [
+            RollupDirtyBucket(project_id=project_id, bucket_start=bucket_start, marked_at=now)
+            for project_id, bucket_start in buckets
+        ],
+        batch_size=settings.METRICS_BULK_CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=['project', 'bucket_start'],
+        update_fields=['marked_at']
+    )
+    return len(buckets)
+
+
+def _covers(cutoffs, project_id, start):
+    cutoff = cutoffs.get(project_id)
+    return cutoff is None or start >= cutoff
+
+
+def reaggregate_dirty(limit=None):
+    """Rebuild the rollups of flagged project hours that the watermarks have already passed.
+
+    A tier is only rebuilt while retention still keeps its whole source for
+    the bucket; otherwise a rebuild would replace the aggregates of purged
+    rows with the few late ones, so the existing buckets are left as they are.
+    """
+    watermarks = dict(RollupWatermark.objects.values_list('granularity', 'position'))
+    dirty = list(
+        RollupDirtyBucket.objects.order_by('marked_at')
+        .values_list('id', 'project_id', 'bucket_start', 'marked_at')[:limit or settings.ROLLUP_DIRTY_BATCH]
+    )
+
+    project_ids = {project_id for _, project_id, _, _ in dirty}
+    raw = retention_cutoff(project_ids, 'raw_days')
+    minutes = retention_cutoff(project_ids, 'minute_rollup_days')
+    hours = retention_cutoff(project_ids, 'hour_rollup_days')
+
+    days = set()
+    skipped = 0
+    for _, project_id, bucket_start, _ in dirty:
+        # The minute tier is built from raw rows and the hour tier from minutes
+        if not (_covers(raw, project_id, bucket_start) and _covers(minutes, project_id, bucket_start)):
+            skipped += 1
+            continue
+        filters = {'project_id': project_id}
+        hour_end = bucket_start + WIDTHS['hour']
+        for granularity in ('minute', 'hour'):
+            position = watermarks.get(granularity)
+            if position is not None and position > bucket_start:
+                rebuild_range(granularity, bucket_start, min(hour_end, position), filters)
+        days.add((project_id, floor_time(bucket_start, 'day')))
+
+    day_position = watermarks.get('day')
+    for project_id, day_start in days:
+        # A day is rebuilt from its hours, which must all still exist
+        if day_position is not None and day_position > day_start and _covers(hours, project_id, day_start):
+            rebuild_range('day', day_start, min(day_start + WIDTHS['day'], day_position), {'project_id': project_id})
+
+    if skipped:
+        logger.warning(f"Skipped {skipped} dirty rollup hours whose source rows retention already purged")
+
+    # Flags re-marked while this ran keep their newer marked_at and are picked up next time
+    for dirty_id, _, _, marked_at in dirty:
+        RollupDirtyBucket.objects.filter(id=dirty_id, marked_at=marked_at).delete()
+    invalidate_dashboard(*project_ids)
+    return len(dirty)
+
+
+def update_rollups(now=None):
+    """Advance every tier from its watermark; returns buckets written and seconds spent per tier"""
+    results = {}
+    upto = safe_position(now)
+    max_span = timedelta(hours=settings.ROLLUP_MAX_SPAN_HOURS)
+
+    for granularity in ('minute', 'hour', 'day'):
+        started = time.monotonic()
+        upto = floor_time(upto, granularity)
+
+        with transaction.atomic():
+            if not RollupWatermark.objects.filter(granularity=granularity).exists():
+                RollupWatermark.objects.get_or_create(
+                    granularity=granularity,
+                    defaults={'position': _initial_position(granularity, upto)}
+                )
+            # Serializes concurrent runs of the beat job on the same tier
+            watermark = RollupWatermark.objects.select_for_update().get(granularity=granularity)
+            end = min(upto, floor_time(watermark.position + max_span, granularity))
+            written = 0
+            if watermark.position < end:
+                written = build_tier(granularity, watermark.position, end)
+                watermark.position = end
+                watermark.save()
+
+        results[granularity] = {
+            'buckets': written,
+            'position': watermark.position.isoformat(),
+            'seconds': round(time.monotonic() - started, 3),
+        }
+        # The next tier can only aggregate what this one has completed
+        upto = watermark.position
+
+    started = time.monotonic()
+    results['late'] = {
+        'buckets': reaggregate_dirty(),
+        'seconds': round(time.monotonic() - started, 3),
+    }
+    return results
+
+
+def backfill_rollups(start, end, filters=None, granularities=('minute', 'hour', 'day')):
+    """Recompute rollups for [start, end); advances watermarks when the whole fleet was rebuilt"""
+    end = min(end, safe_position())
+    results = {}
+
+    for granularity in granularities:
+        tier_start = floor_time(start, granularity)
+        tier_end = floor_time(end, granularity)
+        if tier_start >= tier_end:
+            results[granularity] = 0
+            continue
+        results[granularity] = build_tier(granularity, tier_start, tier_end, filters)
+
+        if not filters:
+            watermark, created = RollupWatermark.objects.get_or_create(
+                granularity=granularity,
+                defaults={'position': tier_end}
+            )
+            if not created and watermark.position < tier_end:
+                watermark.position = tier_end
+                watermark.save()
+
+    return results
+
+
+def plan_window(start, end, tiers, watermarks):
+    """Cover [start, end) with the coarsest complete rollup buckets, falling back to raw rows.
+
+    Returns a list of ``(source, start, end)`` segments where ``source`` is a
+    granularity or ``'raw'``; ``tiers`` is ordered coarsest first.
+    """
+    if start >= end:
+        return []
+    if not tiers:
+        return [('raw', start, end)]
+
+    granularity, finer = tiers[0], tiers[1:]
+    position = watermarks.get(granularity)
+    inner_start = ceil_time(start, granularity)
+    inner_end = floor_time(end, granularity)
+    if position is not None:
+        inner_end = min(inner_end, position)
+    if position is None or inner_start >= inner_end:
+        return plan_window(start, end, finer, watermarks)
+
+    return (
+        plan_window(start, inner_start, finer, watermarks)
+        + [(granularity, inner_start, inner_end)]
+        + plan_window(inner_end, end, finer, watermarks)
+    )
+
+
+def summarize(filters, start, end, bucket=None, metric_type=None, with_sketch=False):
+    """Aggregate metrics in [start, end) from rollups plus the raw tail.
+
+    Returns ``{(metric_type, bucket_start): Aggregate}``; ``bucket_start`` is
+    None unless ``bucket`` names a granularity to group the results by.
+    """
+    filters = dict(filters)
+    if metric_type:
+        filters['metric_type'] = metric_type
+
+    watermarks = dict(RollupWatermark.objects.values_list('granularity', 'position'))
+    tiers = [
+        granularity for granularity, width in TIERS
+        if bucket is None or width <= WIDTHS[bucket]
+    ]
+
+    results = {}
+
+    def aggregate_for(metric_type, timestamp):
+        key = (metric_type, floor_time(timestamp, bucket) if bucket else None)
+        aggregate = results.get(key)
+        if aggregate is None:
+            aggregate = results[key] = Aggregate(with_sketch=with_sketch)
+        return aggregate
+
+    fields = ['metric_type', 'bucket_start', 'count', 'sum', 'min', 'max']
+    if with_sketch:
+        fields.append('sketch')
+
+    for source, segment_start, segment_end in plan_window(start, end, tiers, watermarks):
+        if source == 'raw' and with_sketch:
+            for _, metric_type, timestamp, value in _raw_rows(segment_start, segment_end, filters):
+                aggregate_for(metric_type, timestamp).add(value)
+        elif source == 'raw':
+            # Without sketches the raw edges can be bucketed by the database itself
+            for row in _raw_buckets(segment_start, segment_end, filters, bucket):
+                aggregate_for(row['metric_type'], row.get('bucket_start') or segment_start).merge(
+                    row['count'], row['total'], row['minimum'], row['maximum']
+                )
+        else:
+            rows = MetricRollup.objects.filter(
+                granularity=source,
+                bucket_start__gte=segment_start,
+                bucket_start__lt=segment_end,
+                **filters
+            ).order_by().values_list(*fields)
+            for metric_type, bucket_start, *values in rows.iterator(chunk_size=settings.ROLLUP_CHUNK_SIZE):
+                aggregate_for(metric_type, bucket_start).merge(*values)
+
+    return results
+
+
+def choose_granularity(start, end, max_points=None):
+    """Pick the rollup tier for a trend window.
+
+    By default this is the coarsest tier that still yields
+    TRENDS_MIN_POINTS points; with ``max_points`` it is the finest tier
+    that stays within that many points (or 'day' if none does).
+    """
+    window = end - start
+    if max_points:
+        for granularity, width in reversed(TIERS):
+            if window / width <= max_points:
+                return granularity
+        return 'day'
+    for granularity, width in TIERS:
+        if window / width >= settings.TRENDS_MIN_POINTS:
+            return granularity
+    return 'minute'
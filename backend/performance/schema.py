@@ -1,91 +1,141 @@
 import graphene
+from django.conf import settings
 from graphene_django import DjangoObjectType
+from graphql import GraphQLError
 # from graphene_django.filter import DjangoFilterConnectionField
 from .models import Project, PerformanceMetric, ComponentAnalysis, PerformanceIssue, OptimizationSuggestion
+from .cache import invalidate_dashboard
+from .budgets import evaluate_budgets
+from realtime.live import broadcast_metrics
+from .loaders import BatchedConnectionField, get_loaders
 
 class ProjectType(DjangoObjectType):
+    # Reverse relations are bounded lists batched across all projects of the request
+    metrics = graphene.List(lambda: PerformanceMetricType, first=graphene.Int())
+    component_analyses = graphene.List(lambda: ComponentAnalysisType, first=graphene.Int())
+    issues = graphene.List(lambda: PerformanceIssueType, first=graphene.Int())
+    suggestions = graphene.List(lambda: OptimizationSuggestionType, first=graphene.Int())
+    
     class Meta:
         model = Project
         fields = "__all__"
+        use_connection = True
+    
+    @classmethod
+    def get_node(cls, info, id):
+        # graphene-django resolves foreign keys to a project through get_node
+        return get_loaders(info).project(id)
+    
+    def resolve_metrics(self, info, first=None):
+        return related_rows(info, PerformanceMetric, self.id, first)
+    
+    def resolve_component_analyses(self, info, first=None):
+        return related_rows(info, ComponentAnalysis, self.id, first)
+    
+    def resolve_issues(self, info, first=None):
+        return related_rows(info, PerformanceIssue, self.id, first)
+    
+    def resolve_suggestions(self, info, first=None):
+        return related_rows(info, OptimizationSuggestion, self.id, first)
 
-class PerformanceMetricType(DjangoObjectType):
+class ProjectRelatedType(DjangoObjectType):
+    """Base for types owned by a project; ``project`` is served by the request loader"""
+    
+    class Meta:
+        abstract = True
+    
+    def resolve_project(self, info):
+        return get_loaders(info).project(self.project_id)
+
+class PerformanceMetricType(ProjectRelatedType):
     class Meta:
         model = PerformanceMetric
         fields = "__all__"
+        use_connection = True
 
-class ComponentAnalysisType(DjangoObjectType):
+class ComponentAnalysisType(ProjectRelatedType):
     class Meta:
         model = ComponentAnalysis
         fields = "__all__"
+        use_connection = True
 
-class PerformanceIssueType(DjangoObjectType):
+class PerformanceIssueType(ProjectRelatedType):
     class Meta:
         model = PerformanceIssue
         fields = "__all__"
+        use_connection = True
 
-class OptimizationSuggestionType(DjangoObjectType):
+class OptimizationSuggestionType(ProjectRelatedType):
     class Meta:
         model = OptimizationSuggestion
         fields = "__all__"
+        use_connection = True
+
+def related_rows(info, model, project_id, first):
+    limit = settings.GRAPHQL_RELATED_DEFAULT_SIZE if first is None else first
+    if not 0 < limit <= settings.GRAPHQL_MAX_PAGE_SIZE:
+        raise GraphQLError(f'first must be between 1 and {settings.GRAPHQL_MAX_PAGE_SIZE}')
+    return get_loaders(info).related_rows(model, project_id, limit)
+
+def owned(queryset, info, project_id=None):
+    """Restrict ``queryset`` to the projects of the current user"""
+    if not info.context.user.is_authenticated:
+        return queryset.none()
+    queryset = queryset.filter(project__owner=info.context.user)
+    if project_id:
+        queryset = queryset.filter(project_id=project_id)
+    return queryset
 
 class Query(graphene.ObjectType):
-    all_projects = graphene.List(ProjectType)
+    all_projects = BatchedConnectionField(ProjectType)
     project = graphene.Field(ProjectType, id=graphene.UUID())
     
-    all_metrics = graphene.List(PerformanceMetricType, project_id=graphene.UUID())
+    all_metrics = BatchedConnectionField(PerformanceMetricType, project_id=graphene.UUID())
     metric = graphene.Field(PerformanceMetricType, id=graphene.UUID())
     
-    all_components = graphene.List(ComponentAnalysisType, project_id=graphene.UUID())
+    all_components = BatchedConnectionField(ComponentAnalysisType, project_id=graphene.UUID())
     component = graphene.Field(ComponentAnalysisType, id=graphene.UUID())
     
-    all_issues = graphene.List(PerformanceIssueType, project_id=graphene.UUID())
+    all_issues = BatchedConnectionField(PerformanceIssueType, project_id=graphene.UUID())
     issue = graphene.Field(PerformanceIssueType, id=graphene.UUID())
     
-    all_suggestions = graphene.List(OptimizationSuggestionType, project_id=graphene.UUID())
+    all_suggestions = BatchedConnectionField(OptimizationSuggestionType, project_id=graphene.UUID())
     suggestion = graphene.Field(OptimizationSuggestionType, id=graphene.UUID())
     
-def resolve_all_projects(self, info):
-    # Check if user is authenticated
-    if not info.context.user.is_authenticated:
-        return Project.objects.none()  # Return empty queryset for anonymous users
-    return Project.objects.filter(owner=info.context.user)
-
-def resolve_project(self, info, id):
-    if not info.context.user.is_authenticated:
-        return None
-    return Project.objects.get(id=id, owner=info.context.user)
-
-def resolve_all_metrics(self, info, project_id=None):
-    if not info.context.user.is_authenticated:
-        return PerformanceMetric.objects.none()
-    queryset = PerformanceMetric.objects.filter(project__owner=info.context.user)
-    if project_id:
-        queryset = queryset.filter(project_id=project_id)
-    return queryset
-
-def resolve_all_components(self, info, project_id=None):
-    if not info.context.user.is_authenticated:
-        return ComponentAnalysis.objects.none()
-    queryset = ComponentAnalysis.objects.filter(project__owner=info.context.user)
-    if project_id:
-        queryset = queryset.filter(project_id=project_id)
-    return queryset
-
-def resolve_all_issues(self, info, project_id=None):
-    if not info.context.user.is_authenticated:
-        return PerformanceIssue.objects.none()
-    queryset = PerformanceIssue.objects.filter(project__owner=info.context.user)
-    if project_id:
-        queryset = queryset.filter(project_id=project_id)
-    return queryset
-
-def resolve_all_suggestions(self, info, project_id=None):
-    if not info.context.user.is_authenticated:
-        return OptimizationSuggestion.objects.none()
-    queryset = OptimizationSuggestion.objects.filter(project__owner=info.context.user)
-    if project_id:
-        queryset = queryset.filter(project_id=project_id)
-    return queryset
+    def resolve_all_projects(self, info, **kwargs):
+        # Check if user is authenticated
+        if not info.context.user.is_authenticated:
+            return Project.objects.none()  # Return empty queryset for anonymous users
+        return Project.objects.filter(owner=info.context.user)
+    
+    def resolve_project(self, info, id):
+        if not info.context.user.is_authenticated:
+            return None
+        return Project.objects.get(id=id, owner=info.context.user)
+    
+    def resolve_all_metrics(self, info, project_id=None, **kwargs):
+        return owned(PerformanceMetric.objects.all(), info, project_id)
+    
+    def resolve_metric(self, info, id):
+        return owned(PerformanceMetric.objects.all(), info).get(id=id)
+    
+    def resolve_all_components(self, info, project_id=None, **kwargs):
+        return owned(ComponentAnalysis.objects.all(), info, project_id)
+    
+    def resolve_component(self, info, id):
+        return owned(ComponentAnalysis.objects.all(), info).get(id=id)
+    
+    def resolve_all_issues(self, info, project_id=None, **kwargs):
+        return owned(PerformanceIssue.objects.all(), info, project_id)
+    
+    def resolve_issue(self, info, id):
+        return owned(PerformanceIssue.objects.all(), info).get(id=id)
+    
+    def resolve_all_suggestions(self, info, project_id=None, **kwargs):
+        return owned(OptimizationSuggestion.objects.all(), info, project_id)
+    
+    def resolve_suggestion(self, info, id):
+        return owned(OptimizationSuggestion.objects.all(), info).get(id=id)
 
 class CreateProject(graphene.Mutation):
     class Arguments:
@@ -119,6 +169,9 @@ class CreateMetric(graphene.Mutation):
             value=value,
             url=url
         )
+        invalidate_dashboard(project.id)
+        evaluate_budgets([metric])
+        broadcast_metrics([metric])
         return CreateMetric(metric=metric)
 
 class Mutation(graphene.ObjectType):
@@ -1,5 +1,11 @@
 from rest_framework import serializers
-from .models import Project, PerformanceMetric, ComponentAnalysis, PerformanceIssue, OptimizationSuggestion
+from rest_framework.validators import UniqueTogetherValidator
+from django.conf import settings
+import math
+from .models import (
+    Project, PerformanceMetric, ComponentAnalysis, PerformanceIssue, OptimizationSuggestion, RetentionPolicy,
+    PerformanceBudget, Release
+)
 
 class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
@@ -7,6 +13,62 @@ class ProjectSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'owner', 'created_at', 'updated_at', 'is_active']
         read_only_fields = ['id', 'owner', 'created_at', 'updated_at']
 
+class RetentionPolicySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RetentionPolicy
+        fields = [
+            'raw_days', 'component_days', 'minute_rollup_days',
+            'hour_rollup_days', 'day_rollup_days', 'updated_at'
+        ]
+        read_only_fields = ['updated_at']
+        extra_kwargs = {
+            field: {'min_value': 1}
+            for field in ['raw_days', 'component_days', 'minute_rollup_days', 'hour_rollup_days', 'day_rollup_days']
+        }
+
+class ReleaseSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Release
+        fields = ['id', 'project', 'version', 'commit_sha', 'description', 'deployed_at', 'created_at']
+        read_only_fields = ['id', 'created_at']
+        validators = [
+            UniqueTogetherValidator(
+                queryset=Release.objects.all(),
+                fields=['project', 'version'],
+                message='A release with this version already exists for the project.',
+            )
+        ]
+    
+    def validate_project(self, project):
+        request = self.context.get('request')
+        if request is not None and project.owner_id != request.user.id:
+            raise serializers.ValidationError('Project not found')
+        return project
+
+class PerformanceBudgetSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PerformanceBudget
+        fields = [
+            'id', 'project', 'name', 'metric_type', 'statistic', 'threshold',
+            'window_seconds', 'min_samples', 'is_active', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at']
+        extra_kwargs = {
+            'window_seconds': {'min_value': 10, 'max_value': settings.BUDGET_MAX_WINDOW_SECONDS},
+            'min_samples': {'min_value': 1},
+        }
+    
+    def validate_project(self, project):
+        request = self.context.get('request')
+        if request is not None and project.owner_id != request.user.id:
+            raise serializers.ValidationError('Project not found')
+        return project
+    
+    def validate_threshold(self, threshold):
+        if not math.isfinite(threshold):
+            raise serializers.ValidationError('threshold must be a finite number')
+        return threshold
+
 class PerformanceMetricSerializer(serializers.ModelSerializer):
     class Meta:
         model = PerformanceMetric
@@ -28,9 +90,9 @@ class PerformanceIssueSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'project', 'title', 'description', 'severity', 'status',
             'component_name', 'file_path', 'line_number', 'suggested_fix',
-            'created_at', 'updated_at', 'resolved_at'
+            'fingerprint', 'created_at', 'updated_at', 'resolved_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'fingerprint', 'created_at', 'updated_at']
 
 class OptimizationSuggestionSerializer(serializers.ModelSerializer):
     class Meta:
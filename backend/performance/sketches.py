@@ -0,0 +1,114 @@
+import math
+
+
+class DDSketch:
+    """Mergeable quantile sketch with relative-error guarantees (DDSketch).
+
+    Values are mapped to logarithmically spaced buckets so any quantile is
+    answered within ``relative_accuracy`` of the true value, memory is
+    bounded by ``max_bins`` and two sketches built with the same accuracy
+    merge by adding bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_bins=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value, weight=1):
+        # Web Vitals are non-negative; anything at or below the resolution lands in the zero bucket
+        if value <= 1e-9:
+            self.zero_count += weight
+        else:
+            key = self._key(value)
+            self.bins[key] = self.bins.get(key, 0) + weight
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        self.count += weight
+
+    def _collapse(self):
+        # Fold the lowest buckets together; keeps accuracy for the upper quantiles we report
+        keys = sorted(self.bins)
+        overflow = keys[:len(keys) - self.max_bins + 1]
+        target = keys[len(overflow)]
+        self.bins[target] += sum(self.bins.pop(key) for key in overflow)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError('Cannot merge sketches with different relative accuracy')
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        return self
+
+    def quantile(self, q):
+        """Value at quantile ``q`` (0..1), or None for an empty sketch"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.bins))
+
+    def quantiles(self, qs):
+        """Values for several quantiles in one pass over the sorted buckets"""
+        if not self.count:
+            return [None for _ in qs]
+        order = sorted(range(len(qs)), key=lambda index: qs[index])
+        results = [None] * len(qs)
+        keys = iter(sorted(self.bins))
+        seen = self.zero_count
+        value = 0.0
+        for index in order:
+            rank = qs[index] * (self.count - 1)
+            while seen <= rank:
+                key = next(keys, None)
+                if key is None:
+                    break
+                seen += self.bins[key]
+                value = self._value(key)
+            results[index] = value
+        return results
+
+    def histogram(self):
+        """``(representative value, count)`` pairs in ascending order, zero bucket first"""
+        pairs = [(0.0, self.zero_count)] if self.zero_count else []
+        pairs.extend((self._value(key), self.bins[key]) for key in sorted(self.bins))
+        return pairs
+
+    def to_dict(self):
+        """Compact JSON form: a dense count array starting at ``offset``"""
+        if not self.bins:
+            return {'a': self.relative_accuracy, 'z': self.zero_count, 'o': 0, 'c': []}
+        offset = min(self.bins)
+        counts = [0] * (max(self.bins) - offset + 1)
+        for key, count in self.bins.items():
+            counts[key - offset] = count
+        return {'a': self.relative_accuracy, 'z': self.zero_count, 'o': offset, 'c': counts}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(relative_accuracy=data['a'])
+        sketch.zero_count = data['z']
+        offset = data['o']
+        sketch.bins = {offset + index: count for index, count in enumerate(data['c']) if count}
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        return sketch
@@ -0,0 +1,29 @@
+from celery import shared_task
+import logging
+
+from .anomalies import run_detection
+from .retention import purge_expired
+from .rollups import update_rollups
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def update_metric_rollups():
+    """Advance the minute/hour/day rollup tiers from their watermarks"""
+    results = update_rollups()
+    logger.info(f"Metric rollups updated: {results}")
+    return results
+
+@shared_task
+def purge_expired_data():
+    """Delete metrics, component samples and rollups past their retention"""
+    results = purge_expired()
+    logger.info(f"Retention purge finished: {results}")
+    return results
+
+@shared_task
+def detect_metric_regressions():
+    """Score hourly metric series and open, update or reopen regression issues"""
+    results = run_detection()
+    logger.info(f"Regression detection finished: {results}")
+    return results
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ProjectViewSet, PerformanceMetricViewSet, ComponentAnalysisViewSet,
-    PerformanceIssueViewSet, OptimizationSuggestionViewSet
+    PerformanceIssueViewSet, OptimizationSuggestionViewSet, PerformanceBudgetViewSet, ReleaseViewSet
 )
 
 router = DefaultRouter()
@@ -11,6 +11,8 @@ router.register(r'metrics', PerformanceMetricViewSet, basename='metric')
 router.register(r'components', ComponentAnalysisViewSet, basename='component')
 router.register(r'issues', PerformanceIssueViewSet, basename='issue')
 router.register(r'suggestions', OptimizationSuggestionViewSet, basename='suggestion')
+router.register(r'budgets', PerformanceBudgetViewSet, basename='budget')
+router.register(r'releases', ReleaseViewSet, basename='release')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,16 +1,86 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.db import transaction
 from django.db.models import Avg, Count, Q
 from django.utils import timezone
 from datetime import timedelta
-from .models import Project, PerformanceMetric, ComponentAnalysis, PerformanceIssue, OptimizationSuggestion
+import uuid
+from .downsample import lttb, merge_adjacent
+from .components import LEADERBOARD_MAX_LIMIT, RANKINGS, leaderboard, refresh_component_rollups, update_component_rollups
+from realtime.live import broadcast_metrics
+from .budgets import evaluate_budgets, invalidate_budgets
+from .cache import get_dashboard, get_or_compute_dashboard, invalidate_dashboard
+from .export import CONTENT_TYPES, ExportError, export_metrics
+from .ingest import IngestError, decode_payload, parse_timestamp, validate_records, save_metrics
+from .rollups import WIDTHS, mark_late_metrics, summarize, choose_granularity
+from .profiles import flame_graph, parse_profile
+from .releases import compare_windows, release_window
+from .pagination import KeysetPagination, ChronologicalKeysetPagination
+from .models import (
+    Project, PerformanceMetric, ComponentAnalysis, PerformanceIssue, OptimizationSuggestion, RenderProfile,
+    RetentionPolicy, PerformanceBudget, Release
+)
 from .serializers import (
     ProjectSerializer, PerformanceMetricSerializer, ComponentAnalysisSerializer,
-    PerformanceIssueSerializer, OptimizationSuggestionSerializer
+    PerformanceIssueSerializer, OptimizationSuggestionSerializer, RetentionPolicySerializer,
+    PerformanceBudgetSerializer, ReleaseSerializer
 )
 
+def project_id_param(request):
+    """``?project_id=`` as a UUID or None; a malformed id is a 400 instead of a database error"""
+    project_id = request.query_params.get('project_id')
+    if not project_id:
+        return None
+    try:
+        return uuid.UUID(project_id)
+    except ValueError:
+        raise ValidationError({'project_id': 'Must be a valid UUID.'})
+
+def parse_percentiles(request):
+    """Read ``?percentiles=50,75,95,99`` into a sorted list of floats in (0, 100)"""
+    raw = request.query_params.get('percentiles')
+    if not raw:
+        return []
+    try:
+        percentiles = sorted({float(value) for value in raw.split(',') if value.strip()})
+    except ValueError:
+        raise ValueError('percentiles must be a comma-separated list of numbers')
+    if len(percentiles) > 10 or any(not 0 < value < 100 for value in percentiles):
+        raise ValueError('percentiles must be at most 10 values between 0 and 100')
+    return percentiles
+
+def percentile_values(aggregate, percentiles):
+    values = aggregate.sketch.quantiles([value / 100 for value in percentiles])
+    return {f'p{value:g}': result for value, result in zip(percentiles, values)}
+
+def merge_points(group):
+    """Fold consecutive (bucket_start, Aggregate) points into the first one"""
+    bucket_start, aggregate = group[0]
+    for _, other in group[1:]:
+        aggregate.combine(other)
+    return bucket_start, aggregate
+
+class InvalidatesDashboardMixin:
+    """Bump the owning project's dashboard cache version after writes through the viewset"""
+    
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        invalidate_dashboard(serializer.instance.project_id)
+    
+    def perform_update(self, serializer):
+        previous_project_id = serializer.instance.project_id
+        super().perform_update(serializer)
+        invalidate_dashboard(previous_project_id, serializer.instance.project_id)
+    
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_dashboard(instance.project_id)
+
 class ProjectViewSet(viewsets.ModelViewSet):
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated]
@@ -23,21 +93,57 @@ class ProjectViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def dashboard(self, request, pk=None):
-        project = self.get_object()
+        try:
+            hours = int(request.query_params.get('hours', 24))
+        except ValueError:
+            return Response({'error': 'hours must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get recent metrics
-        recent_metrics = PerformanceMetric.objects.filter(
-            project=project,
-            timestamp__gte=timezone.now() - timedelta(hours=24)
-        ).values('metric_type').annotate(
-            avg_value=Avg('value'),
-            count=Count('id')
+        try:
+            percentiles = parse_percentiles(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not 0 < hours <= settings.TRENDS_MAX_HOURS:
+            return Response(
+                {'error': f'hours must be between 1 and {settings.TRENDS_MAX_HOURS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Cached entries carry the project owner, so a hit needs no database query at all
+        params = f"{hours}:{','.join(f'{value:g}' for value in percentiles)}"
+        entry = get_dashboard(pk, params)
+        if entry is not None and entry['owner_id'] == request.user.id:
+            return Response(entry['data'], headers={'X-Dashboard-Cache': 'hit'})
+        
+        project = self.get_object()
+        entry, state = get_or_compute_dashboard(
+            project.id,
+            params,
+            lambda: {'owner_id': project.owner_id, 'data': self.dashboard_data(project, hours, percentiles)}
         )
+        return Response(entry['data'], headers={'X-Dashboard-Cache': state})
+    
+    def dashboard_data(self, project, hours, percentiles):
+        now = timezone.now()
+        since = now - timedelta(hours=hours)
+        
+        # Get recent metrics from the coarsest rollups covering the window plus the raw tail
+        summary = summarize({'project': project}, since, now, with_sketch=bool(percentiles))
+        recent_metrics = []
+        for (metric_type, _), aggregate in sorted(summary.items()):
+            entry = {
+                'metric_type': metric_type,
+                'avg_value': aggregate.avg,
+                'count': aggregate.count,
+            }
+            if percentiles:
+                entry['percentiles'] = percentile_values(aggregate, percentiles)
+            recent_metrics.append(entry)
         
         # Get component analysis summary
         component_stats = ComponentAnalysis.objects.filter(
             project=project,
-            timestamp__gte=timezone.now() - timedelta(hours=24)
+            timestamp__gte=since
         ).aggregate(
             avg_render_time=Avg('render_time'),
             total_components=Count('id'),
@@ -50,66 +156,472 @@ class ProjectViewSet(viewsets.ModelViewSet):
             status='open'
         ).count()
         
-        return Response({
+        return {
             'metrics': recent_metrics,
             'component_stats': component_stats,
             'open_issues': open_issues,
+            'generated_at': now.isoformat(),
+        }
+    
+    @action(detail=True, methods=['post'])
+    def profiles(self, request, pk=None):
+        project = self.get_object()
+        records = request.data if isinstance(request.data, list) else [request.data]
+        
+        if len(records) > settings.PROFILE_MAX_PER_REQUEST:
+            return Response(
+                {'error': f'At most {settings.PROFILE_MAX_PER_REQUEST} profiles per request'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        
+        profiles = []
+        rejected = []
+        for index, record in enumerate(records):
+            try:
+                profiles.append(parse_profile(record, project.id))
+            except ValueError as e:
+                rejected.append({'index': index, 'error': str(e)})
+        
+        RenderProfile.objects.bulk_create(profiles)
+        
+        return Response(
+            {'received': len(records), 'created': len(profiles), 'rejected': rejected},
+            status=status.HTTP_201_CREATED if profiles else status.HTTP_400_BAD_REQUEST
+        )
+    
+    @action(detail=True, methods=['get'])
+    def flamegraph(self, request, pk=None):
+        project = self.get_object()
+        
+        try:
+            hours = int(request.query_params.get('hours', 24))
+            min_fraction = float(request.query_params.get('min_fraction', 0.001))
+        except ValueError:
+            return Response({'error': 'hours must be an integer and min_fraction a number'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not 0 < hours <= settings.TRENDS_MAX_HOURS:
+            return Response(
+                {'error': f'hours must be between 1 and {settings.TRENDS_MAX_HOURS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 0 <= min_fraction < 1:
+            return Response({'error': 'min_fraction must be between 0 and 1'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Hourly buckets are merged once and reused until new profiles land in them
+        now = timezone.now()
+        graph, profile_count = flame_graph(project.id, now - timedelta(hours=hours), now)
+        return Response({
+            'profiles': profile_count,
+            'tree': graph.to_tree(min_fraction),
         })
-
-class PerformanceMetricViewSet(viewsets.ModelViewSet):
+    
+    @action(detail=True, methods=['get'])
+    def compare(self, request, pk=None):
+        project = self.get_object()
+        metric_type = request.query_params.get('metric_type')
+        
+        try:
+            hours = int(request.query_params['hours']) if request.query_params.get('hours') else None
+            windows = {}
+            for side in ('base', 'target'):
+                version = request.query_params.get(side)
+                if version:
+                    release = Release.objects.get(project=project, version=version)
+                    windows[side] = release_window(release, hours)
+                else:
+                    start = request.query_params.get(f'{side}_start')
+                    end = request.query_params.get(f'{side}_end')
+                    if not start or not end:
+                        raise ValueError(f'pass {side} (a release version) or {side}_start and {side}_end')
+                    windows[side] = (parse_timestamp(start), parse_timestamp(end))
+        except Release.DoesNotExist:
+            return Response({'error': 'Release not found'}, status=status.HTTP_404_NOT_FOUND)
+        except (ValueError, OverflowError, OSError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        for start, end in windows.values():
+            if not start < end or end - start > timedelta(hours=settings.TRENDS_MAX_HOURS):
+                return Response(
+                    {'error': f'windows must be non-empty and at most {settings.TRENDS_MAX_HOURS} hours long'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        result = compare_windows(project.id, windows['base'], windows['target'], metric_type)
+        return Response({
+            'base': {'start': windows['base'][0], 'end': windows['base'][1], 'release': request.query_params.get('base')},
+            'target': {'start': windows['target'][0], 'end': windows['target'][1], 'release': request.query_params.get('target')},
+            **result,
+        })
+    
+    @action(detail=True, methods=['get', 'put'])
+    def retention(self, request, pk=None):
+        project = self.get_object()
+        policy = RetentionPolicy.objects.filter(project=project).first()
+        if policy is None:
+            # Projects without a policy follow the deployment-wide defaults
+            policy = RetentionPolicy(
+                project=project,
+                raw_days=settings.RETENTION_RAW_DAYS,
+                component_days=settings.RETENTION_COMPONENT_DAYS,
+                minute_rollup_days=settings.RETENTION_MINUTE_ROLLUP_DAYS,
+                hour_rollup_days=settings.RETENTION_HOUR_ROLLUP_DAYS,
+                day_rollup_days=settings.RETENTION_DAY_ROLLUP_DAYS
+            )
+        
+        if request.method == 'GET':
+            return Response(RetentionPolicySerializer(policy).data)
+        
+        serializer = RetentionPolicySerializer(policy, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+    
+class PerformanceMetricViewSet(InvalidatesDashboardMixin, viewsets.ModelViewSet):
     serializer_class = PerformanceMetricSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         return PerformanceMetric.objects.filter(
             project__owner=self.request.user
         )
     
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            mark_late_metrics([serializer.instance])
+        evaluate_budgets([serializer.instance])
+        broadcast_metrics([serializer.instance])
+    
+    def perform_update(self, serializer):
+        # Both the old and the new hour may already be rolled up
+        previous = PerformanceMetric(project_id=serializer.instance.project_id, timestamp=serializer.instance.timestamp)
+        with transaction.atomic():
+            super().perform_update(serializer)
+            mark_late_metrics([previous, serializer.instance])
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+            mark_late_metrics([instance])
+    
+    def filter_queryset(self, queryset):
+        # Equality filters keep list pages on the (project, metric_type, timestamp) index
+        queryset = super().filter_queryset(queryset)
+        project_id = project_id_param(self.request)
+        metric_type = self.request.query_params.get('metric_type')
+        if project_id:
+            queryset = queryset.filter(project_id=project_id)
+        if metric_type:
+            queryset = queryset.filter(metric_type=metric_type)
+        return queryset
+    
     @action(detail=False, methods=['get'])
     def trends(self, request):
-        project_id = request.query_params.get('project_id')
+        project_id = project_id_param(request)
         metric_type = request.query_params.get('metric_type')
-        hours = int(request.query_params.get('hours', 24))
+        bucket = request.query_params.get('bucket', 'auto')
+        
+        try:
+            hours = int(request.query_params.get('hours', 24))
+            points = int(request.query_params['points']) if 'points' in request.query_params else None
+        except ValueError:
+            return Response({'error': 'hours and points must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            percentiles = parse_percentiles(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not 0 < hours <= settings.TRENDS_MAX_HOURS:
+            return Response(
+                {'error': f'hours must be between 1 and {settings.TRENDS_MAX_HOURS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if points is not None and not 2 <= points <= settings.TRENDS_MAX_POINTS:
+            return Response(
+                {'error': f'points must be between 2 and {settings.TRENDS_MAX_POINTS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if bucket not in ('auto', 'raw', *WIDTHS):
+            return Response(
+                {'error': f"bucket must be one of auto, raw, {', '.join(WIDTHS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        now = timezone.now()
+        since = now - timedelta(hours=hours)
+        
+        if bucket == 'raw' and ('cursor' in request.query_params or 'page_size' in request.query_params):
+            if points is not None:
+                return Response(
+                    {'error': 'points cannot be combined with cursor or page_size'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return self.paginated_raw_trends(since, project_id, metric_type)
+        if bucket == 'raw':
+            return self.raw_trends(since, project_id, metric_type, points or settings.TRENDS_MAX_POINTS)
         
-        queryset = self.get_queryset().filter(
-            timestamp__gte=timezone.now() - timedelta(hours=hours)
+        if bucket != 'auto' and timedelta(hours=hours) / WIDTHS[bucket] > settings.TRENDS_MAX_RAW_ROWS:
+            return Response(
+                {'error': f'bucket={bucket} over {hours} hours exceeds {settings.TRENDS_MAX_RAW_ROWS} buckets; '
+                          f'use a coarser bucket or fewer hours'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        filters = {'project__owner': request.user}
+        if project_id:
+            filters['project_id'] = project_id
+        
+        # One point per rollup bucket, merged further if the tier still exceeds the point limit
+        granularity = bucket if bucket != 'auto' else choose_granularity(since, now, points)
+        series = summarize(
+            filters, since, now, bucket=granularity, metric_type=metric_type, with_sketch=bool(percentiles)
         )
         
+        by_type = {}
+        for (metric_type, bucket_start), aggregate in sorted(series.items(), key=lambda item: item[0][1]):
+            by_type.setdefault(metric_type, []).append((bucket_start, aggregate))
+        
+        metrics = []
+        for metric_type, buckets in by_type.items():
+            buckets = merge_adjacent(buckets, points or settings.TRENDS_MAX_POINTS, merge_points)
+            for bucket_start, aggregate in buckets:
+                point = {
+                    'timestamp': bucket_start,
+                    'metric_type': metric_type,
+                    'value': aggregate.avg,
+                    'count': aggregate.count,
+                    'min': aggregate.min,
+                    'max': aggregate.max,
+                }
+                if percentiles:
+                    point['percentiles'] = percentile_values(aggregate, percentiles)
+                metrics.append(point)
+        metrics.sort(key=lambda point: (point['timestamp'], point['metric_type']))
+        
+        response = Response(metrics)
+        response['X-Trends-Granularity'] = granularity
+        return response
+    
+    def raw_queryset(self, since, project_id, metric_type):
+        queryset = self.get_queryset().filter(timestamp__gte=since)
         if project_id:
             queryset = queryset.filter(project_id=project_id)
         if metric_type:
             queryset = queryset.filter(metric_type=metric_type)
-        
-        metrics = queryset.order_by('timestamp').values(
-            'timestamp', 'metric_type', 'value'
+        return queryset
+    
+    def paginated_raw_trends(self, since, project_id, metric_type):
+        # Every raw row of the window, oldest first, one keyset page at a time
+        paginator = ChronologicalKeysetPagination()
+        rows = paginator.paginate_queryset(
+            self.raw_queryset(since, project_id, metric_type).values('id', 'metric_type', 'timestamp', 'value'),
+            self.request,
+            view=self
         )
+        response = paginator.get_paginated_response([
+            {'timestamp': row['timestamp'], 'metric_type': row['metric_type'], 'value': row['value']}
+            for row in rows
+        ])
+        response['X-Trends-Granularity'] = 'raw'
+        return response
+    
+    def raw_trends(self, since, project_id, metric_type, points):
+        queryset = self.raw_queryset(since, project_id, metric_type)
+        
+        # Hard cap on rows read; when hit, the newest rows of the window are kept
+        max_rows = settings.TRENDS_MAX_RAW_ROWS
+        rows = list(queryset.order_by('-timestamp').values_list(
+            'metric_type', 'timestamp', 'value'
+        )[:max_rows + 1])
+        truncated = len(rows) > max_rows
+        rows = rows[:max_rows]
+        rows.reverse()
+        
+        by_type = {}
+        for metric_type, timestamp, value in rows:
+            by_type.setdefault(metric_type, []).append((timestamp, value))
+        
+        # Shape-preserving downsampling to at most `points` rows per series
+        metrics = []
+        for metric_type, series in by_type.items():
+            keep = lttb([(timestamp.timestamp(), value) for timestamp, value in series], points)
+            metrics.extend(
+                {'timestamp': series[index][0], 'metric_type': metric_type, 'value': series[index][1]}
+                for index in keep
+            )
+        metrics.sort(key=lambda point: (point['timestamp'], point['metric_type']))
+        
+        response = Response(metrics)
+        response['X-Trends-Granularity'] = 'raw'
+        if truncated:
+            response['X-Trends-Truncated'] = 'true'
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        # `format` is reserved by DRF for renderer selection, hence `file_format`
+        file_format = request.query_params.get('file_format', 'ndjson')
+        
+        try:
+            since = request.query_params.get('since')
+            until = request.query_params.get('until')
+            since = parse_timestamp(since) if since else None
+            until = parse_timestamp(until) if until else None
+        except (ValueError, OverflowError, OSError) as e:
+            return Response({'error': f'Invalid since/until: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            chunks = export_metrics(
+                file_format,
+                project_id=project_id_param(request),
+                metric_type=request.query_params.get('metric_type'),
+                since=since,
+                until=until,
+                queryset=self.get_queryset()
+            )
+        except ExportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response(list(metrics))
+        # Rows are read through a server-side cursor and encoded chunk by chunk
+        response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="metrics.{file_format}"'
+        return response
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        project_id = request.query_params.get('project_id')
+        
+        try:
+            project = Project.objects.get(id=uuid.UUID(str(project_id)), owner=request.user)
+        except (ValueError, Project.DoesNotExist):
+            return Response(
+                {'error': 'project_id must reference one of your projects'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Streamed with this endpoint's own limit; request.body stops at DATA_UPLOAD_MAX_MEMORY_SIZE
+        body = request.read(settings.METRICS_BULK_MAX_BYTES + 1)
+        if len(body) > settings.METRICS_BULK_MAX_BYTES:
+            return Response(
+                {'error': f'Payload exceeds {settings.METRICS_BULK_MAX_BYTES} bytes'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        
+        # Decode the whole batch before touching the database
+        try:
+            decoded = decode_payload(
+                body,
+                content_type=request.content_type or '',
+                content_encoding=request.META.get('HTTP_CONTENT_ENCODING', '')
+            )
+        except IngestError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(decoded) > settings.METRICS_BULK_MAX_RECORDS:
+            return Response(
+                {'error': f'Batch exceeds {settings.METRICS_BULK_MAX_RECORDS} records'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        
+        metrics, rejected = validate_records(decoded, project)
+        created = save_metrics(metrics)
+        
+        return Response(
+            {
+                'received': len(decoded),
+                'created': created,
+                'rejected': rejected,
+            },
+            status=status.HTTP_201_CREATED if created or not rejected else status.HTTP_400_BAD_REQUEST
+        )
 
-class ComponentAnalysisViewSet(viewsets.ModelViewSet):
+class ComponentAnalysisViewSet(InvalidatesDashboardMixin, viewsets.ModelViewSet):
     serializer_class = ComponentAnalysisSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         return ComponentAnalysis.objects.filter(
             project__owner=self.request.user
         )
     
-    @action(detail=False, methods=['get'])
-    def slowest(self, request):
-        project_id = request.query_params.get('project_id')
-        limit = int(request.query_params.get('limit', 10))
-        
-        queryset = self.get_queryset()
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        project_id = project_id_param(self.request)
+        component_name = self.request.query_params.get('component_name')
         if project_id:
             queryset = queryset.filter(project_id=project_id)
+        if component_name:
+            queryset = queryset.filter(component_name=component_name)
+        return queryset
+    
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            update_component_rollups([serializer.instance])
+    
+    def perform_update(self, serializer):
+        # The sample may move to another component, project or hour; both buckets are rebuilt
+        previous = ComponentAnalysis(
+            project_id=serializer.instance.project_id,
+            component_name=serializer.instance.component_name,
+            file_path=serializer.instance.file_path,
+            timestamp=serializer.instance.timestamp
+        )
+        with transaction.atomic():
+            super().perform_update(serializer)
+            refresh_component_rollups([previous, serializer.instance])
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+            refresh_component_rollups([instance])
+    
+    def ranked(self, request, rank_by):
+        project_id = project_id_param(request)
         
-        slowest_components = queryset.order_by('-render_time')[:limit]
-        serializer = self.get_serializer(slowest_components, many=True)
+        try:
+            hours = int(request.query_params.get('hours', 24))
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({'error': 'hours and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response(serializer.data)
+        if rank_by not in RANKINGS:
+            return Response(
+                {'error': f"rank_by must be one of {', '.join(RANKINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 0 < hours <= settings.TRENDS_MAX_HOURS:
+            return Response(
+                {'error': f'hours must be between 1 and {settings.TRENDS_MAX_HOURS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 0 < limit <= LEADERBOARD_MAX_LIMIT:
+            return Response(
+                {'error': f'limit must be between 1 and {LEADERBOARD_MAX_LIMIT}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        filters = {'project__owner': request.user}
+        if project_id:
+            filters['project_id'] = project_id
+        
+        # Ranked from hourly per-component rollups maintained at ingest
+        now = timezone.now()
+        return Response(leaderboard(filters, now - timedelta(hours=hours), now, rank_by, limit))
+    
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        return self.ranked(request, request.query_params.get('rank_by', 'p95'))
+    
+    @action(detail=False, methods=['get'])
+    def slowest(self, request):
+        # Components by their slowest render in the window, rather than a scan over every sample
+        return self.ranked(request, 'max')
 
-class PerformanceIssueViewSet(viewsets.ModelViewSet):
+class PerformanceIssueViewSet(InvalidatesDashboardMixin, viewsets.ModelViewSet):
     serializer_class = PerformanceIssueSerializer
     permission_classes = [IsAuthenticated]
     
@@ -124,6 +636,7 @@ class PerformanceIssueViewSet(viewsets.ModelViewSet):
         issue.status = 'resolved'
         issue.resolved_at = timezone.now()
         issue.save()
+        invalidate_dashboard(issue.project_id)
         
         serializer = self.get_serializer(issue)
         return Response(serializer.data)
@@ -145,3 +658,43 @@ class OptimizationSuggestionViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(suggestion)
         return Response(serializer.data)
+
+class PerformanceBudgetViewSet(viewsets.ModelViewSet):
+    serializer_class = PerformanceBudgetSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = PerformanceBudget.objects.filter(
+            project__owner=self.request.user
+        )
+        project_id = project_id_param(self.request)
+        if project_id:
+            queryset = queryset.filter(project_id=project_id)
+        return queryset
+    
+    # Evaluators cache definitions per project; drop them whenever a budget changes
+    def perform_create(self, serializer):
+        serializer.save()
+        invalidate_budgets(serializer.instance.project_id)
+    
+    def perform_update(self, serializer):
+        previous_project_id = serializer.instance.project_id
+        serializer.save()
+        invalidate_budgets(previous_project_id, serializer.instance.project_id)
+    
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_budgets(instance.project_id)
+
+class ReleaseViewSet(viewsets.ModelViewSet):
+    serializer_class = ReleaseSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = Release.objects.filter(
+            project__owner=self.request.user
+        )
+        project_id = project_id_param(self.request)
+        if project_id:
+            queryset = queryset.filter(project_id=project_id)
+        return queryset
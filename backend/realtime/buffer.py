@@ -0,0 +1,125 @@
+import asyncio
+import atexit
+import logging
+import uuid
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from performance.ingest import save_metrics, save_component_analyses
+from performance.models import Project, PerformanceMetric, ComponentAnalysis
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Per-process buffer that coalesces WebSocket rows into bulk inserts.
+
+    Consumers call ``add`` with unsaved model instances and return
+    immediately; a single background task flushes the rows of every
+    connection in this process once ``max_rows`` are pending or
+    ``flush_interval`` seconds have passed, whichever comes first.
+    """
+
+    writers = {
+        PerformanceMetric: save_metrics,
+        ComponentAnalysis: save_component_analyses,
+    }
+
+    def __init__(self, max_rows=None, flush_interval=None, max_pending=None):
+        self.max_rows = max_rows or settings.REALTIME_BUFFER_MAX_ROWS
+        self.flush_interval = flush_interval or settings.REALTIME_BUFFER_FLUSH_INTERVAL
+        self.max_pending = max_pending or settings.REALTIME_BUFFER_MAX_PENDING
+        self.dropped = 0
+        self._pending = {}
+        self._size = 0
+        self._full = None
+        self._flusher = None
+
+    def __len__(self):
+        return self._size
+
+    def add(self, instance):
+        """Queue an unsaved PerformanceMetric or ComponentAnalysis for insertion"""
+        if self._size >= self.max_pending:
+            # The database is not keeping up; shed load instead of growing without bound
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Write-behind buffer full, {self.dropped} rows dropped so far")
+            return
+
+        self._pending.setdefault(type(instance), []).append(instance)
+        self._size += 1
+
+        if self._full is None:
+            self._full = asyncio.Event()
+        if self._size >= self.max_rows:
+            self._full.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while self._size:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        """Write everything buffered so far; returns the number of rows inserted"""
+        if not self._size:
+            return 0
+
+        batches, self._pending, self._size = self._pending, {}, 0
+        self._full.clear()
+
+        try:
+            return await database_sync_to_async(self._write)(batches)
+        except Exception:
+            logger.exception("Error flushing write-behind buffer")
+            return 0
+
+    async def drain(self):
+        """Flush all pending rows and wait for the background flusher to finish"""
+        if self._flusher is not None and not self._flusher.done():
+            self._full.set()
+            await self._flusher
+        await self.flush()
+
+    def drain_sync(self):
+        """Synchronous last-resort flush for interpreter shutdown"""
+        if not self._size:
+            return 0
+        batches, self._pending, self._size = self._pending, {}, 0
+        try:
+            return self._write(batches)
+        except Exception:
+            logger.exception("Error draining write-behind buffer at exit")
+            return 0
+
+    def _write(self, batches):
+        # Resolve every referenced project once per flush instead of once per row
+        project_ids = {_as_uuid(row.project_id) for rows in batches.values() for row in rows}
+        project_ids.discard(None)
+        known = set(Project.objects.filter(id__in=project_ids).values_list('id', flat=True))
+
+        written = 0
+        for model, rows in batches.items():
+            valid = [row for row in rows if _as_uuid(row.project_id) in known]
+            if len(valid) != len(rows):
+                logger.warning(f"Discarded {len(rows) - len(valid)} {model.__name__} rows for unknown projects")
+            if valid:
+                written += self.writers[model](valid)
+        return written
+
+
+def _as_uuid(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+write_buffer = WriteBehindBuffer()
+atexit.register(write_buffer.drain_sync)
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastCoalescer:
+    """Per-process micro-batcher for group broadcasts.
+
+    ``add`` queues one event for a group and returns immediately. The events
+    of each (group, message type) go out as a single group message carrying
+    a list in ``data``, either once ``max_events`` are pending or ``window``
+    seconds after the first one arrived, so added latency is bounded by the
+    window while Redis publishes and client frames drop by the batch size.
+    """
+
+    def __init__(self, window=None, max_events=None):
+        self.window = window or settings.REALTIME_COALESCE_WINDOW
+        self.max_events = max_events or settings.REALTIME_COALESCE_MAX_EVENTS
+        self.events = 0
+        self.batches = 0
+        self._pending = {}
+        self._timers = {}
+        self._sending = set()
+
+    def add(self, group_name, message_type, data):
+        key = (group_name, message_type)
+        events = self._pending.get(key)
+        if events is None:
+            events = self._pending[key] = []
+            self._timers[key] = asyncio.get_running_loop().call_later(self.window, self._dispatch, key)
+        events.append(data)
+        self.events += 1
+
+        if len(events) >= self.max_events:
+            self._timers.pop(key).cancel()
+            self._dispatch(key)
+
+    def _dispatch(self, key):
+        self._timers.pop(key, None)
+        events = self._pending.pop(key, None)
+        if not events:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(key, events))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, key, events):
+        group_name, message_type = key
+        try:
+            await get_channel_layer().group_send(group_name, {'type': message_type, 'data': events})
+            self.batches += 1
+        except Exception as e:
+            logger.error(f"Error broadcasting {len(events)} {message_type} events to {group_name}: {e}")
+
+    async def flush(self):
+        """Send everything pending now and wait for in-flight batches"""
+        for key, timer in list(self._timers.items()):
+            timer.cancel()
+            self._dispatch(key)
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+
+
+coalescer = BroadcastCoalescer()
@@ -1,15 +1,91 @@
-import json
+import time
+from datetime import datetime
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import User
-from performance.models import Project, PerformanceMetric
-import asyncio
+from performance.ingest import METRIC_TYPES, parse_timestamp, validate_record, validate_component_record
+from .buffer import write_buffer
+from .coalescer import coalescer
+from .live import live_store
+from .outbox import SLOW_CLIENT_CLOSE_CODE, Outbox, stats
+from .protocol import ProtocolError, codec_for
+from .publisher import publishers
 
-class PerformanceConsumer(AsyncWebsocketConsumer):
+def merge_periodic(older, newer):
+    """Fold a still-unsent periodic update into the newer one, newest rows first"""
+    newer['data']['metrics'] = (
+        newer['data']['metrics'] + older['data']['metrics']
+    )[:settings.REALTIME_PUBLISHER_MAX_ROWS]
+    return newer
+
+def latest_by(field):
+    """Merge for unsent batches: keep only the newest event per ``field`` value"""
+    def merge(older, newer):
+        latest = {}
+        for item in older['data'] + newer['data']:
+            latest[item.get(field)] = item
+        newer['data'] = list(latest.values())
+        return newer
+    return merge
+
+class BufferedConsumer(AsyncWebsocketConsumer):
+    """Consumer whose outbound messages go through a bounded, conflating Outbox.
+    
+    Group handlers never await the socket, so a slow client cannot stall
+    this consumer's channel and make the layer drop messages for it.
+    """
+    outbox = None
+    codec = None
+    
+    async def accept(self, subprotocol=None):
+        # Binary frames only for clients that offered the subprotocol; JSON text otherwise
+        self.codec = codec_for(self.scope.get('subprotocols'))
+        await super().accept(subprotocol or self.codec.subprotocol)
+        self.outbox = Outbox(self.send_message)
+    
+    async def websocket_disconnect(self, message):
+        if self.outbox is not None:
+            self.outbox.close()
+        await super().websocket_disconnect(message)
+    
+    async def send_message(self, message):
+        await self.send(**self.codec.encode(message))
+    
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            messages = self.codec.decode(text_data, bytes_data)
+        except ProtocolError as e:
+            print(f"Invalid frame: {e}")
+            return
+        
+        for message in messages:
+            if isinstance(message, dict):
+                await self.handle(message)
+    
+    async def handle(self, message):
+        pass
+    
+    async def push(self, message, key=None, merge=None):
+        if self.outbox is None or self.outbox.put(message, key, merge):
+            return
+        
+        # Persistently lagging client: disconnect it so it can reconnect and resync
+        stats['slow_disconnects'] += 1
+        self.outbox.close()
+        await self.close(code=SLOW_CLIENT_CLOSE_CODE)
+
+class PerformanceConsumer(BufferedConsumer):
     async def connect(self):
         self.project_id = self.scope['url_route']['kwargs']['project_id']
         self.room_group_name = f'performance_{self.project_id}'
         
+        # Server-side subscription filters and the last-seen periodic cursor: (store source, sequence)
+        self.subscribed_metrics = set()
+        self.url_prefix = ''
+        self.since = None
+        self.cursor = None
+        self.snapshot_ids = set()
+        
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
@@ -18,113 +94,137 @@ class PerformanceConsumer(AsyncWebsocketConsumer):
         
         await self.accept()
         
-        # Start sending periodic updates
-        asyncio.create_task(self.send_periodic_updates())
+        # Periodic updates come from one shared publisher per project group
+        snapshot = await publishers.subscribe(self.room_group_name, self.project_id)
+        self.cursor = (live_store.source, live_store.head(self.project_id))
+        if snapshot:
+            # The first update may come from another worker's store, whose sequences differ from ours
+            self.snapshot_ids = {metric['id'] for _, metric in snapshot}
+            await self.push({
+                'type': 'periodic_update',
+                'data': {
+                    'metrics': [metric for _, metric in snapshot],
+                    'timestamp': time.time()
+                }
+            }, key='periodic', merge=merge_periodic)
     
     async def disconnect(self, close_code):
+        if hasattr(self, 'room_group_name'):
+            await publishers.unsubscribe(self.room_group_name)
+        
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
     
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message_type = text_data_json.get('type')
+    async def handle(self, message):
+        message_type = message.get('type')
         
         if message_type == 'metric_update':
             # Handle real-time metric updates
-            await self.handle_metric_update(text_data_json)
+            await self.handle_metric_update(message)
         elif message_type == 'subscribe_metrics':
             # Subscribe to specific metrics
-            await self.handle_subscribe_metrics(text_data_json)
+            await self.handle_subscribe_metrics(message)
     
     async def handle_metric_update(self, data):
-        # Save metric to database
-        await self.save_metric(data)
+        # Queue metric for the write-behind buffer; the broadcast does not wait for the flush
+        try:
+            metric = validate_record(data, self.project_id)
+        except ValueError as e:
+            print(f"Error saving metric: {e}")
+            return
+        write_buffer.add(metric)
         
-        # Broadcast to room group
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'metric_message',
-                'data': data
-            }
-        )
+        # Broadcast the validated point to room group in micro-batches
+        coalescer.add(self.room_group_name, 'metric_batch', {
+            'metric_type': metric.metric_type,
+            'value': metric.value,
+            'timestamp': metric.timestamp.isoformat(),
+            'url': metric.url
+        })
     
     async def handle_subscribe_metrics(self, data):
-        metric_types = data.get('metric_types', [])
-        # Store subscription preferences
-        self.subscribed_metrics = metric_types
+        metric_types = data.get('metric_types') or []
+        url_prefix = data.get('url_prefix') or ''
+        
+        # Store subscription preferences; an empty list means every metric type
+        self.subscribed_metrics = {
+            metric_type for metric_type in metric_types if metric_type in METRIC_TYPES
+        } if isinstance(metric_types, list) else set()
+        self.url_prefix = url_prefix if isinstance(url_prefix, str) else ''
+        
+        # Optional resume point so reconnecting clients only get rows stamped after it
+        if data.get('since') is not None:
+            try:
+                self.since = parse_timestamp(data['since'])
+            except (ValueError, OverflowError, OSError) as e:
+                print(f"Invalid subscription cursor: {e}")
     
-    async def metric_message(self, event):
-        data = event['data']
+    def wants(self, metric):
+        if self.subscribed_metrics and metric.get('metric_type') not in self.subscribed_metrics:
+            return False
+        if self.url_prefix and not str(metric.get('url') or '').startswith(self.url_prefix):
+            return False
+        return True
+    
+    async def metric_batch(self, event):
+        # Filter before serializing so unsubscribed sockets cost nothing
+        metrics = [metric for metric in event['data'] if self.wants(metric)]
+        if not metrics:
+            return
         
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'metric_update',
-            'data': data
-        }))
+        # One frame per batch; a lagging socket only gets the latest value per metric type
+        await self.push({
+            'type': 'metric_batch',
+            'data': metrics
+        }, key='metric_batch', merge=latest_by('metric_type'))
     
-    async def send_periodic_updates(self):
-        """Send periodic performance updates"""
-        while True:
-            try:
-                # Get latest metrics
-                metrics = await self.get_latest_metrics()
-                
-                await self.send(text_data=json.dumps({
-                    'type': 'periodic_update',
-                    'data': {
-                        'metrics': metrics,
-                        'timestamp': asyncio.get_event_loop().time()
-                    }
-                }))
-                
-                # Wait 5 seconds before next update
-                await asyncio.sleep(5)
-                
-            except Exception as e:
-                print(f"Error in periodic updates: {e}")
-                break
-    
-    @database_sync_to_async
-    def save_metric(self, data):
-        try:
-            project = Project.objects.get(id=self.project_id)
-            PerformanceMetric.objects.create(
-                project=project,
-                metric_type=data.get('metric_type'),
-                value=data.get('value'),
-                url=data.get('url', ''),
-                user_agent=data.get('user_agent', '')
-            )
-        except Exception as e:
-            print(f"Error saving metric: {e}")
+    async def budget_breach(self, event):
+        await self.push({
+            'type': 'budget_breach',
+            'data': event['data']
+        }, key=('budget', event['data']['budget_id']))
     
-    @database_sync_to_async
-    def get_latest_metrics(self):
-        try:
-            project = Project.objects.get(id=self.project_id)
-            metrics = PerformanceMetric.objects.filter(
-                project=project
-            ).order_by('-timestamp')[:10]
-            
-            return [
-                {
-                    'id': str(metric.id),
-                    'metric_type': metric.metric_type,
-                    'value': metric.value,
-                    'timestamp': metric.timestamp.isoformat(),
-                    'url': metric.url
-                }
-                for metric in metrics
-            ]
-        except Exception as e:
-            print(f"Error getting metrics: {e}")
-            return []
+    async def budget_recovered(self, event):
+        await self.push({
+            'type': 'budget_recovered',
+            'data': event['data']
+        }, key=('budget', event['data']['budget_id']))
+    
+    async def periodic_update(self, event):
+        data = event['data']
+        
+        # Only rows added to the store after this socket's cursor, in insertion order, that match its filters
+        source, sequence = self.cursor
+        same_store = event['source'] == source
+        metrics = []
+        for metric, added in zip(data['metrics'], event['sequences']):
+            if same_store and added <= sequence:
+                continue
+            if not same_store and metric['id'] in self.snapshot_ids:
+                continue
+            if self.since is not None and datetime.fromisoformat(metric['timestamp']) <= self.since:
+                continue
+            if self.wants(metric):
+                metrics.append(metric)
+        self.cursor = (event['source'], max(event['sequences'], default=sequence if same_store else 0))
+        self.snapshot_ids = set()
+        
+        if not metrics:
+            return
+        
+        await self.push({
+            'type': 'periodic_update',
+            'data': {
+                'metrics': metrics,
+                'aggregates': data.get('aggregates', {}),
+                'timestamp': data['timestamp']
+            }
+        }, key='periodic', merge=merge_periodic)
 
-class ComponentAnalysisConsumer(AsyncWebsocketConsumer):
+class ComponentAnalysisConsumer(BufferedConsumer):
     async def connect(self):
         self.project_id = self.scope['url_route']['kwargs']['project_id']
         self.room_group_name = f'components_{self.project_id}'
@@ -142,49 +242,33 @@ class ComponentAnalysisConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
     
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message_type = text_data_json.get('type')
-        
-        if message_type == 'component_analysis':
-            await self.handle_component_analysis(text_data_json)
+    async def handle(self, message):
+        if message.get('type') == 'component_analysis':
+            await self.handle_component_analysis(message)
     
     async def handle_component_analysis(self, data):
-        # Process component analysis data
-        await self.save_component_analysis(data)
-        
-        # Broadcast to room group
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'analysis_message',
-                'data': data
-            }
-        )
-    
-    async def analysis_message(self, event):
-        data = event['data']
-        
-        await self.send(text_data=json.dumps({
-            'type': 'component_analysis',
-            'data': data
-        }))
-    
-    @database_sync_to_async
-    def save_component_analysis(self, data):
-        from performance.models import ComponentAnalysis
-        
+        # Queue component sample for the write-behind buffer
         try:
-            project = Project.objects.get(id=self.project_id)
-            ComponentAnalysis.objects.create(
-                project=project,
-                component_name=data.get('component_name'),
-                file_path=data.get('file_path'),
-                render_time=data.get('render_time', 0),
-                memory_usage=data.get('memory_usage', 0),
-                re_render_count=data.get('re_render_count', 0),
-                props_count=data.get('props_count', 0),
-                children_count=data.get('children_count', 0)
-            )
-        except Exception as e:
+            analysis = validate_component_record(data, self.project_id)
+        except ValueError as e:
             print(f"Error saving component analysis: {e}")
+            return
+        write_buffer.add(analysis)
+        
+        # Broadcast the validated sample to room group in micro-batches
+        coalescer.add(self.room_group_name, 'component_batch', {
+            'component_name': analysis.component_name,
+            'file_path': analysis.file_path,
+            'render_time': analysis.render_time,
+            'memory_usage': analysis.memory_usage,
+            're_render_count': analysis.re_render_count,
+            'props_count': analysis.props_count,
+            'children_count': analysis.children_count,
+            'timestamp': analysis.timestamp.isoformat()
+        })
+    
+    async def component_batch(self, event):
+        await self.push({
+            'type': 'component_batch',
+            'data': event['data']
+        }, key='component_batch', merge=latest_by('component_name'))
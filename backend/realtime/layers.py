@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import uuid
+from collections import deque
+from functools import lru_cache
+
+from channels.layers import BaseChannelLayer, InMemoryChannelLayer
+
+# Shard URLs with this scheme are in-process layers, for tests and local fan-out checks
+MEMORY_SCHEME = 'memory://'
+
+
+@lru_cache(maxsize=8192)
+def rendezvous(key, shards):
+    """Highest-random-weight shard for ``key``.
+
+    Each key only depends on its own score per shard, so adding a shard
+    moves just the keys the new shard wins and removing one moves only the
+    keys it held.
+    """
+    return max(
+        shards,
+        key=lambda shard: hashlib.blake2b(f'{shard}\x00{key}'.encode('utf-8'), digest_size=8).digest()
+    )
+
+
+def routing_key(group):
+    """Project id of ``performance_<id>``, ``components_<id>`` and ``live_<id>``, so a project's groups share a shard"""
+    prefix, _, rest = group.partition('_')
+    return rest or prefix
+
+
+def child_layer(url, options):
+    if url.startswith(MEMORY_SCHEME):
+        return InMemoryChannelLayer(**options)
+    from channels_redis.core import RedisChannelLayer
+    return RedisChannelLayer(hosts=[url], **options)
+
+
+class ShardedChannelLayer(BaseChannelLayer):
+    """Channel layer that spreads groups over several child layers, one per shard URL.
+
+    Groups are placed by rendezvous hashing on their project id, so each
+    project's membership and broadcasts live on exactly one Redis instance
+    and adding a shard only relocates about 1/n of the projects. A
+    process-local channel listens on its own home shard (for direct
+    ``send``) plus the shards of every group it joined in this process,
+    which is how consumers use groups. ``memory://<name>`` shards are
+    in-memory layers for tests.
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, shards=(), **options):
+        if not shards:
+            raise ValueError('ShardedChannelLayer needs at least one shard')
+        super().__init__(
+            expiry=options.get('expiry', 60),
+            capacity=options.get('capacity', 100),
+            channel_capacity=options.get('channel_capacity')
+        )
+        self.shards = tuple(sorted(set(shards)))
+        self.layers = {url: child_layer(url, options) for url in self.shards}
+
+        # One client prefix for every child, so a channel name minted here is valid on all shards
+        self.client_prefix = uuid.uuid4().hex
+        for layer in self.layers.values():
+            if hasattr(layer, 'client_prefix'):
+                layer.client_prefix = self.client_prefix
+
+        self.groups = {}
+        self._wakeups = {}
+        self._backlog = {}
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(shards={len(self.shards)})'
+
+    def shard_for_group(self, group):
+        return rendezvous(routing_key(group), self.shards)
+
+    def home_shard(self, channel):
+        return rendezvous(channel, self.shards)
+
+    def listening(self, channel):
+        """Shards a process-local channel has to receive from"""
+        shards = {self.shard_for_group(group) for group in self.groups.get(channel, ())}
+        shards.add(self.home_shard(channel))
+        return shards
+
+    async def new_channel(self, prefix='specific'):
+        return f'{prefix}.{self.client_prefix}!{uuid.uuid4().hex}'
+
+    async def send(self, channel, message):
+        await self.layers[self.home_shard(channel)].send(channel, message)
+
+    async def receive(self, channel):
+        if len(self.shards) == 1:
+            return await self.layers[self.shards[0]].receive(channel)
+
+        backlog = self._backlog.get(channel)
+        while not backlog:
+            # Listen on every shard at once; joining or leaving a group restarts the wait
+            wakeup = self._wakeups[channel] = asyncio.Event()
+            receivers = {
+                asyncio.ensure_future(self.layers[shard].receive(channel))
+                for shard in self.listening(channel)
+            }
+            waiter = asyncio.ensure_future(wakeup.wait())
+            try:
+                done, _ = await asyncio.wait(receivers | {waiter}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if self._wakeups.get(channel) is wakeup:
+                    del self._wakeups[channel]
+                for task in receivers | {waiter}:
+                    task.cancel()
+
+            error = None
+            for task in done & receivers:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                backlog = self._backlog.setdefault(channel, deque())
+                backlog.append(task.result())
+            if error is not None and not backlog:
+                raise error
+
+        message = backlog.popleft()
+        if not backlog:
+            del self._backlog[channel]
+        return message
+
+    def _wake(self, channel):
+        wakeup = self._wakeups.get(channel)
+        if wakeup is not None:
+            wakeup.set()
+
+    async def group_add(self, group, channel):
+        shard = self.shard_for_group(group)
+        await self.layers[shard].group_add(group, channel)
+        if '!' in channel:
+            self.groups.setdefault(channel, set()).add(group)
+            self._wake(channel)
+
+    async def group_discard(self, group, channel):
+        await self.layers[self.shard_for_group(group)].group_discard(group, channel)
+        groups = self.groups.get(channel)
+        if groups is not None:
+            groups.discard(group)
+            if not groups:
+                del self.groups[channel]
+            self._wake(channel)
+
+    async def group_send(self, group, message):
+        await self.layers[self.shard_for_group(group)].group_send(group, message)
+
+    async def flush(self):
+        self.groups.clear()
+        self._backlog.clear()
+        for layer in self.layers.values():
+            await layer.flush()
+
+    async def close(self):
+        for layer in self.layers.values():
+            if hasattr(layer, 'close_pools'):
+                await layer.close_pools()
+
+
+def in_process(layer):
+    """True when every message stays inside this process (no cross-worker delivery)"""
+    if isinstance(layer, ShardedChannelLayer):
+        return all(isinstance(child, InMemoryChannelLayer) for child in layer.layers.values())
+    return isinstance(layer, InMemoryChannelLayer)
+
+
+async def check_fanout(layer, projects=100, sockets=3, timeout=5.0):
+    """Exercise group fan-out the way consumers do and count delivery errors.
+
+    Every project gets ``sockets`` channels in both of its groups; each
+    channel starts receiving before it joins, like a consumer. One message
+    per group must reach exactly its members. Then the first socket of every
+    group leaves and a second round must skip it.
+    """
+    members = {}
+    receivers = {}
+    for _ in range(projects):
+        project_id = str(uuid.uuid4())
+        for group in (f'performance_{project_id}', f'components_{project_id}'):
+            for _ in range(sockets):
+                channel = await layer.new_channel()
+                receivers[channel] = asyncio.ensure_future(layer.receive(channel))
+                await layer.group_add(group, channel)
+                members[channel] = group
+
+    counts = {'channels': len(members), 'missing': 0, 'misrouted': 0, 'unexpected': 0}
+    left = set()
+    for round_number in (1, 2):
+        for group in set(members.values()):
+            await layer.group_send(group, {'type': 'fanout.check', 'group': group, 'round': round_number})
+        expected = {channel: task for channel, task in receivers.items() if channel not in left}
+        done, _ = await asyncio.wait(expected.values(), timeout=timeout)
+        done = {task for task in receivers.values() if task.done()}
+        for channel, task in receivers.items():
+            if task not in done:
+                counts['missing'] += channel in expected
+                continue
+            message = task.result()
+            if channel in left:
+                counts['unexpected'] += 1
+            elif message['group'] != members[channel] or message['round'] != round_number:
+                counts['misrouted'] += 1
+            receivers[channel] = asyncio.ensure_future(layer.receive(channel))
+
+        if round_number == 1:
+            first = {}
+            for channel, group in members.items():
+                first.setdefault(group, channel)
+            for group, channel in first.items():
+                await layer.group_discard(group, channel)
+                left.add(channel)
+
+    # Nothing further may arrive anywhere
+    done, _ = await asyncio.wait(receivers.values(), timeout=min(timeout, 0.2))
+    counts['unexpected'] += len(done)
+    for task in receivers.values():
+        task.cancel()
+    await asyncio.gather(*receivers.values(), return_exceptions=True)
+    return counts
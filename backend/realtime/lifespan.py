@@ -0,0 +1,32 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LifespanApp:
+    """ASGI lifespan handler that drains per-process realtime state on shutdown"""
+    
+    async def __call__(self, scope, receive, send):
+        while True:
+            message = await receive()
+            
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def shutdown(self):
+        from .buffer import write_buffer
+        from .coalescer import coalescer
+        
+        try:
+            await coalescer.flush()
+        except Exception:
+            logger.exception("Error flushing broadcast coalescer on shutdown")
+        
+        try:
+            await write_buffer.drain()
+        except Exception:
+            logger.exception("Error draining write-behind buffer on shutdown")
@@ -0,0 +1,358 @@
+import asyncio
+import heapq
+import logging
+import time
+import uuid
+from array import array
+from collections import deque
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import timezone
+
+from performance.models import PerformanceMetric
+from performance.rollups import summarize
+
+logger = logging.getLogger(__name__)
+
+
+def metric_cursor(timestamp, metric_id):
+    """Sortable (epoch microseconds, id) cursor for a metric row"""
+    return (int(timestamp.timestamp() * 1_000_000), str(metric_id))
+
+
+def metric_row(metric):
+    return {
+        'id': str(metric.id),
+        'metric_type': metric.metric_type,
+        'value': metric.value,
+        'timestamp': metric.timestamp.isoformat(),
+        'url': metric.url
+    }
+
+
+def live_group(project_id):
+    """Group of the per-process live feeds of a project, on the same channel shard as its socket groups"""
+    return f'live_{project_id}'
+
+
+def broadcast_metrics(metrics):
+    """Send freshly saved metrics to the live stores of every ASGI process serving their projects.
+
+    Each process receives one copy on its live feed channel, however many
+    sockets it holds for the project.
+
+    Events carry at most LIVE_BROADCAST_MAX_ROWS of the newest points, but
+    per-minute totals of the whole batch so the running aggregates stay exact.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not metrics:
+        return
+
+    by_project = {}
+    for metric in metrics:
+        by_project.setdefault(str(metric.project_id), []).append(metric)
+
+    send = async_to_sync(channel_layer.group_send)
+    for project_id, rows in by_project.items():
+        totals = {}
+        for metric in rows:
+            key = (metric.metric_type, int(metric.timestamp.timestamp() // 60))
+            total = totals.get(key)
+            if total is None:
+                totals[key] = [1, metric.value, metric.value, metric.value]
+            else:
+                total[0] += 1
+                total[1] += metric.value
+                total[2] = min(total[2], metric.value)
+                total[3] = max(total[3], metric.value)
+
+        newest = heapq.nlargest(
+            settings.LIVE_BROADCAST_MAX_ROWS, rows, key=lambda metric: metric_cursor(metric.timestamp, metric.id)
+        )
+        try:
+            send(live_group(project_id), {
+                'type': 'live_metrics',
+                'id': uuid.uuid4().hex,
+                'project_id': project_id,
+                'metrics': [metric_row(metric) for metric in newest],
+                'cursors': [metric_cursor(metric.timestamp, metric.id) for metric in newest],
+                'totals': [[metric_type, minute, *total] for (metric_type, minute), total in totals.items()]
+            })
+        except Exception as e:
+            # Live charts catch up from the database on the next cold start; ingestion must not fail
+            logger.warning(f"Could not broadcast live metrics for {project_id}: {e}")
+
+
+class LiveSeries:
+    """Ring buffer of the newest points of one metric type plus per-minute running aggregates.
+
+    Numbers live in preallocated arrays; appending overwrites the oldest
+    slot, so memory is fixed at ``capacity`` points and ``minutes`` buckets.
+    """
+
+    def __init__(self, metric_type, capacity, minutes):
+        self.metric_type = metric_type
+        self.capacity = capacity
+        self.sequences = array('q', [0]) * capacity
+        self.timestamps = array('q', [0]) * capacity
+        self.values = array('d', [0.0]) * capacity
+        self.ids = [None] * capacity
+        self.urls = [None] * capacity
+        self.head = 0
+        self.size = 0
+
+        self.minutes = minutes
+        self.bucket_minutes = array('q', [-1]) * minutes
+        self.counts = array('q', [0]) * minutes
+        self.sums = array('d', [0.0]) * minutes
+        self.mins = array('d', [0.0]) * minutes
+        self.maxs = array('d', [0.0]) * minutes
+
+    def append(self, sequence, cursor, row):
+        position = self.head
+        self.sequences[position] = sequence
+        self.timestamps[position] = cursor[0]
+        self.values[position] = row['value']
+        self.ids[position] = cursor[1]
+        self.urls[position] = row.get('url', '')
+        self.head = (position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def row(self, position):
+        return {
+            'id': self.ids[position],
+            'metric_type': self.metric_type,
+            'value': self.values[position],
+            'timestamp': datetime.fromtimestamp(self.timestamps[position] / 1_000_000, tz=dt_timezone.utc).isoformat(),
+            'url': self.urls[position]
+        }
+
+    def accumulate(self, minute, count, total, minimum, maximum):
+        slot = minute % self.minutes
+        if self.bucket_minutes[slot] != minute:
+            if self.bucket_minutes[slot] > minute:
+                # Older than anything the ring still holds
+                return
+            self.bucket_minutes[slot] = minute
+            self.counts[slot] = 0
+            self.sums[slot] = 0.0
+            self.mins[slot] = minimum
+            self.maxs[slot] = maximum
+        self.counts[slot] += count
+        self.sums[slot] += total
+        self.mins[slot] = min(self.mins[slot], minimum)
+        self.maxs[slot] = max(self.maxs[slot], maximum)
+
+    def newest(self):
+        """Positions from newest to oldest"""
+        for offset in range(1, self.size + 1):
+            yield (self.head - offset) % self.capacity
+
+    def totals(self, now_minute):
+        count = 0
+        total = 0.0
+        minimum = maximum = None
+        for slot in range(self.minutes):
+            if now_minute - self.minutes < self.bucket_minutes[slot] <= now_minute and self.counts[slot]:
+                count += self.counts[slot]
+                total += self.sums[slot]
+                minimum = self.mins[slot] if minimum is None else min(minimum, self.mins[slot])
+                maximum = self.maxs[slot] if maximum is None else max(maximum, self.maxs[slot])
+        return {
+            'count': count,
+            'avg': total / count if count else None,
+            'min': minimum,
+            'max': maximum,
+        }
+
+
+class LiveProject:
+    def __init__(self):
+        self.series = {}
+        self.sequence = 0
+        self.seen_events = deque(maxlen=256)
+
+    def get_series(self, metric_type):
+        series = self.series.get(metric_type)
+        if series is None:
+            series = self.series[metric_type] = LiveSeries(
+                metric_type, settings.LIVE_CAPACITY, settings.LIVE_WINDOW_MINUTES
+            )
+        return series
+
+    def add(self, rows, cursors, totals):
+        # Oldest first so sequence order follows time order within a batch
+        for cursor, row in sorted(zip(map(tuple, cursors), rows)):
+            self.sequence += 1
+            self.get_series(row['metric_type']).append(self.sequence, cursor, row)
+        for metric_type, minute, count, total, minimum, maximum in totals:
+            self.get_series(metric_type).accumulate(minute, count, total, minimum, maximum)
+
+
+def load_recent(project_id):
+    """Newest points and per-minute aggregates for a cold live store, from rollups plus the raw tail"""
+    now = timezone.now()
+    start = now - timedelta(minutes=settings.LIVE_WINDOW_MINUTES)
+    metrics = list(
+        PerformanceMetric.objects.filter(project_id=project_id, timestamp__gte=start)
+        .order_by('-timestamp', '-id')[:settings.LIVE_WARM_POINTS]
+    )
+    buckets = summarize({'project_id': project_id}, start, now, bucket='minute')
+    totals = [
+        [metric_type, int(bucket_start.timestamp() // 60), aggregate.count, aggregate.sum, aggregate.min, aggregate.max]
+        for (metric_type, bucket_start), aggregate in buckets.items()
+        if aggregate.count
+    ]
+    return (
+        [metric_row(metric) for metric in metrics],
+        [metric_cursor(metric.timestamp, metric.id) for metric in metrics],
+        totals
+    )
+
+
+class LiveStore:
+    """Per-process store of recent metrics for every project with a local live subscriber.
+
+    Fed by ``live_metrics`` events on the live feed, so the periodic publisher and
+    new-socket snapshots are served from memory without a database query.
+    """
+
+    def __init__(self):
+        self.projects = {}
+        self._warming = {}
+        # Sequences are only comparable within one store; periodic updates carry this with them
+        self.source = uuid.uuid4().hex
+
+    async def warm(self, project_id):
+        """Load a project from the database once, on the first local subscriber"""
+        project_id = str(project_id)
+        if project_id in self.projects:
+            return
+        task = self._warming.get(project_id)
+        if task is None:
+            task = self._warming[project_id] = asyncio.ensure_future(database_sync_to_async(load_recent)(project_id))
+        try:
+            rows, cursors, totals = await asyncio.shield(task)
+        except Exception as e:
+            logger.error(f"Error warming live store for project {project_id}: {e}")
+            rows, cursors, totals = [], [], []
+        finally:
+            self._warming.pop(project_id, None)
+        if project_id not in self.projects:
+            project = self.projects[project_id] = LiveProject()
+            project.add(rows, cursors, totals)
+
+    def drop(self, project_id):
+        self.projects.pop(str(project_id), None)
+
+    def ingest(self, project_id, event):
+        """Apply a ``live_metrics`` event once, even if it is delivered again"""
+        project = self.projects.get(str(project_id))
+        if project is None or event['id'] in project.seen_events:
+            return
+        project.seen_events.append(event['id'])
+        project.add(event['metrics'], event['cursors'], event['totals'])
+
+    def head(self, project_id):
+        """Sequence of the last point added for a project"""
+        project = self.projects.get(str(project_id))
+        return project.sequence if project is not None else 0
+
+    def since(self, project_id, sequence, limit):
+        """Up to ``limit`` points added after ``sequence``, newest first; returns (rows, sequences, sequence).
+
+        Points are taken in insertion order, so late-stamped rows are not
+        skipped, and the returned sequence is where the next call resumes
+        when more than ``limit`` points are pending.
+        """
+        project = self.projects.get(str(project_id))
+        if project is None:
+            return [], [], sequence
+        found = []
+        for series in project.series.values():
+            for position in series.newest():
+                if series.sequences[position] <= sequence:
+                    break
+                found.append((series.sequences[position], series, position))
+        if len(found) > limit:
+            found = heapq.nsmallest(limit, found, key=lambda item: item[0])
+            resume = found[-1][0] if found else sequence
+        else:
+            resume = project.sequence
+        found.sort(key=lambda item: item[0], reverse=True)
+        return (
+            [series.row(position) for _, series, position in found],
+            [added for added, _, _ in found],
+            resume
+        )
+
+    def latest(self, project_id, limit=10):
+        """Newest ``limit`` points as (sequence, row) pairs"""
+        rows, sequences, _ = self.since(project_id, max(self.head(project_id) - limit, 0), limit)
+        return list(zip(sequences, rows))
+
+    def aggregates(self, project_id, now=None):
+        """Running count/avg/min/max per metric type over the live window"""
+        project = self.projects.get(str(project_id))
+        if project is None:
+            return {}
+        now_minute = int((now or time.time()) // 60)
+        return {
+            metric_type: series.totals(now_minute)
+            for metric_type, series in project.series.items()
+        }
+
+
+live_store = LiveStore()
+
+
+class LiveFeed:
+    """One channel per process that receives ``live_metrics`` events for the projects it serves.
+
+    The channel joins ``live_<project_id>`` while the process has a local
+    subscriber for the project, and a single reader task applies the events
+    to the live store.
+    """
+
+    def __init__(self):
+        self.channel = None
+        self.projects = set()
+        self.task = None
+
+    async def join(self, project_id):
+        channel_layer = get_channel_layer()
+        if self.channel is None:
+            self.channel = await channel_layer.new_channel()
+        self.projects.add(str(project_id))
+        await channel_layer.group_add(live_group(project_id), self.channel)
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run(channel_layer, self.channel))
+
+    async def leave(self, project_id):
+        self.projects.discard(str(project_id))
+        if self.channel is None:
+            return
+        await get_channel_layer().group_discard(live_group(project_id), self.channel)
+        if not self.projects and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def run(self, channel_layer, channel):
+        while True:
+            try:
+                message = await channel_layer.receive(channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error receiving live metrics: {e}")
+                await asyncio.sleep(1)
+                continue
+            if message.get('type') == 'live_metrics':
+                live_store.ingest(message['project_id'], message)
+
+
+live_feed = LiveFeed()
@@ -0,0 +1,372 @@
+"""Load generator for the realtime sockets, driven by ``manage.py ws_loadtest``.
+
+Simulated dashboards connect to ``ws/performance/<id>/`` and
+``ws/components/<id>/``, either in-process through the channels test
+communicator or over the network to a running ASGI server. One socket per
+project group injects points at a fixed rate; every point carries a
+sequence number, so each delivery to each member socket is one
+ingest-to-delivery latency sample.
+"""
+import asyncio
+import gc
+import json
+import os
+import time
+import uuid
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from performance.cache import invalidate_dashboard
+from performance.components import rebuild_component_rollups
+from performance.models import ComponentAnalysis, PerformanceMetric, Project
+from performance.rollups import mark_late_metrics
+from .protocol import BINARY_SUBPROTOCOL, FRAME_METRICS, decode_frame, pack_metrics
+
+LOADTEST_URL = 'https://loadtest.invalid/'
+LOADTEST_FILE = 'loadtest.jsx'
+METRIC_NAMES = [metric_type for metric_type, _ in PerformanceMetric.METRIC_TYPES]
+
+
+class LoadTestError(Exception):
+    """Raised when a load test cannot be set up"""
+
+
+def rss_bytes(pid='self'):
+    """Resident set size of a process from /proc, or None where that is unavailable"""
+    try:
+        with open(f'/proc/{pid}/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class CommunicatorClient:
+    """Socket served by the ASGI application in this process"""
+
+    def __init__(self, application, path, subprotocols):
+        from channels.testing import WebsocketCommunicator
+        self.communicator = WebsocketCommunicator(application, path, subprotocols=subprotocols)
+
+    async def connect(self, timeout):
+        connected, _ = await self.communicator.connect(timeout=timeout)
+        if not connected:
+            raise LoadTestError('connection rejected')
+
+    async def send(self, text_data=None, bytes_data=None):
+        await self.communicator.send_to(text_data=text_data, bytes_data=bytes_data)
+
+    async def recv(self):
+        # Cancelled from outside at the end of the run; a timeout here would cancel the app
+        message = await self.communicator.receive_output(timeout=24 * 3600)
+        if message['type'] == 'websocket.close':
+            raise ConnectionError(f"closed with code {message.get('code')}")
+        return message.get('text') if message.get('text') is not None else message.get('bytes')
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+class ServerClient:
+    """Socket to a running ASGI server"""
+
+    def __init__(self, url, subprotocols):
+        try:
+            import websockets
+        except ImportError:
+            raise LoadTestError('driving a running server requires the websockets package to be installed')
+        self.websockets = websockets
+        self.url = url
+        self.subprotocols = subprotocols
+        self.socket = None
+
+    async def connect(self, timeout):
+        self.socket = await asyncio.wait_for(
+            self.websockets.connect(self.url, subprotocols=self.subprotocols, max_size=None),
+            timeout
+        )
+
+    async def send(self, text_data=None, bytes_data=None):
+        await self.socket.send(text_data if text_data is not None else bytes_data)
+
+    async def recv(self):
+        return await self.socket.recv()
+
+    async def close(self):
+        if self.socket is not None:
+            await self.socket.close()
+
+
+class Socket:
+    def __init__(self, client, kind, project_id):
+        self.client = client
+        self.kind = kind
+        self.project_id = project_id
+        self.frames = 0
+        self.error = None
+
+
+class LoadTest:
+    """One run: connect ``clients`` sockets over the projects, inject for ``duration`` seconds, drain, report.
+
+    ``component_share`` of the sockets go to the components endpoint. The
+    first socket of each project group injects ``rate`` metric points (or
+    ``component_rate`` component samples) per second.
+    """
+
+    def __init__(self, project_ids, clients, duration, rate, component_rate=1.0, component_share=0.2,
+                 binary=False, url=None, server_pid=None, connect_timeout=10.0, drain=2.0, concurrency=100):
+        if not project_ids:
+            raise LoadTestError('no projects to load')
+        self.project_ids = [str(project_id) for project_id in project_ids]
+        self.clients = clients
+        self.duration = duration
+        self.rate = rate
+        self.component_rate = component_rate
+        self.component_share = component_share
+        self.binary = binary
+        self.url = url.rstrip('/') if url else None
+        self.server_pid = server_pid
+        self.connect_timeout = connect_timeout
+        self.drain = drain
+        self.concurrency = concurrency
+
+        self.sockets = []
+        self.sent_at = {}
+        self.expected = 0
+        self.latencies = []
+        self.sent = {'performance': 0, 'components': 0}
+        self.connect_errors = []
+        self.sequence = 0
+
+    def make_client(self, kind, project_id):
+        path = f'/ws/{kind}/{project_id}/'
+        subprotocols = [BINARY_SUBPROTOCOL] if self.binary else None
+        if self.url:
+            return ServerClient(self.url + path, subprotocols)
+        from perfmaster.asgi import application
+        return CommunicatorClient(application, path, subprotocols)
+
+    def plan(self):
+        """(kind, project_id) per socket, spread round-robin over the projects"""
+        component_sockets = int(self.clients * self.component_share)
+        return [
+            ('components' if index < component_sockets else 'performance', self.project_ids[index % len(self.project_ids)])
+            for index in range(self.clients)
+        ]
+
+    async def connect_all(self):
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def connect(kind, project_id):
+            async with limit:
+                try:
+                    client = self.make_client(kind, project_id)
+                    await client.connect(self.connect_timeout)
+                except LoadTestError:
+                    raise
+                except Exception as e:
+                    self.connect_errors.append(f'{kind}/{project_id}: {e!r}')
+                    return None
+                return Socket(client, kind, project_id)
+
+        sockets = await asyncio.gather(*(connect(kind, project_id) for kind, project_id in self.plan()))
+        self.sockets = [socket for socket in sockets if socket is not None]
+
+    def next_sequence(self):
+        self.sequence += 1
+        self.sent_at[self.sequence] = time.perf_counter()
+        return self.sequence
+
+    async def send_metric(self, socket):
+        sequence = self.next_sequence()
+        row = {
+            'metric_type': METRIC_NAMES[sequence % len(METRIC_NAMES)],
+            'value': float(sequence % 5000),
+            'timestamp': time.time(),
+            'url': f'{LOADTEST_URL}{sequence}',
+        }
+        if self.binary:
+            await socket.client.send(bytes_data=bytes([FRAME_METRICS]) + pack_metrics([row]))
+        else:
+            await socket.client.send(text_data=json.dumps({'type': 'metric_update', **row}))
+
+    async def send_component(self, socket):
+        sequence = self.next_sequence()
+        await socket.client.send(text_data=json.dumps({
+            'type': 'component_analysis',
+            'component_name': f'LoadTest{sequence % 100}',
+            'file_path': LOADTEST_FILE,
+            'render_time': float(sequence % 50),
+            # Carried in a field the consumer validates and rebroadcasts
+            'memory_usage': float(sequence),
+        }))
+
+    async def produce(self, socket, rate, members, deadline):
+        send = self.send_metric if socket.kind == 'performance' else self.send_component
+        interval = 1.0 / rate
+        next_at = time.perf_counter()
+        while next_at < deadline:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await send(socket)
+            except Exception as e:
+                socket.error = repr(e)
+                return
+            self.sent[socket.kind] += 1
+            self.expected += members
+            next_at += interval
+
+    def record(self, sequence):
+        sent_at = self.sent_at.get(sequence)
+        if sent_at is not None:
+            self.latencies.append(time.perf_counter() - sent_at)
+
+    async def consume(self, socket):
+        while True:
+            try:
+                frame = await socket.client.recv()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                socket.error = repr(e)
+                return
+            socket.frames += 1
+            message = decode_frame(frame) if isinstance(frame, bytes) else json.loads(frame)
+
+            message_type = message.get('type')
+            if message_type == 'metric_batch':
+                for row in message['data']:
+                    url = row.get('url') or ''
+                    if url.startswith(LOADTEST_URL):
+                        self.record(int(url[len(LOADTEST_URL):]))
+            elif message_type == 'component_batch':
+                for item in message['data']:
+                    if item.get('file_path') == LOADTEST_FILE:
+                        self.record(int(item['memory_usage']))
+
+    def memory(self):
+        return rss_bytes(self.server_pid) if self.server_pid else (None if self.url else rss_bytes())
+
+    async def run(self):
+        gc.collect()
+        baseline = self.memory()
+        started = time.perf_counter()
+        await self.connect_all()
+        connect_seconds = time.perf_counter() - started
+        gc.collect()
+        connected_memory = self.memory()
+
+        groups = {}
+        for socket in self.sockets:
+            groups.setdefault((socket.kind, socket.project_id), []).append(socket)
+
+        readers = [asyncio.ensure_future(self.consume(socket)) for socket in self.sockets]
+        started = time.perf_counter()
+        deadline = started + self.duration
+        producers = []
+        for (kind, _), members in groups.items():
+            rate = self.rate if kind == 'performance' else self.component_rate
+            if rate > 0:
+                producers.append(self.produce(members[0], rate, len(members), deadline))
+        await asyncio.gather(*producers)
+        await asyncio.sleep(self.drain)
+        elapsed = time.perf_counter() - started
+
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        await asyncio.gather(*(socket.client.close() for socket in self.sockets), return_exceptions=True)
+        if not self.url:
+            from .buffer import write_buffer
+            await write_buffer.drain()
+
+        return self.report(baseline, connected_memory, connect_seconds, elapsed)
+
+    def report(self, baseline, connected_memory, connect_seconds, elapsed):
+        latencies = np.array(self.latencies) * 1000
+        frames = sum(socket.frames for socket in self.sockets)
+        per_connection = None
+        if baseline is not None and connected_memory is not None and self.sockets:
+            per_connection = max(connected_memory - baseline, 0) / len(self.sockets) / 1024
+        return {
+            'clients': self.clients,
+            'connected': len(self.sockets),
+            'connect_errors': len(self.connect_errors),
+            'socket_errors': sum(1 for socket in self.sockets if socket.error),
+            'connect_seconds': connect_seconds,
+            'seconds': elapsed,
+            'metrics_sent': self.sent['performance'],
+            'components_sent': self.sent['components'],
+            'deliveries': len(self.latencies),
+            'delivery_ratio': len(self.latencies) / self.expected if self.expected else 1.0,
+            'frames': frames,
+            'frames_per_second': frames / elapsed if elapsed else 0.0,
+            'p50_ms': float(np.percentile(latencies, 50)) if latencies.size else None,
+            'p90_ms': float(np.percentile(latencies, 90)) if latencies.size else None,
+            'p99_ms': float(np.percentile(latencies, 99)) if latencies.size else None,
+            'max_ms': float(latencies.max()) if latencies.size else None,
+            'kb_per_connection': per_connection,
+        }
+
+
+def create_projects(count):
+    """Throwaway owner and projects for one run; deleting the owner cascades to everything written for them"""
+    owner = User.objects.create_user(f'ws-loadtest-{uuid.uuid4().hex[:12]}', is_active=False)
+    projects = Project.objects.bulk_create(
+        [Project(name=f'ws_loadtest {index + 1}', owner=owner) for index in range(count)]
+    )
+    return owner, [project.id for project in projects]
+
+
+def remove_injected(project_ids, since):
+    """Delete what a run injected into existing projects since ``since`` and repair the rollups it reached.
+
+    Metric hours a rollup watermark may already have passed are flagged for
+    re-aggregation; component rollups are rebuilt from the remaining samples.
+    """
+    metrics = PerformanceMetric.objects.filter(
+        project_id__in=project_ids, timestamp__gte=since, url__startswith=LOADTEST_URL
+    )
+    components = ComponentAnalysis.objects.filter(
+        project_id__in=project_ids, timestamp__gte=since, file_path=LOADTEST_FILE
+    )
+    with transaction.atomic():
+        removed = list(metrics.only('project_id', 'timestamp'))
+        removed_metrics = metrics.delete()[0]
+        mark_late_metrics(removed)
+        removed_components = components.delete()[0]
+        if removed_components:
+            rebuild_component_rollups(since, timezone.now() + timedelta(hours=1), {'project_id__in': project_ids})
+
+    invalidate_dashboard(*project_ids)
+    return removed_metrics, removed_components
+
+
+def slo_violations(report, p50_ms=None, p99_ms=None, min_delivery=None, max_connection_kb=None):
+    """Human-readable breaches of the configured service levels for a load test report"""
+    p50_ms = settings.LOADTEST_SLO_P50_MS if p50_ms is None else p50_ms
+    p99_ms = settings.LOADTEST_SLO_P99_MS if p99_ms is None else p99_ms
+    min_delivery = settings.LOADTEST_SLO_MIN_DELIVERY if min_delivery is None else min_delivery
+    max_connection_kb = settings.LOADTEST_SLO_MAX_CONNECTION_KB if max_connection_kb is None else max_connection_kb
+
+    violations = []
+    if report['connect_errors'] or report['socket_errors']:
+        violations.append(f"{report['connect_errors']} connect and {report['socket_errors']} socket errors")
+    if report['deliveries'] == 0 and (report['metrics_sent'] or report['components_sent']):
+        violations.append('no injected point was delivered')
+    if report['p50_ms'] is not None and report['p50_ms'] > p50_ms:
+        violations.append(f"p50 latency {report['p50_ms']:.1f} ms > {p50_ms:g} ms")
+    if report['p99_ms'] is not None and report['p99_ms'] > p99_ms:
+        violations.append(f"p99 latency {report['p99_ms']:.1f} ms > {p99_ms:g} ms")
+    if report['delivery_ratio'] < min_delivery:
+        violations.append(f"delivery ratio {report['delivery_ratio']:.3f} < {min_delivery:g}")
+    if report['kb_per_connection'] is not None and report['kb_per_connection'] > max_connection_kb:
+        violations.append(f"{report['kb_per_connection']:.1f} KB per connection > {max_connection_kb:g} KB")
+    return violations
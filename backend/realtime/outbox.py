@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import math
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Close code for clients that cannot keep up ("try again later")
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+# Process-wide totals across every connection
+stats = Counter()
+
+
+class Outbox:
+    """Bounded per-connection send queue with conflation.
+
+    Channel-layer handlers ``put`` messages and return immediately; one
+    writer task per connection awaits the actual socket sends. While a
+    message with the same ``key`` is still waiting, a newer one replaces it
+    in place (or is folded in with ``merge``), so a lagging client gets the
+    latest value per key instead of a growing backlog. When the queue is
+    full the oldest message is dropped, preferring ones without a key so
+    the latest value per key survives. ``put`` returns False once the
+    client has lagged for too long or is dropping too much and should be
+    disconnected. Drops are counted with exponential decay over
+    ``drop_window`` seconds, so a long-lived connection is judged by its
+    recent drop rate rather than by its lifetime total.
+    """
+
+    def __init__(self, send, max_pending=None, max_lag=None, max_drops=None, drop_window=None):
+        self.send = send
+        self.max_pending = max_pending or settings.REALTIME_OUTBOX_MAX_PENDING
+        self.max_lag = max_lag or settings.REALTIME_SLOW_CLIENT_LAG_SECONDS
+        self.max_drops = max_drops or settings.REALTIME_SLOW_CLIENT_MAX_DROPS
+        self.drop_window = drop_window or settings.REALTIME_SLOW_CLIENT_DROP_WINDOW_SECONDS
+        self.queue = deque()
+        self.pending = {}
+        self.counters = Counter()
+        self.recent_drops = 0.0
+        self._drops_at = time.monotonic()
+        self.closed = False
+        self._writer = None
+        self._ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def put(self, message, key=None, merge=None):
+        """Queue ``message`` for sending; returns False when the client should be disconnected"""
+        if self.closed:
+            return True
+
+        if key is not None and key in self.pending:
+            entry = self.pending[key]
+            entry[2] = merge(entry[2], message) if merge else message
+            self._count('conflated')
+            return self.healthy()
+
+        if len(self.queue) >= self.max_pending:
+            self._drop_oldest()
+
+        # [enqueued_at, key, message]
+        entry = [time.monotonic(), key, message]
+        self.queue.append(entry)
+        if key is not None:
+            self.pending[key] = entry
+
+        if self._writer is None:
+            self._writer = asyncio.get_running_loop().create_task(self._run())
+        self._ready.set()
+        return self.healthy()
+
+    def _drop_oldest(self):
+        # Conflated entries already hold the latest value for their key; shed unkeyed messages first
+        victim = next((entry for entry in self.queue if entry[1] is None), self.queue[0])
+        self.queue.remove(victim)
+        if victim[1] is not None:
+            del self.pending[victim[1]]
+        self._count('dropped')
+        self.recent_drops = self._decayed_drops(time.monotonic()) + 1
+
+    def _decayed_drops(self, now):
+        decayed = self.recent_drops * math.exp(-(now - self._drops_at) / self.drop_window)
+        self._drops_at = now
+        return decayed
+
+    def healthy(self):
+        now = time.monotonic()
+        self.recent_drops = self._decayed_drops(now)
+        if self.recent_drops > self.max_drops:
+            return False
+        return not self.queue or now - self.queue[0][0] <= self.max_lag
+
+    def _count(self, name):
+        self.counters[name] += 1
+        stats[name] += 1
+
+    async def _run(self):
+        while not self.closed:
+            if not self.queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            _, key, message = self.queue.popleft()
+            if key is not None:
+                del self.pending[key]
+            try:
+                await self.send(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"WebSocket send failed, closing outbox: {e}")
+                self.closed = True
+                return
+            self._count('sent')
+
+    def close(self):
+        """Stop the writer and discard whatever is still queued"""
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+        if self.queue:
+            self.counters['discarded'] += len(self.queue)
+            stats['discarded'] += len(self.queue)
+        self.queue.clear()
+        self.pending.clear()
+        if self.counters['dropped'] or self.counters['conflated']:
+            logger.info(
+                f"Outbox closed: {self.counters['sent']} sent, {self.counters['conflated']} conflated, "
+                f"{self.counters['dropped']} dropped"
+            )
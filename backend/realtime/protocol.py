@@ -0,0 +1,240 @@
+"""Wire codecs for the realtime sockets.
+
+Clients that offer the ``perfmaster.binary.v1`` subprotocol get binary
+frames; everyone else keeps JSON text frames. Binary frames start with a
+one-byte frame type and are little-endian throughout:
+
+``FRAME_JSON`` (0)
+    UTF-8 JSON message, used for everything without a compact layout.
+
+``FRAME_METRICS`` (1), a columnar batch of points::
+
+    u16 count, i64 base_ms
+    u8[count]  metric type codes (index into PerformanceMetric.METRIC_TYPES)
+    u32[count] timestamp - base_ms, in milliseconds
+    f32[count] values
+    u16 url_count, url_count x (u16 length, UTF-8 bytes)
+    u16[count] url index, 0xFFFF for none
+
+``FRAME_PERIODIC`` (2), a periodic update::
+
+    f64 server timestamp, FRAME_METRICS body, 16-byte ids[count],
+    u8 aggregate_count, aggregate_count x (u8 type, u32 count, f32 avg, f32 min, f32 max)
+
+Clients send ``FRAME_METRICS`` to ingest points (each becomes a
+``metric_update``) or ``FRAME_JSON`` for any other message.
+"""
+import json
+import math
+import struct
+import uuid
+from datetime import datetime
+
+from performance.models import PerformanceMetric
+
+BINARY_SUBPROTOCOL = 'perfmaster.binary.v1'
+
+FRAME_JSON = 0
+FRAME_METRICS = 1
+FRAME_PERIODIC = 2
+
+METRIC_CODES = {metric_type: code for code, (metric_type, _) in enumerate(PerformanceMetric.METRIC_TYPES)}
+METRIC_NAMES = [metric_type for metric_type, _ in PerformanceMetric.METRIC_TYPES]
+NO_URL = 0xFFFF
+ZERO_ID = bytes(16)
+
+
+class ProtocolError(ValueError):
+    """Raised when an inbound frame cannot be decoded"""
+
+
+def _epoch_ms(timestamp):
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp * 1000)
+    return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+
+
+def _id_bytes(value):
+    try:
+        return uuid.UUID(str(value)).bytes
+    except ValueError:
+        return ZERO_ID
+
+
+def _nan(value):
+    return math.nan if value is None else value
+
+
+def _none(value):
+    return None if math.isnan(value) else value
+
+
+def pack_metrics(rows):
+    """Columnar FRAME_METRICS body for rows with metric_type, value, timestamp and url"""
+    count = len(rows)
+    stamps = [_epoch_ms(row['timestamp']) for row in rows]
+    base = min(stamps) if stamps else 0
+
+    urls = {}
+    indexes = []
+    for row in rows:
+        url = row.get('url') or ''
+        if not url:
+            indexes.append(NO_URL)
+            continue
+        index = urls.get(url)
+        if index is None:
+            index = urls[url] = len(urls)
+        indexes.append(index)
+
+    parts = [
+        struct.pack('<Hq', count, base),
+        bytes(METRIC_CODES[row['metric_type']] for row in rows),
+        struct.pack(f'<{count}I', *(stamp - base for stamp in stamps)),
+        struct.pack(f'<{count}f', *(row['value'] for row in rows)),
+        struct.pack('<H', len(urls)),
+    ]
+    for url in urls:
+        encoded = url.encode('utf-8')
+        parts.append(struct.pack('<H', len(encoded)))
+        parts.append(encoded)
+    parts.append(struct.pack(f'<{count}H', *indexes))
+    return b''.join(parts)
+
+
+def unpack_metrics(data, offset=0):
+    """Decode a FRAME_METRICS body; returns (rows, offset after the body)"""
+    count, base = struct.unpack_from('<Hq', data, offset)
+    offset += 10
+    codes = data[offset:offset + count]
+    offset += count
+    deltas = struct.unpack_from(f'<{count}I', data, offset)
+    offset += 4 * count
+    values = struct.unpack_from(f'<{count}f', data, offset)
+    offset += 4 * count
+
+    (url_count,) = struct.unpack_from('<H', data, offset)
+    offset += 2
+    urls = []
+    for _ in range(url_count):
+        (length,) = struct.unpack_from('<H', data, offset)
+        offset += 2
+        urls.append(bytes(data[offset:offset + length]).decode('utf-8'))
+        offset += length
+    indexes = struct.unpack_from(f'<{count}H', data, offset)
+    offset += 2 * count
+
+    if len(codes) != count or any(code >= len(METRIC_NAMES) for code in codes):
+        raise ProtocolError('unknown metric type code')
+    if any(index != NO_URL and index >= len(urls) for index in indexes):
+        raise ProtocolError('url index out of range')
+    rows = [
+        {
+            'metric_type': METRIC_NAMES[code],
+            'value': value,
+            'timestamp': (base + delta) / 1000,
+            'url': urls[index] if index != NO_URL else '',
+        }
+        for code, delta, value, index in zip(codes, deltas, values, indexes)
+    ]
+    return rows, offset
+
+
+class JSONCodec:
+    """Default text-frame codec"""
+    subprotocol = None
+
+    def encode(self, message):
+        return {'text_data': json.dumps(message)}
+
+    def decode(self, text_data=None, bytes_data=None):
+        if text_data is None:
+            raise ProtocolError('binary frames need the binary subprotocol')
+        try:
+            return [json.loads(text_data)]
+        except json.JSONDecodeError as e:
+            raise ProtocolError(f'Invalid JSON: {e.msg}')
+
+
+class BinaryCodec:
+    """Struct-packed codec negotiated with the ``perfmaster.binary.v1`` subprotocol"""
+    subprotocol = BINARY_SUBPROTOCOL
+
+    def encode(self, message):
+        try:
+            return self.encode_binary(message)
+        except (KeyError, OverflowError, struct.error):
+            # Values outside the compact layout (e.g. beyond f32 range) still go out as JSON
+            return {'bytes_data': bytes([FRAME_JSON]) + json.dumps(message).encode('utf-8')}
+
+    def encode_binary(self, message):
+        message_type = message.get('type')
+        if message_type == 'metric_batch':
+            return {'bytes_data': bytes([FRAME_METRICS]) + pack_metrics(message['data'])}
+        if message_type == 'periodic_update':
+            data = message['data']
+            metrics = data['metrics']
+            aggregates = data.get('aggregates') or {}
+            parts = [
+                struct.pack('<Bd', FRAME_PERIODIC, data['timestamp']),
+                pack_metrics(metrics),
+                b''.join(_id_bytes(metric.get('id')) for metric in metrics),
+                struct.pack('<B', len(aggregates)),
+            ]
+            for metric_type, aggregate in aggregates.items():
+                parts.append(struct.pack(
+                    '<BIfff', METRIC_CODES[metric_type], aggregate['count'],
+                    _nan(aggregate['avg']), _nan(aggregate['min']), _nan(aggregate['max'])
+                ))
+            return {'bytes_data': b''.join(parts)}
+        return {'bytes_data': bytes([FRAME_JSON]) + json.dumps(message).encode('utf-8')}
+
+    def decode(self, text_data=None, bytes_data=None):
+        if text_data is not None:
+            return JSONCodec().decode(text_data)
+        if not bytes_data:
+            raise ProtocolError('empty frame')
+
+        frame_type = bytes_data[0]
+        try:
+            if frame_type == FRAME_JSON:
+                return [json.loads(bytes_data[1:].decode('utf-8'))]
+            if frame_type == FRAME_METRICS:
+                rows, _ = unpack_metrics(memoryview(bytes_data), 1)
+                return [{'type': 'metric_update', **row} for row in rows]
+        except (struct.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ProtocolError(f'Malformed frame: {e}')
+        raise ProtocolError(f'Unsupported frame type {frame_type}')
+
+
+def decode_frame(data):
+    """Client-side reference decoder for server frames, mirroring the encoder"""
+    data = memoryview(data)
+    frame_type = data[0]
+    if frame_type == FRAME_JSON:
+        return json.loads(bytes(data[1:]).decode('utf-8'))
+    if frame_type == FRAME_METRICS:
+        return {'type': 'metric_batch', 'data': unpack_metrics(data, 1)[0]}
+    if frame_type != FRAME_PERIODIC:
+        raise ProtocolError(f'Unsupported frame type {frame_type}')
+
+    (timestamp,) = struct.unpack_from('<d', data, 1)
+    rows, offset = unpack_metrics(data, 9)
+    for row in rows:
+        row['id'] = str(uuid.UUID(bytes=bytes(data[offset:offset + 16])))
+        offset += 16
+    (aggregate_count,) = struct.unpack_from('<B', data, offset)
+    offset += 1
+    aggregates = {}
+    for _ in range(aggregate_count):
+        code, count, avg, minimum, maximum = struct.unpack_from('<BIfff', data, offset)
+        offset += 17
+        aggregates[METRIC_NAMES[code]] = {'count': count, 'avg': _none(avg), 'min': _none(minimum), 'max': _none(maximum)}
+    return {'type': 'periodic_update', 'data': {'metrics': rows, 'aggregates': aggregates, 'timestamp': timestamp}}
+
+
+def codec_for(subprotocols):
+    """Binary codec when the client offered it, JSON otherwise"""
+    if BINARY_SUBPROTOCOL in (subprotocols or []):
+        return BinaryCodec()
+    return JSONCodec()
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+import uuid
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .layers import in_process
+from .live import live_feed, live_store
+
+logger = logging.getLogger(__name__)
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class LocalLease:
+    """Lease used with the in-memory channel layer, where there is only one process"""
+
+    async def acquire(self):
+        return True
+
+    async def release(self):
+        pass
+
+
+class RedisLease:
+    """Expiring Redis lock so only one ASGI worker publishes for a group"""
+
+    def __init__(self, client, key, ttl):
+        self.client = client
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.token = uuid.uuid4().hex
+        self.held = False
+
+    async def acquire(self):
+        """Acquire the lease, or renew it if this worker already holds it"""
+        try:
+            if self.held:
+                self.held = bool(await self.client.eval(RENEW_SCRIPT, 1, self.key, self.token, self.ttl_ms))
+            if not self.held:
+                self.held = bool(await self.client.set(self.key, self.token, nx=True, px=self.ttl_ms))
+        except Exception as e:
+            logger.warning(f"Publisher lease check failed for {self.key}: {e}")
+            self.held = False
+        return self.held
+
+    async def release(self):
+        if not self.held:
+            return
+        self.held = False
+        try:
+            await self.client.eval(RELEASE_SCRIPT, 1, self.key, self.token)
+        except Exception as e:
+            logger.warning(f"Publisher lease release failed for {self.key}: {e}")
+
+
+class ProjectPublisher:
+    """Publishes new live-store points once per group and fans them out through the channel layer"""
+
+    def __init__(self, group_name, project_id, lease, interval):
+        self.group_name = group_name
+        self.project_id = project_id
+        self.lease = lease
+        self.interval = interval
+        self.subscribers = 0
+        self.sequence = 0
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        await self.lease.release()
+
+    async def run(self):
+        channel_layer = get_channel_layer()
+
+        while True:
+            try:
+                # Workers without the lease stay on standby and take over if the leader goes away
+                if await self.lease.acquire():
+                    # Points added to the live store since the last tick; no database round trip.
+                    # A backlog over the row limit resumes from the last sent point next tick
+                    metrics, sequences, self.sequence = live_store.since(
+                        self.project_id, self.sequence, settings.REALTIME_PUBLISHER_MAX_ROWS
+                    )
+                    if metrics:
+                        await channel_layer.group_send(
+                            self.group_name,
+                            {
+                                'type': 'periodic_update',
+                                'data': {
+                                    'metrics': metrics,
+                                    'aggregates': live_store.aggregates(self.project_id),
+                                    'timestamp': time.time()
+                                },
+                                'source': live_store.source,
+                                'sequences': sequences
+                            }
+                        )
+                else:
+                    # Standby workers keep their own store current so a takeover resumes from here
+                    self.sequence = live_store.head(self.project_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in periodic updates for {self.group_name}: {e}")
+
+            await asyncio.sleep(self.interval)
+
+
+class PublisherRegistry:
+    """Per-process registry that keeps one publisher alive per subscribed group"""
+
+    def __init__(self):
+        self.publishers = {}
+        self._redis = None
+
+    def _lease(self, group_name):
+        if in_process(get_channel_layer()) or not settings.REALTIME_PUBLISHER_LOCK_URL:
+            return LocalLease()
+
+        if self._redis is None:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(settings.REALTIME_PUBLISHER_LOCK_URL)
+        interval = settings.REALTIME_PUBLISHER_INTERVAL
+        return RedisLease(self._redis, f'perfmaster:publisher:{group_name}', ttl=interval * 3)
+
+    async def subscribe(self, group_name, project_id):
+        """Register a local socket and return its snapshot; the first one warms the store and starts the publisher"""
+        publisher = self.publishers.get(group_name)
+        started = publisher is None
+        if started:
+            publisher = ProjectPublisher(
+                group_name,
+                project_id,
+                self._lease(group_name),
+                settings.REALTIME_PUBLISHER_INTERVAL
+            )
+            self.publishers[group_name] = publisher
+        publisher.subscribers += 1
+
+        if started:
+            # This process's copy of new points arrives on the live feed, not on every socket
+            await live_feed.join(project_id)
+        await live_store.warm(project_id)
+        if self.publishers.get(group_name) is not publisher:
+            # Every socket left while the store was warming
+            live_store.drop(project_id)
+            await live_feed.leave(project_id)
+            return []
+        if started:
+            # Warmed points reach sockets through the snapshot, not the first tick
+            publisher.sequence = live_store.head(project_id)
+            publisher.start()
+        return live_store.latest(project_id, 10)
+
+    async def unsubscribe(self, group_name):
+        """Release a local socket; stops the publisher when the last one leaves"""
+        publisher = self.publishers.get(group_name)
+        if publisher is None:
+            return
+        publisher.subscribers -= 1
+        if publisher.subscribers <= 0:
+            del self.publishers[group_name]
+            live_store.drop(publisher.project_id)
+            await live_feed.leave(publisher.project_id)
+            await publisher.stop()
+
+
+publishers = PublisherRegistry()
@@ -123,15 +123,19 @@ export class PerfMasterAPI {
   async getMetrics(timeRange = "1h", interval = "1m") {
     const query = `
       query GetMetrics {
-        allMetrics {
-          id
-          timestamp
-          value
-          metricType
-          url
-          project {
-            id
-            name
+        allMetrics(first: 500) {
+          edges {
+            node {
+              id
+              timestamp
+              value
+              metricType
+              url
+              project {
+                id
+                name
+              }
+            }
           }
         }
       }